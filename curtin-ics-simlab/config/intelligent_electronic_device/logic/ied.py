@@ -1,17 +1,26 @@
-import time
-import random
+from utils import clock, wait_for
+import signals
 from threading import Thread
 
+# safe voltage range (percentage either side of the normal voltage); module attributes, so
+# parameter sweeps can vary them
+SAFE_RANGE_PERC = 5
+VOLTAGE_NORMAL = 120
+
+# automatic tap changes: a seeded sequence of random +1/-1 taps, one every 5 seconds (an hour of
+# taps is precomputed when the logic starts and then repeated)
+TAP_CHANGE_INTERVAL = 5
+TAP_CHANGE_SEED = 7
+
 # note that "physical_values" is a dictionary of all the values defined in the JSON
 # the keys are defined in the JSON
 def logic(input_registers, output_registers, state_update_callbacks):
-    safe_range_perc = 5
-    voltage_normal = 120
-    tap_state = True
+    safe_range_perc = SAFE_RANGE_PERC
+    voltage_normal = VOLTAGE_NORMAL
 
     # get register references
     voltage = input_registers["transformer_voltage_reading"]
-    tap_change = input_registers["tap_change_command"]
+    tap_change_command = input_registers["tap_change_command"]
     breaker_control_command = output_registers["breaker_control_command"]
     tap_position = output_registers["tap_position"]
 
@@ -20,7 +29,8 @@ def logic(input_registers, output_registers, state_update_callbacks):
     state_update_callbacks["tap_position"]()
 
     # randomly tap change in a new thread
-    tapping_thread = Thread(target=tap_change_thread, args=(tap_position, state_update_callbacks), daemon=True)
+    tap_changes = signals.random_choice([-1, 1], TAP_CHANGE_INTERVAL, 3600, seed=TAP_CHANGE_SEED, resolution=TAP_CHANGE_INTERVAL)
+    tapping_thread = Thread(target=tap_change_thread, args=(tap_changes, tap_position, state_update_callbacks), daemon=True)
     tapping_thread.start()
 
     # calcuate safe voltage threshold
@@ -32,33 +42,27 @@ def logic(input_registers, output_registers, state_update_callbacks):
     breaker_thread.start()
 
     while True:
-        # implement tap change
-        if tap_change["value"] == 1 and tap_state:
-            tap_change(1, tap_position, state_update_callbacks)
-            tap_state = False
-        elif tap_change["value"] == 2 and tap_state:
-            tap_change(-1, tap_position, state_update_callbacks)
-            tap_state = False
+        # wait for a tap change command (1 taps up, 2 taps down) and implement it
+        wait_for(tap_change_command, lambda value: value in (1, 2))
+        tap_change(1 if tap_change_command["value"] == 1 else -1, tap_position, state_update_callbacks)
 
         # wait for the tap changer to revert back to 0 before changing any position
-        if tap_change["value"] == 0:
-            tap_state = True
-        
-        time.sleep(0.1)
+        wait_for(tap_change_command, lambda value: value == 0)
 
 
 # a thread to implement automatic tap changes
-def tap_change_thread(tap_position, state_update_callbacks):
+def tap_change_thread(tap_changes, tap_position, state_update_callbacks):
+    start = clock.monotonic()
     while True:
-        tap = random.choice([-1, 1])
+        tap = int(tap_changes(clock.monotonic() - start))
         tap_change(tap, tap_position, state_update_callbacks)
 
-        time.sleep(5)
+        clock.sleep(TAP_CHANGE_INTERVAL)
         
 
 # a thread to implement the breaker
 def breaker(voltage, breaker_control_command, tap_position, state_update_callbacks, low_bound, high_bound):
-    time.sleep(3)
+    clock.sleep(3)
 
     while True:
         # implement breaker with safe range
@@ -68,20 +72,20 @@ def breaker(voltage, breaker_control_command, tap_position, state_update_callbac
             
             tap_change(-1, tap_position, state_update_callbacks)
             print("HIGH VOLTAGE - TAP BY -1")
-            time.sleep(1)
+            clock.sleep(1)
         elif voltage["value"] < low_bound:
             breaker_control_command["value"] = True
             state_update_callbacks["breaker_control_command"]()
 
             tap_change(1, tap_position, state_update_callbacks)
             print("LOW VOLTAGE - TAP BY +1")
-            time.sleep(1)
+            clock.sleep(1)
         else:
             breaker_control_command["value"] = False
             state_update_callbacks["breaker_control_command"]()
 
         
-        time.sleep(1)
+        clock.sleep(1)
 
 
 # a function for tap changing within range 0 - 17
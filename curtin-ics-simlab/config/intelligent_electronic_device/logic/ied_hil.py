@@ -1,4 +1,4 @@
-import time
+from utils import clock
 import numpy as np
 from threading import Thread
 
@@ -32,7 +32,7 @@ def logic(physical_values):
             physical_values["output_voltage"] = physical_values["transformer_voltage"]
 
 
-        time.sleep(0.1)
+        clock.sleep(0.1)
 
     # TODO: implement voltage change
     # TODO: theres no way to make a t-flipflop in a PLC (can't change an input register) - maybe some way to send one-way modbus command
\ No newline at end of file
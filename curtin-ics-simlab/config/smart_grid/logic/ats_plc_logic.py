@@ -1,31 +1,22 @@
-import time
+from utils import on_change
+
+# solar power reading above which the transfer switch moves to solar
+SOLAR_POWER_THRESHOLD = 200
 
 # note that "physical_values" is a dictionary of all the values defined in the JSON
 # the keys are defined in the JSON
 def logic(input_registers, output_registers, state_update_callbacks):
-    state_change = True
-    sp_pm_prev = None
-    ts_prev = None
-
     # get register references
     sp_pm_value = input_registers["solar_panel_reading"]
     ts_value = output_registers["transfer_switch_state"]
 
-    while True:        
-        if sp_pm_prev != sp_pm_value["value"]:
-            sp_pm_prev = sp_pm_value["value"]
-        
-        if ts_prev != ts_value["value"]:
-            ts_prev = ts_value["value"]
-
-        # write to the transfer switch
-        # note that we retrieve the value by reference only (["value"])
-        if sp_pm_value["value"] > 200 and state_change == True:
-            ts_value["value"] = True
-            state_change = False
+    # write to the transfer switch whenever the solar panel reading changes
+    # note that we retrieve the value by reference only (["value"])
+    def solar_panel_reading_changed(value):
+        state = value > SOLAR_POWER_THRESHOLD
+        if ts_value["value"] != state:
+            ts_value["value"] = state
             state_update_callbacks["transfer_switch_state"]()
-        if sp_pm_value["value"] <= 200 and state_change == False:
-            ts_value["value"] = False
-            state_change = True
-            state_update_callbacks["transfer_switch_state"]()
-        time.sleep(0.05)
\ No newline at end of file
+
+    solar_panel_reading_changed(sp_pm_value["value"])
+    on_change(sp_pm_value, solar_panel_reading_changed)
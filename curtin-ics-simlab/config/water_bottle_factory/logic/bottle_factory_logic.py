@@ -1,10 +1,16 @@
-import time
-import sqlite3
-from threading import Thread
+import numpy as np
+
+# rates are per second (the bottle steps run every 0.6 seconds of simulated time, the tank
+# level is integrated continuously)
+STEP_PERIOD = 0.6
+TANK_INPUT_RATE = 30
+TANK_OUTPUT_RATE = 10
+BOTTLE_FILL_RATE = 10
+CONVEYOR_SPEED = 4 / 0.6
 
 # note that "physical_values" is a dictionary of all the values defined in the JSON
 # the keys are defined in the JSON
-def logic(physical_values):
+def register(engine, physical_values):
 
     # initial values
     physical_values["tank_level_value"] = 500
@@ -14,56 +20,27 @@ def logic(physical_values):
     physical_values["bottle_distance_to_filler_value"] = 0
     physical_values["conveyor_belt_engine_state"] = False
 
+    # register the tank level dynamics and bottle filling step with the HIL's tick engine
+    engine.register_ode(["tank_level_value"], tank_derivatives)
+    engine.register(bottle_filling_step, STEP_PERIOD)
 
-    time.sleep(3)
-
-    # start tank valve threads
-    tank_thread = Thread(target=tank_valves_thread, args=(physical_values,), daemon=True)
-    tank_thread.start()
-
-    # start bottle filling thread
-    bottle_thread = Thread(target=bottle_filling_thread, args=(physical_values,), daemon=True)
-    bottle_thread.start()
-
-    # printing thread
-    #info_thread = Thread(target=print_values, args=(physical_values,), daemon=True)
-    #info_thread.start()
-
-    # block
-    tank_thread.join()
-    bottle_thread.join()
-    #info_thread.join()
-
-# define behaviour for the valves and tank level
-def tank_valves_thread(physical_values):
-    while True:
-        if physical_values["tank_input_valve_state"] == True:
-            physical_values["tank_level_value"] += 18
-
-        if physical_values["tank_output_valve_state"] == True:
-            physical_values["tank_level_value"] -= 6
-        time.sleep(0.6)
+# define behaviour for the valves and tank level (rate of change of the tank level)
+def tank_derivatives(t, y, physical_values):
+    inflow = TANK_INPUT_RATE if physical_values["tank_input_valve_state"] == True else 0
+    outflow = TANK_OUTPUT_RATE if physical_values["tank_output_valve_state"] == True else 0
+    return np.array([inflow - outflow])
 
 # define bottle filling behaviour
-def bottle_filling_thread(physical_values):
-    while True:
-        # fill bottle up if there's a bottle underneath the filler and the tank output is on
-        if physical_values["tank_output_valve_state"] == True:
-            if physical_values["bottle_distance_to_filler_value"] >= 0 and physical_values["bottle_distance_to_filler_value"] <= 30:
-                physical_values["bottle_level_value"] += 6
-        
-        # move the conveyor (reset bottle and distance if needed)
-        if physical_values["conveyor_belt_engine_state"] == True:
-            physical_values["bottle_distance_to_filler_value"] -= 4
-            
-            if physical_values["bottle_distance_to_filler_value"] < 0:
-                physical_values["bottle_distance_to_filler_value"] = 130
-                physical_values["bottle_level_value"] = 0
-        time.sleep(0.6)
-
-# printing thread
-def print_values(physical_values):
-    while True:
-        print(physical_values)
-
-        time.sleep(0.1)
\ No newline at end of file
+def bottle_filling_step(physical_values, dt):
+    # fill bottle up if there's a bottle underneath the filler and the tank output is on
+    if physical_values["tank_output_valve_state"] == True:
+        if physical_values["bottle_distance_to_filler_value"] >= 0 and physical_values["bottle_distance_to_filler_value"] <= 30:
+            physical_values["bottle_level_value"] += BOTTLE_FILL_RATE * dt
+
+    # move the conveyor (reset bottle and distance if needed)
+    if physical_values["conveyor_belt_engine_state"] == True:
+        physical_values["bottle_distance_to_filler_value"] -= CONVEYOR_SPEED * dt
+
+        if physical_values["bottle_distance_to_filler_value"] < 0:
+            physical_values["bottle_distance_to_filler_value"] = 130
+            physical_values["bottle_level_value"] = 0
@@ -1,40 +1,28 @@
-import time
+from utils import clock
 
-def logic(input_registers, output_registers, state_update_callbacks):
-    state_change = True
+# tank levels at which the input valve is turned on and off (module attributes, so parameter
+# sweeps can vary them)
+TANK_LOW_LEVEL = 300
+TANK_HIGH_LEVEL = 500
 
-    # get value references
-    tank_level_ref = input_registers["tank_level"]
-    tank_input_valve_ref = output_registers["tank_input_valve_state"]
-    tank_output_valve_ref = output_registers["tank_output_valve_state"]
+# how often the tank control task runs (seconds)
+TANK_CONTROL_PERIOD = 0.1
 
-    # initial writing
-    tank_input_valve_ref["value"] = False
-    state_update_callbacks["tank_input_valve_state"]()
-    tank_output_valve_ref["value"] = True
-    state_update_callbacks["tank_output_valve_state"]()
+def register(engine, input_registers, output_registers):
+    # initial values (written out at the end of the first scan)
+    output_registers["tank_input_valve_state"]["value"] = False
+    output_registers["tank_output_valve_state"]["value"] = True
 
     # wait for the first sync to happen
-    time.sleep(2)
-
-    # create mapping logic
-    prev_tank_output_valve = tank_output_valve_ref["value"]
-    while True:
-        # turn input on if the tank is almost empty
-        if tank_level_ref["value"] < 300 and state_change:
-            tank_input_valve_ref["value"] = True
-            state_update_callbacks["tank_input_valve_state"]()
-            state_change = False
-
-        # turn input off if tank gets full
-        elif tank_level_ref["value"] > 500 and not state_change:
-            tank_input_valve_ref["value"] = False
-            state_update_callbacks["tank_input_valve_state"]()
-            state_change = True
-
-        # write to actuator if the tank output state changes
-        if tank_output_valve_ref["value"] != prev_tank_output_valve:
-            state_update_callbacks["tank_output_valve_state"]()
-            prev_tank_output_valve = tank_output_valve_ref["value"]
-
-        time.sleep(0.1)
\ No newline at end of file
+    clock.sleep(2)
+
+    # register the tank control task with the PLC's scan engine
+    engine.register_task(tank_control_task, TANK_CONTROL_PERIOD)
+
+# turn the input on if the tank is almost empty, and off if the tank gets full (the output valve
+# is written by plc2 and flushed to its actuator whenever it changes)
+def tank_control_task(input_registers, output_registers):
+    if input_registers["tank_level"]["value"] < TANK_LOW_LEVEL:
+        output_registers["tank_input_valve_state"]["value"] = True
+    elif input_registers["tank_level"]["value"] > TANK_HIGH_LEVEL:
+        output_registers["tank_input_valve_state"]["value"] = False
@@ -1,4 +1,7 @@
-import time
+from utils import clock
+
+# bottle level at which filling stops (module attribute, so parameter sweeps can vary it)
+BOTTLE_FULL_LEVEL = 180
 
 def logic(input_registers, output_registers, state_update_callbacks):
     state = "ready"
@@ -16,7 +19,7 @@ def logic(input_registers, output_registers, state_update_callbacks):
     state_update_callbacks["plc1_tank_output_state"]()
 
     # wait for the first sync to happen
-    time.sleep(2)
+    clock.sleep(2)
 
     # create mapping logic
     while True:
@@ -37,7 +40,7 @@ def logic(input_registers, output_registers, state_update_callbacks):
             state = "moving"
 
         # stop filling and start conveyor
-        if bottle_level_ref["value"] >= 180 and state == "filling":
+        if bottle_level_ref["value"] >= BOTTLE_FULL_LEVEL and state == "filling":
             # turn off the tank and start conveyoer
             plc1_tank_output_state_ref["value"] = False
             state_update_callbacks["plc1_tank_output_state"]()
@@ -52,4 +55,4 @@ def logic(input_registers, output_registers, state_update_callbacks):
                 if bottle_level_ref["value"] == 0:
                     state = "ready"
 
-        time.sleep(0.1)
+        clock.sleep(0.1)
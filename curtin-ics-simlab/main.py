@@ -39,7 +39,11 @@
 
 import subprocess
 import argparse
+import json
+import sys
 from src import setup
+from src import headless
+from src import sweep
 from pathlib import Path
 
 if __name__ == "__main__":
@@ -49,8 +53,25 @@ if __name__ == "__main__":
                     epilog='Refer to full documentation on how to properly configure an ICS simulation')
     
     parser.add_argument("directory")
+    parser.add_argument("--headless", action="store_true", help="run the simulation in this process, without Docker")
+    parser.add_argument("--duration", type=float, help="(headless) seconds to run for before printing the final physical values")
+    parser.add_argument("--base-port", type=int, default=headless.DEFAULT_BASE_PORT, help="(headless) first loopback port to use")
+    parser.add_argument("--sweep", metavar="SWEEP_FILE", help="run a parameter sweep (JSON file) of headless simulations")
+    parser.add_argument("--output", default="sweep", help="(sweep) directory for the result table, traces and logs")
+    parser.add_argument("--workers", type=int, help="(sweep) number of processes (default one per core)")
     args = parser.parse_args()
 
+    # run a parameter sweep of headless simulations
+    if args.sweep:
+        sweep.sweep(args.directory, args.sweep, args.output, args.workers, args.base_port)
+        sys.exit(0)
+
+    # run the whole simulation in this process
+    if args.headless:
+        results = headless.run(args.directory, args.duration, args.base_port)
+        print(json.dumps(results["values"], indent=4))
+        sys.exit(0)
+
     # get absolute parent path
     root_path = Path(__file__).resolve().parent
 
@@ -39,9 +39,9 @@
 
 import logging
 import asyncio
-import time
-import sqlite3
 import utils
+import physical
+import lockstep
 from flask import Flask, jsonify
 from threading import Thread
 from pymodbus.datastore import ModbusSequentialDataBlock, ModbusDeviceContext, ModbusServerContext
@@ -53,6 +53,7 @@ app = Flask(__name__)
 
 # global variables (only used for endpoints)
 register_values = {}
+change_filter = physical.ChangeFilter()
 
 
 
@@ -73,53 +74,34 @@ async def start_servers(configs, context):
 
 
 # FUNCTION: start_actuator
-# PURPOSE:  Starts a process to write data to an SQLite column specific to this actuator.
-def start_actuator(configs, values):
-    # connect to hardware SQLite database
-    conn = sqlite3.connect("physical_interactions.db")
-    cursor = conn.cursor()
+# PURPOSE:  Starts a process to write data to the physical layer values specific to this actuator.
+#           Values are only written when they change (or the heartbeat is due).
+def start_actuator(configs, values, change_filter):
+    # connect to the physical layer store
+    store = physical.open_store(configs)
+
+    physical_registers = utils.get_physical_registers(configs)
+    codec = utils.RegisterCodec(physical_registers)
+    notifier = physical.create_notifier(configs)
+
+    # in lockstep mode, timestamps and heartbeats follow the virtual simulation clock
+    if utils.clock.virtual:
+        store.now = utils.clock.time
+        change_filter.now = utils.clock.monotonic
 
     while True:
-        # gets values for all value types from the physical databases
-        value = ""
-        for co in configs["registers"]["coil"]:
-            address = co["address"]
-            count = co["count"]
-            table = co["physical_value"]
-            value = values["co"].getValues(address, count)[0]
-
-            cursor.execute(f"INSERT INTO {table}(value) VALUES(?)", (value,))
-            value = cursor.fetchone()
-            conn.commit()
-        for di in configs["registers"]["discrete_input"]:
-            address = di["address"]
-            count = di["count"]
-            table = di["physical_value"]
-            value = values["di"].getValues(address, count)[0]
-
-            cursor.execute(f"INSERT INTO {table}(value) VALUES(?)", (value,))
-            value = cursor.fetchone()
-            conn.commit()
-        for hr in configs["registers"]["holding_register"]:
-            address = hr["address"]
-            count = hr["count"]
-            table = hr["physical_value"]
-            value = values["hr"].getValues(address, count)[0]
-
-            cursor.execute(f"INSERT INTO {table}(value) VALUES(?)", (value,))
-            value = cursor.fetchone()
-            conn.commit()
-        for ir in configs["registers"]["input_register"]:
-            address = ir["address"]
-            count = ir["count"]
-            table = ir["physical_value"]
-            value = values["ir"].getValues(address, count)[0]
-
-            cursor.execute(f"INSERT INTO {table}(value) VALUES(?)", (value,))
-            value = cursor.fetchone()
-            conn.commit()
-
-        time.sleep(0.1)
+        # decodes all registers into physical values, then writes the changed ones in a single transaction
+        physical_values = codec.decode(values)
+        changed_values = {}
+        for register in physical_registers:
+            name = register["physical_value"]
+            if change_filter.should_write(name, physical_values[name], register.get("deadband")):
+                changed_values[name] = physical_values[name]
+        if changed_values:
+            store.write_values(changed_values)
+            notifier.publish(list(changed_values))
+
+        utils.clock.sleep(0.1)
 
 
 
@@ -127,25 +109,38 @@ def start_actuator(configs, values):
 @app.route("/registers", methods=['GET'])
 def get_registers_route():
     global register_values
-    return jsonify(register_values)
+    return jsonify(utils.get_register_snapshot(register_values))
+
+
+
+
+# define the flask endpoint for the physical layer write counts
+@app.route("/physical_stats", methods=['GET'])
+def get_physical_stats_route():
+    global change_filter
+    return jsonify(change_filter.stats())
 
 
 
 
 # define function to run flask in another thread
-def flask_app(flask_app):
-    flask_app.run(host="0.0.0.0", port=1111)
+def flask_app(flask_app, port=utils.API_PORT):
+    flask_app.run(host=utils.BIND_ADDRESS, port=port)
 
 
 
 
 # FUNCTION: main
 # PURPOSE:  Main execution
-async def main():
+async def main(configs=None):
     global register_values
+    global change_filter
     
-    # retrieve configurations from the given JSON (will be in the same directory)
-    configs = utils.retrieve_configs("config.json")
+    # retrieve configurations from the given JSON (will be in the same directory), unless they are
+    # passed in by the headless runner
+    if configs is None:
+        configs = utils.retrieve_configs("config.json")
+    utils.configure_clock(configs)
     logging.info("Starting Actuator")
 
     # create device context
@@ -160,25 +155,26 @@ async def main():
     values = {"co": co, "di": di, "hr": hr, "ir": ir}
     server_task = start_servers(configs, context)
     
-    # create a dictionary to represent the different register values
-    register_values = utils.create_register_values_dict(configs)
+    # create a dictionary to represent the different register values (backed by the datastore)
+    register_values = utils.create_register_values_dict(configs, values)
 
     # start the actuator writing thread
-    actuator_thread = Thread(target=start_actuator, args=(configs, values), daemon=True)
+    change_filter = physical.create_change_filter(configs)
+    actuator_thread = Thread(target=start_actuator, args=(configs, values, change_filter), daemon=True)
     actuator_thread.start()
 
-    # start a thread to constantly update the "register_values" dictionary with the actual modbus register values
-    sync_registers = Thread(target=utils.update_register_values, args=(register_values, values), daemon=True)
-    sync_registers.start()
-
     # start the flask endpoint
-    flask_thread = Thread(target=flask_app, args=(app,), daemon=True)
+    flask_thread = Thread(target=flask_app, args=(app, configs.get("api_port", utils.API_PORT)), daemon=True)
     flask_thread.start()
 
+    # take part in the lockstep co-simulation (if configured)
+    if "lockstep" in configs:
+        lockstep_thread = Thread(target=lockstep.participate, args=(configs, "actuator", utils.clock), daemon=True)
+        lockstep_thread.start()
+
     # await tasks and threads
     await server_task
     actuator_thread.join()
-    sync_registers.join()
     #logic_thread.join()
     flask_thread.join()
 
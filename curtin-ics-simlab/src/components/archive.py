@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+
+# -----------------------------------------------------------------------------
+# Project: Curtin ICS-SimLab
+# File: archive.py
+#
+# Copyright (c) 2025 Jaxson Brown, Curtin University
+#
+# Licensed under the MIT License. You may obtain a copy of the License at:
+#     https://opensource.org/licenses/MIT
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+# This work is supported by a Cross-Campus Cyber Security Research Project
+# funded by **Curtin University**
+#
+# Author: Jaxson Brown
+# Organisation: Curtin University
+# Last Modified: 2025-08-27
+# -----------------------------------------------------------------------------
+
+
+# FILE PURPOSE: Archives the physical history of a HIL out of the physical interactions database
+#               into rotated, compressed NumPy (.npz) files, one dataset (directory) per HIL, and
+#               loads time ranges back out of them. Each file holds the columns "seq", "timestamp",
+#               "name" (an index into "names") and "value". An "index.json" file in the dataset
+#               records the sequence and time range of every file, so loading a time range only
+#               opens the files that overlap it.
+
+import json
+import os
+import numpy as np
+
+# GLOBAL VARIABLES
+ARCHIVE_DIRECTORY = "archive"
+INDEX_FILE = "index.json"
+
+# default archive policy (see archive_history)
+DEFAULT_ARCHIVE = {
+    "interval": 300,
+    "chunk_rows": 10000,
+    "rotate_rows": 100000,
+    "prune": False,
+}
+
+
+
+# FUNCTION: read_index
+# PURPOSE:  Reads the index of a HIL's archive dataset (an empty index if there is none yet)
+def read_index(dataset):
+    index_filename = os.path.join(dataset, INDEX_FILE)
+    if not os.path.exists(index_filename):
+        return {"last_seq": 0, "files": []}
+    with open(index_filename, "r") as index_file:
+        return json.load(index_file)
+
+
+
+# FUNCTION: write_index
+# PURPOSE:  Atomically replaces the index of a HIL's archive dataset
+def write_index(dataset, index):
+    index_filename = os.path.join(dataset, INDEX_FILE)
+    with open(f"{index_filename}.tmp", "w") as index_file:
+        json.dump(index, index_file, indent=4)
+    os.replace(f"{index_filename}.tmp", index_filename)
+
+
+
+# FUNCTION: write_file
+# PURPOSE:  Writes a list of (seq, name, timestamp, value) history rows into a new compressed
+#           archive file. Returns the index entry for the file.
+def write_file(dataset, rows):
+    seqs, names, timestamps, values = zip(*rows)
+    unique_names = sorted(set(names))
+    name_indexes = {name: index for index, name in enumerate(unique_names)}
+
+    filename = f"{seqs[0]:012d}-{seqs[-1]:012d}.npz"
+    with open(os.path.join(dataset, f"{filename}.tmp"), "wb") as archive_file:
+        np.savez_compressed(
+            archive_file,
+            seq=np.array(seqs, dtype=np.int64),
+            timestamp=np.array(timestamps, dtype=np.float64),
+            name=np.array([name_indexes[name] for name in names], dtype=np.int32),
+            value=np.array([np.nan if value is None else value for value in values], dtype=np.float64),
+            names=np.array(unique_names),
+        )
+    os.replace(os.path.join(dataset, f"{filename}.tmp"), os.path.join(dataset, filename))
+
+    return {
+        "file": filename,
+        "first_seq": seqs[0],
+        "last_seq": seqs[-1],
+        "start": min(timestamps),
+        "end": max(timestamps),
+        "rows": len(rows),
+    }
+
+
+
+# FUNCTION: archive_history
+# PURPOSE:  Streams all not yet archived history rows of the given physical values out of the
+#           database, "chunk_rows" rows at a time, into archive files of at most "rotate_rows"
+#           rows. If "prune" is set, archived rows are deleted from the live database.
+#           Returns the number of rows archived.
+def archive_history(conn, dataset, names, policy):
+    policy = DEFAULT_ARCHIVE | policy
+    os.makedirs(dataset, exist_ok=True)
+    index = read_index(dataset)
+    placeholders = ", ".join("?" * len(names))
+
+    archived = 0
+    rows = []
+    read_seq = index["last_seq"]
+    while True:
+        chunk = conn.execute(
+            f"""SELECT seq, name, timestamp, value FROM physical_history
+            WHERE seq > ? AND name IN ({placeholders}) ORDER BY seq LIMIT ?""",
+            [read_seq] + list(names) + [policy["chunk_rows"]]
+            ).fetchall()
+        rows.extend(chunk)
+        if chunk:
+            read_seq = chunk[-1][0]
+
+        # rotate to a new file when enough rows are buffered (or nothing is left to read)
+        while len(rows) >= policy["rotate_rows"] or (rows and len(chunk) < policy["chunk_rows"]):
+            file_rows = rows[:policy["rotate_rows"]]
+            rows = rows[policy["rotate_rows"]:]
+            index["files"].append(write_file(dataset, file_rows))
+            index["last_seq"] = file_rows[-1][0]
+            write_index(dataset, index)
+            archived += len(file_rows)
+
+            # keep the live database small (rows are only deleted once their file is indexed)
+            if policy["prune"]:
+                with conn:
+                    conn.execute(
+                        f"DELETE FROM physical_history WHERE seq BETWEEN ? AND ? AND name IN ({placeholders})",
+                        [file_rows[0][0], file_rows[-1][0]] + list(names)
+                        )
+
+        if len(chunk) < policy["chunk_rows"]:
+            break
+
+    return archived
+
+
+
+# FUNCTION: iter_chunks
+# PURPOSE:  Iterates over the archive files of a dataset that overlap the "start" and "end"
+#           timestamps (both optional and inclusive), yielding one dictionary of column arrays
+#           per file (filtered to the time range and, optionally, the given names). Only one file
+#           is loaded at a time.
+def iter_chunks(dataset, start=None, end=None, names=None):
+    for entry in read_index(dataset)["files"]:
+        if start is not None and entry["end"] < start:
+            continue
+        if end is not None and entry["start"] > end:
+            continue
+
+        with np.load(os.path.join(dataset, entry["file"])) as archive_file:
+            file_names = archive_file["names"].tolist()
+            columns = {
+                "seq": archive_file["seq"],
+                "timestamp": archive_file["timestamp"],
+                "name": np.array(file_names, dtype=object)[archive_file["name"]] if file_names else np.array([], dtype=object),
+                "value": archive_file["value"],
+            }
+
+        mask = np.ones(len(columns["seq"]), dtype=bool)
+        if start is not None:
+            mask &= columns["timestamp"] >= start
+        if end is not None:
+            mask &= columns["timestamp"] <= end
+        if names is not None:
+            mask &= np.isin(columns["name"], list(names))
+        yield {column: values[mask] for column, values in columns.items()}
+
+
+
+# FUNCTION: load
+# PURPOSE:  Loads a time range of an archive dataset. Returns a dictionary of physical value
+#           name -> (timestamps, values) arrays in sequence order.
+def load(dataset, start=None, end=None, names=None):
+    timestamps = {}
+    values = {}
+    for chunk in iter_chunks(dataset, start, end, names):
+        for name in np.unique(chunk["name"]):
+            mask = chunk["name"] == name
+            timestamps.setdefault(name, []).append(chunk["timestamp"][mask])
+            values.setdefault(name, []).append(chunk["value"][mask])
+
+    return {name: (np.concatenate(timestamps[name]), np.concatenate(values[name])) for name in timestamps}
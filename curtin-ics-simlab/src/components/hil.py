@@ -39,11 +39,26 @@
 #               SQLite database to represent physical data collection
 
 import asyncio
-import sqlite3
+import heapq
 import logging
+import math
 import time
+import threading
+import warnings
+import numpy as np
 import utils
+import physical
+import archive
+import lockstep
 from threading import Thread
+from collections.abc import MutableMapping
+from scipy.integrate import solve_ivp
+
+# parquet traces need pyarrow (optional, CSV traces work without it)
+try:
+    import pyarrow.parquet as pq
+except ModuleNotFoundError:
+    pq = None
 
 logging.basicConfig(level=logging.INFO, format='%(levelname)s - %(message)s')
 logging.getLogger('werkzeug').setLevel(logging.ERROR)
@@ -55,79 +70,653 @@ try:
 except ModuleNotFoundError:
     logging.error("Could not import logic for HIL component")
 
+# how often (seconds) the physical layer write counts are logged
+STATS_INTERVAL = 60
+
+# default tick engine settings (overridden by the HIL's "engine" configuration)
+DEFAULT_ENGINE = {
+    "timestep": 0.1,
+    "max_catch_up": 10,
+    "start_delay": 0,
+    "publish_interval": 0.3,
+    "input_interval": 0.3,
+    "solver": "rk4",
+    "rtol": 1e-6,
+    "atol": 1e-9,
+}
+
+# the directory of recorded trace files (mounted read-only from the configuration directory)
+TRACE_DIRECTORY = "traces"
+
+# how many rows of a trace file are read at a time
+DEFAULT_TRACE_CHUNK_ROWS = 10000
+
+# the fixed-step ODE solvers (any other solver name is passed to scipy's solve_ivp as its
+# method, e.g. "RK45" or, for stiff models, "BDF", "Radau" or "LSODA")
+FIXED_STEP_SOLVERS = ["euler", "rk4"]
+
+
+
+# CLASS:    PhysicalState
+# PURPOSE:  The HIL's physical values, stored in a NumPy array (one float64 per value, NaN for
+#           values that have not been set) behind a dictionary interface, so logic can keep using
+#           physical_values["name"] while large models update many values with one vector
+#           operation (see index(), vector(), set_vector() and array).
+#
+#           The state is double-buffered. Logic works on the working buffer; publish() copies it
+#           into the published buffer, from which snapshot() gives the sync threads a consistent
+#           copy. Inputs read from the physical layer are staged with write_inputs() and applied
+#           at the start of the next tick, so a tick never sees them change half way through.
+#           With "auto_publish" (used for thread based logic, which has no ticks), inputs are
+#           applied at once and every snapshot publishes the current values first.
+class PhysicalState(MutableMapping):
+    def __init__(self, physical_values, auto_publish=False):
+        self.names = [physical_value["name"] for physical_value in physical_values]
+        self.types = {physical_value["name"]: physical_value.get("type", physical.DEFAULT_TYPE) for physical_value in physical_values}
+        self.indexes = {name: index for index, name in enumerate(self.names)}
+        self.values = np.full(len(self.names), np.nan)
+        self.published = self.values.copy()
+        self.pending = {}
+        self.auto_publish = auto_publish
+        self.lock = threading.Lock()
+
+
+    def __getitem__(self, name):
+        value = self.values[self.indexes[name]]
+        if np.isnan(value):
+            return None
+        value_type = self.types[name]
+        if value_type == "bool":
+            return bool(value)
+        elif value_type == "int":
+            return int(round(value))
+        return float(value)
+
+
+    def __setitem__(self, name, value):
+        self.values[self.indexes[name]] = np.nan if value is None or value == "" else float(value)
+
+
+    def __delitem__(self, name):
+        raise TypeError("Physical values cannot be removed")
+
+
+    def __iter__(self):
+        return iter(self.names)
+
+
+    def __len__(self):
+        return len(self.names)
+
+
+    # FUNCTION: index
+    # PURPOSE:  Returns the array indexes of the given physical values (for vector operations)
+    def index(self, names):
+        return np.array([self.indexes[name] for name in names], dtype=np.intp)
+
+
+    # FUNCTION: vector
+    # PURPOSE:  Returns the values of the given physical values as an array (a copy)
+    def vector(self, names):
+        return self.values[self.index(names)]
+
+
+    # FUNCTION: set_vector
+    # PURPOSE:  Sets the given physical values from an array of values
+    def set_vector(self, names, values):
+        self.values[self.index(names)] = values
+
+
+    # FUNCTION: array
+    # PURPOSE:  The working buffer itself, for in-place vector operations by logic
+    #           (e.g. state.array[indexes] += rates * dt)
+    @property
+    def array(self):
+        return self.values
+
+
+    # FUNCTION: write_inputs
+    # PURPOSE:  Stages a dictionary of name -> value read from the physical layer (applied at the
+    #           start of the next tick, or at once with "auto_publish")
+    def write_inputs(self, values):
+        with self.lock:
+            self.pending.update(values)
+        if self.auto_publish:
+            self.apply_inputs()
+
+
+    # FUNCTION: apply_inputs
+    # PURPOSE:  Applies the staged inputs to the working buffer
+    def apply_inputs(self):
+        with self.lock:
+            pending, self.pending = self.pending, {}
+        for name, value in pending.items():
+            self[name] = value
+
+
+    # FUNCTION: publish
+    # PURPOSE:  Publishes the working buffer as the current consistent state
+    def publish(self):
+        with self.lock:
+            np.copyto(self.published, self.values)
+
+
+    # FUNCTION: snapshot
+    # PURPOSE:  Returns a consistent copy of the published state as a dictionary of name -> value
+    def snapshot(self):
+        if self.auto_publish:
+            self.publish()
+        with self.lock:
+            published = self.published.copy()
+
+        snapshot = {}
+        for name, value in zip(self.names, published.tolist()):
+            if math.isnan(value):
+                snapshot[name] = None
+            elif self.types[name] == "bool":
+                snapshot[name] = bool(value)
+            elif self.types[name] == "int":
+                snapshot[name] = int(round(value))
+            else:
+                snapshot[name] = value
+        return snapshot
+
+
+
+# CLASS:    ODEModel
+# PURPOSE:  Continuous dynamics for the tick engine. A model declares its state variables
+#           (physical value names) and a derivatives(t, y, state) function returning dy/dt for
+#           the array y of those variables (the rest of the state, such as valve positions, can
+#           be read from "state" and stays constant during a tick). Each step integrates the
+#           variables over dt with a fixed-step solver ("euler" or "rk4", "substeps" steps per
+#           dt) or an adaptive scipy solver, then writes them back into the state.
+class ODEModel:
+    def __init__(self, names, derivatives, solver="rk4", substeps=1, rtol=1e-6, atol=1e-9):
+        self.names = list(names)
+        self.derivatives = derivatives
+        self.solver = solver
+        self.substeps = substeps
+        self.rtol = rtol
+        self.atol = atol
+        self.t = 0.0
+
+
+    # FUNCTION: step
+    # PURPOSE:  Integrates the model over dt (a tick engine step function)
+    def step(self, state, dt):
+        y = state.vector(self.names)
+        if self.solver in FIXED_STEP_SOLVERS:
+            h = dt / self.substeps
+            for substep in range(self.substeps):
+                t = self.t + substep * h
+                if self.solver == "euler":
+                    y = y + h * self.derivatives(t, y, state)
+                else:
+                    k1 = self.derivatives(t, y, state)
+                    k2 = self.derivatives(t + h / 2, y + h / 2 * k1, state)
+                    k3 = self.derivatives(t + h / 2, y + h / 2 * k2, state)
+                    k4 = self.derivatives(t + h, y + h * k3, state)
+                    y = y + h / 6 * (k1 + 2 * k2 + 2 * k3 + k4)
+        else:
+            solution = solve_ivp(lambda t, y: self.derivatives(t, y, state), (self.t, self.t + dt), y,
+                                 method=self.solver, rtol=self.rtol, atol=self.atol)
+            if not solution.success:
+                raise RuntimeError(solution.message)
+            y = solution.y[:, -1]
+
+        state.set_vector(self.names, y)
+        self.t += dt
+
+
+
+# CLASS:    TraceSource
+# PURPOSE:  Drives physical values from a recorded trace file (CSV with a header row, or
+#           Parquet). The trace is streamed lazily, "chunk_rows" rows at a time, so memory use
+#           stays flat however long the trace is. Each step advances the trace time by dt * speed
+#           and sets the physical values to the trace interpolated linearly at that time.
+#           "columns" maps physical value names to trace columns, and "time_column" holds the
+#           trace time in seconds. At the end of the trace the last values are held, or the trace
+#           starts again with "loop".
+class TraceSource:
+    def __init__(self, filename, columns, time_column="time", speed=1, loop=False, chunk_rows=DEFAULT_TRACE_CHUNK_ROWS):
+        self.filename = filename
+        self.names = list(columns)
+        self.columns = [time_column] + [columns[name] for name in self.names]
+        self.speed = speed
+        self.loop = loop
+        self.chunk_rows = chunk_rows
+        self.t = None
+        self.start()
+
+
+    # FUNCTION: start
+    # PURPOSE:  (Re)starts reading the trace from the beginning
+    def start(self):
+        self.chunks = self.read_chunks()
+        self.times = np.empty(0)
+        self.values = np.empty((0, len(self.names)))
+        self.finished = False
+        self.t = None
+
+
+    # FUNCTION: read_chunks
+    # PURPOSE:  Generator of (times, values) arrays, one per chunk of the trace file
+    def read_chunks(self):
+        if self.filename.endswith(".parquet"):
+            if pq is None:
+                raise ModuleNotFoundError("pyarrow is required for parquet traces")
+            for batch in pq.ParquetFile(self.filename).iter_batches(batch_size=self.chunk_rows, columns=self.columns):
+                chunk = np.column_stack([batch.column(index).to_numpy().astype(float) for index in range(len(self.columns))])
+                yield chunk[:, 0], chunk[:, 1:]
+            return
+
+        with open(self.filename, "r") as trace_file:
+            header = trace_file.readline().strip().split(",")
+            usecols = [header.index(column) for column in self.columns]
+            while True:
+                # numpy warns when it reaches the end of the file
+                with warnings.catch_warnings():
+                    warnings.simplefilter("ignore")
+                    chunk = np.loadtxt(trace_file, delimiter=",", usecols=usecols, max_rows=self.chunk_rows, ndmin=2)
+                if not chunk.size:
+                    return
+                yield chunk[:, 0], chunk[:, 1:]
+
 
+    # FUNCTION: load
+    # PURPOSE:  Reads chunks until the buffer covers time t (keeping the last row of the previous
+    #           chunk, so values can be interpolated across chunk boundaries)
+    def load(self, t):
+        while not self.finished and (len(self.times) == 0 or self.times[-1] < t):
+            try:
+                times, values = next(self.chunks)
+            except StopIteration:
+                self.finished = True
+                break
+            self.times = np.concatenate([self.times[-1:], times])
+            self.values = np.concatenate([self.values[-1:], values])
 
-# FUNCTION: output_data
-# PURPOSE:  Handles writing the physical values into the SQLite database. Only used with output
-#           interactions.
-def output_data(configs, physical_values):
-    # connect to hardware SQLite database
-    conn = sqlite3.connect("physical_interactions.db")
-    cursor = conn.cursor()
-    hil = configs["database"]["table"]
+
+    # FUNCTION: step
+    # PURPOSE:  Advances the trace by dt and sets the interpolated values (a tick engine step)
+    def step(self, state, dt):
+        if self.t is None:
+            self.load(-np.inf)
+            if len(self.times) == 0:
+                return
+            self.t = self.times[0]
+        else:
+            self.t += dt * self.speed
+        self.load(self.t)
+
+        # start again at the end of the trace
+        if self.finished and self.t > self.times[-1] and self.loop:
+            self.start()
+            self.step(state, 0)
+            return
+
+        index = min(max(np.searchsorted(self.times, self.t, side="right"), 1), len(self.times) - 1)
+        if len(self.times) == 1 or self.t >= self.times[-1]:
+            row = self.values[-1]
+        else:
+            t0, t1 = self.times[index - 1], self.times[index]
+            weight = 0 if t1 == t0 else (self.t - t0) / (t1 - t0)
+            row = self.values[index - 1] + (self.values[index] - self.values[index - 1]) * weight
+        state.set_vector(self.names, row)
+
+
+
+# CLASS:    TickEngine
+# PURPOSE:  Fixed timestep physics engine. Logic modules register step(state, dt) functions,
+#           which the engine calls in registration order on a deterministic fixed timestep (a
+#           step can run every few ticks with a longer "period"). The simulated time only
+#           advances in whole ticks, so the physics do not depend on thread timing or CPU load.
+#           Ticks that start late are counted as overruns and run back to back to catch up; if
+#           the engine falls more than "max_catch_up" ticks behind, the missed ticks are dropped
+#           (counted) rather than run in a burst. Ticks follow the simulation clock, so a time
+#           scale of 10 runs ten ticks in the wall-clock time of one.
+class TickEngine:
+    def __init__(self, state, timestep=DEFAULT_ENGINE["timestep"], max_catch_up=DEFAULT_ENGINE["max_catch_up"], ode_configs=None, start_delay=DEFAULT_ENGINE["start_delay"]):
+        self.state = state
+        self.timestep = timestep
+        self.max_catch_up = max_catch_up
+        self.start_delay = start_delay
+        self.ode_configs = ode_configs or {}
+        self.steps = []
+        self.tick = 0
+        self.overruns = 0
+        self.dropped = 0
+        self.max_lag = 0
+
+
+    # FUNCTION: register
+    # PURPOSE:  Registers a step(state, dt) function. It is called every "period" seconds
+    #           (rounded to a whole number of ticks, default every tick) with dt = that period.
+    def register(self, step, period=None):
+        every = 1 if period is None else max(1, round(period / self.timestep))
+        self.steps.append((step, every, every * self.timestep))
+
+
+    # FUNCTION: register_ode
+    # PURPOSE:  Registers continuous dynamics: the physical values "names" are integrated with
+    #           derivatives(t, y, state) -> dy/dt every "period" seconds (default every tick). The
+    #           solver, rtol and atol default to the HIL's "engine" configuration. Returns the model.
+    def register_ode(self, names, derivatives, solver=None, period=None, substeps=1):
+        model = ODEModel(
+            names,
+            derivatives,
+            solver=solver or self.ode_configs.get("solver", DEFAULT_ENGINE["solver"]),
+            substeps=substeps,
+            rtol=self.ode_configs.get("rtol", DEFAULT_ENGINE["rtol"]),
+            atol=self.ode_configs.get("atol", DEFAULT_ENGINE["atol"]),
+        )
+        self.register(model.step, period)
+        return model
+
+
+    # FUNCTION: register_trace
+    # PURPOSE:  Registers a recorded trace file (in the "traces/" directory of the configuration)
+    #           that drives the physical values given by "columns" (physical value name -> trace
+    #           column). Returns the trace source.
+    def register_trace(self, filename, columns, time_column="time", speed=1, loop=False, period=None):
+        source = TraceSource(f"{TRACE_DIRECTORY}/{filename}", columns, time_column, speed, loop)
+        self.register(source.step, period)
+        return source
+
+
+    # FUNCTION: register_signal
+    # PURPOSE:  Registers a precomputed signal (see signals.py) that sets the physical value "name"
+    #           every "period" seconds (default every tick), sampled at the engine time
+    def register_signal(self, name, signal, period=None):
+        def step(state, dt):
+            state[name] = signal.sample(self.tick * self.timestep)
+        step.__name__ = f"signal_{name}"
+        self.register(step, period)
+
+
+    # FUNCTION: step_once
+    # PURPOSE:  Advances the simulation by a single tick: applies the staged inputs, runs the due
+    #           steps and publishes the resulting state
+    def step_once(self):
+        self.state.apply_inputs()
+        for step, every, dt in self.steps:
+            if self.tick % every == 0:
+                try:
+                    step(self.state, dt)
+                except Exception as e:
+                    logging.error(f"Error: physics step {step.__name__} failed: {e}")
+        self.state.publish()
+        self.tick += 1
+
+
+    # FUNCTION: run
+    # PURPOSE:  Runs the engine forever on its fixed timestep, after waiting "start_delay"
+    #           simulated seconds (e.g. for the rest of the simulation to boot)
+    def run(self):
+        utils.clock.sleep(self.start_delay)
+        next_tick = utils.clock.monotonic()
+        last_stats = time.monotonic()
+        while True:
+            self.step_once()
+            next_tick += self.timestep
+
+            lag = utils.clock.monotonic() - next_tick
+            if lag > 0:
+                # the tick ran late: catch up (or drop the ticks if too far behind)
+                self.overruns += 1
+                self.max_lag = max(self.max_lag, lag)
+                if lag > self.max_catch_up * self.timestep:
+                    missed = int(lag / self.timestep)
+                    self.dropped += missed
+                    next_tick += missed * self.timestep
+            else:
+                utils.clock.sleep(-lag)
+
+            if time.monotonic() - last_stats >= STATS_INTERVAL:
+                logging.info(f"Tick engine: {self.stats()}")
+                last_stats = time.monotonic()
+
+
+    # FUNCTION: stats
+    # PURPOSE:  Returns the tick counts
+    def stats(self):
+        return {
+            "ticks": self.tick,
+            "overruns": self.overruns,
+            "dropped": self.dropped,
+            "max_lag": round(self.max_lag, 4),
+        }
+
+
+
+# FUNCTION: run_logic
+# PURPOSE:  Runs the HIL logic. Logic modules that define register(engine, physical_values) are
+#           driven by the tick engine; older modules that define logic(physical_values) run their
+#           own threads.
+def run_logic(configs, physical_values):
+    if hasattr(logic, "register"):
+        engine_configs = DEFAULT_ENGINE | configs.get("engine", {})
+        engine = TickEngine(physical_values, engine_configs["timestep"], engine_configs["max_catch_up"], engine_configs, engine_configs["start_delay"])
+        logic.register(engine, physical_values)
+        engine.run()
+    else:
+        logic.logic(physical_values)
+
+
+
+# FUNCTION: get_sync_schedule
+# PURPOSE:  Groups the physical values by direction and sync period (the "sync_period" of each
+#           physical value, defaulting to the "publish_interval" of the "engine" configuration for
+#           outputs and "input_interval" for inputs). Returns a heap of [due, order, io, period,
+#           names] entries, all due straight away.
+def get_sync_schedule(configs):
+    engine_configs = DEFAULT_ENGINE | configs.get("engine", {})
+    default_periods = {
+        "input": engine_configs["input_interval"],
+        "output": engine_configs["publish_interval"],
+    }
+
+    groups = {}
+    for physical_value in configs["database"]["physical_values"]:
+        io = physical_value["io"]
+        period = physical_value.get("sync_period", default_periods[io])
+        groups.setdefault((io, period), []).append(physical_value["name"])
+
+    now = utils.clock.monotonic()
+    schedule = [[now, order, io, period, names] for order, ((io, period), names) in enumerate(groups.items())]
+    heapq.heapify(schedule)
+    return schedule
+
+
+
+# FUNCTION: sync_data
+# PURPOSE:  Handles the physical database interactions in a single timer loop: each group of
+#           physical values is synced on its own period, so fast values stay fresh while slow ones
+#           cause no redundant I/O. Due input values are read in a single query (staged for the
+#           next tick). Due output values are taken from a consistent snapshot and only written
+#           when they change by more than their deadband (or the heartbeat is due), all in a single
+#           transaction. Between syncs, a change notification for an input value reads the inputs
+#           straight away. The write counts are logged every STATS_INTERVAL seconds.
+def sync_data(configs, physical_values):
+    # connect to the physical layer store
+    store = physical.open_store(configs)
+    change_filter = physical.create_change_filter(configs)
+    deadbands = {physical_value["name"]: physical_value.get("deadband") for physical_value in configs["database"]["physical_values"]}
+    input_names = [physical_value["name"] for physical_value in configs["database"]["physical_values"] if physical_value["io"] == "input"]
+    notifier = physical.create_notifier(configs, input_names)
+    schedule = get_sync_schedule(configs)
+    last_stats = time.monotonic()
+
+    # in lockstep mode, timestamps and heartbeats follow the virtual simulation clock
+    if utils.clock.virtual:
+        store.now = utils.clock.time
+        change_filter.now = utils.clock.monotonic
 
     while True:
-        for physical_value in configs["database"]["physical_values"]:
-            table = physical_value["name"]
-            if physical_value["io"] == "output":
-                cursor.execute(f"INSERT INTO {table}(value, hil) VALUES(?, ?)", (physical_values[physical_value['name']], hil))
-                conn.commit()
-        time.sleep(0.3)
+        # collect the due groups and schedule their next sync (missed syncs are skipped)
+        now = utils.clock.monotonic()
+        due_names = {"input": [], "output": []}
+        while schedule and schedule[0][0] <= now:
+            entry = heapq.heappop(schedule)
+            due_names[entry[2]].extend(entry[4])
+            entry[0] = max(entry[0] + entry[3], now)
+            heapq.heappush(schedule, entry)
+
+        # read the due input values in a single query
+        if due_names["input"]:
+            read_inputs(store, physical_values, due_names["input"])
+
+        # write the changed due output values in a single transaction
+        if due_names["output"]:
+            snapshot = physical_values.snapshot()
+            changed_values = {}
+            for name in due_names["output"]:
+                # outputs the logic has not set yet (e.g. during the engine's start delay) are
+                # not written, as with None inputs in read_inputs
+                if snapshot[name] is None:
+                    continue
+                if change_filter.should_write(name, snapshot[name], deadbands[name]):
+                    changed_values[name] = snapshot[name]
+            if changed_values:
+                store.write_values(changed_values)
+                notifier.publish(list(changed_values))
+
+        if time.monotonic() - last_stats >= STATS_INTERVAL:
+            logging.info(f"Physical layer writes: {change_filter.stats()}")
+            last_stats = time.monotonic()
+
+        # wait for the next group, or for an input value to change (not in lockstep mode, where
+        # the virtual time only moves in steps)
+        if not schedule:
+            return
+        timeout = schedule[0][0] - utils.clock.monotonic()
+        if timeout <= 0:
+            continue
+        if utils.clock.virtual or not input_names:
+            utils.clock.sleep(timeout)
+        elif notifier.wait(timeout, timeout):
+            read_inputs(store, physical_values, input_names)
+
 
 
+# FUNCTION: read_inputs
+# PURPOSE:  Reads input values from the physical layer store and stages them for the next tick
+#           (a failed read is logged, and the values are read again at the next sync)
+def read_inputs(store, physical_values, names):
+    try:
+        inputs = {name: value for name, value in store.read_values(names).items() if value is not None}
+    except Exception as e:
+        logging.error(f"Error: couldn't read physical input values: {e}")
+        return
+    physical_values.write_inputs(inputs)
 
-# FUNCTION: input_data
-# PURPOSE:  Monitors physical database interactions for input interactions.
-def input_data(configs, physical_values):
-    # connect to hardware SQLite database
-    conn = sqlite3.connect("physical_interactions.db")
-    cursor = conn.cursor()
+
+
+# FUNCTION: retain_history
+# PURPOSE:  Periodically applies the history retention policy to this HIL's physical values.
+#           Only used when history is recorded and a retention policy is configured. When
+#           archiving is configured too, rows are only downsampled and deleted once archived.
+def retain_history(configs):
+    # connect to the physical layer store
+    store = physical.open_store(configs)
+    retention = configs["physical_layer"]["retention"]
+    interval = retention.get("interval", physical.DEFAULT_RETENTION["interval"])
+    names = [physical_value["name"] for physical_value in configs["database"]["physical_values"]]
+    archived = "archive" in configs["physical_layer"]
 
     while True:
-        for physical_value in configs["database"]["physical_values"]:
-            table = physical_value["name"]
-            if physical_value["io"] == "input":
-                cursor.execute(f"SELECT value FROM {table} ORDER BY timestamp DESC LIMIT 1")
-                value = cursor.fetchone()
-                conn.commit()
+        time.sleep(interval)
+        try:
+            max_seq = archive.read_index(get_archive_dataset(configs))["last_seq"] if archived else None
+            store.apply_retention(names, retention, max_seq)
+        except Exception as e:
+            logging.error(f"Error: couldn't apply history retention: {e}")
+
+
 
-                if value and value[0] not in (None, ""):
-                    physical_values[physical_value['name']] = int(float(value[0]))
-        time.sleep(0.3)
+# FUNCTION: get_archive_dataset
+# PURPOSE:  Returns the archive dataset (directory) of this HIL's physical history
+def get_archive_dataset(configs):
+    return f"{archive.ARCHIVE_DIRECTORY}/{configs['database']['table']}"
+
+
+
+# FUNCTION: export_history
+# PURPOSE:  Periodically exports this HIL's physical history into its columnar archive dataset.
+#           Only used when history is recorded and archiving is configured.
+def export_history(configs):
+    # connect to the physical layer store
+    store = physical.open_store(configs)
+    policy = configs["physical_layer"]["archive"]
+    interval = policy.get("interval", archive.DEFAULT_ARCHIVE["interval"])
+    names = [physical_value["name"] for physical_value in configs["database"]["physical_values"]]
+    dataset = get_archive_dataset(configs)
+
+    while True:
+        time.sleep(interval)
+        try:
+            rows = archive.archive_history(store.conn, dataset, names, policy)
+            logging.info(f"Archived {rows} physical history rows")
+        except Exception as e:
+            logging.error(f"Error: couldn't archive physical history: {e}")
 
 
 
 # FUNCTION: main
 # PURPOSE:  The main execution
-async def main():
-    configs = utils.retrieve_configs("config.json")
+async def main(configs=None):
+    # retrieve configurations from the given JSON (will be in the same directory), unless they are
+    # passed in by the headless runner
+    if configs is None:
+        configs = utils.retrieve_configs("config.json")
+    utils.configure_clock(configs)
     logging.info(f"Starting HIL")
 
-    # create a dictionary to represent the different physical values
-    physical_values = {}
-    for value in configs["database"]["physical_values"]:
-        # initialise all physical values to just be an empty string (the key matters more)
-        physical_values[value["name"]] = ""
+    # create the state of the different physical values (all unset until the logic sets them);
+    # thread based logic has no ticks, so its state is published on every snapshot
+    physical_values = PhysicalState(configs["database"]["physical_values"], auto_publish=not hasattr(logic, "register"))
+
+    # the logic thread is started before the database thread, so when they wake up at the same
+    # time in lockstep mode a tick is published straight away (inputs are staged for the next tick)
 
     # begin physical logic simulation thread
-    logic_thread = Thread(target=logic.logic, args=(physical_values,))
+    logic_thread = Thread(target=run_logic, args=(configs, physical_values))
     logic_thread.daemon = True
     logic_thread.start()
 
-    # begin the database output writing thread
-    db_in_thread = Thread(target=output_data, args=(configs, physical_values))
-    db_in_thread.daemon = True
-    db_in_thread.start()
+    # begin the database thread (reads input values and writes output values)
+    db_thread = Thread(target=sync_data, args=(configs, physical_values))
+    db_thread.daemon = True
+    db_thread.start()
+
+    # only the backends that support history (sqlite) record it, so retention and archiving are
+    # skipped on the others
+    physical_layer = configs.get("physical_layer", {})
+    history_recorded = physical_layer.get("history", False) and physical.get_backend(configs).supports_history
+    if physical_layer.get("history", False) and not history_recorded:
+        logging.warning(f"The {physical_layer['backend']} physical store backend records no history: history, retention and archiving are disabled")
+
+    # begin the history retention thread (if history is recorded and a retention policy is configured)
+    if history_recorded and "retention" in physical_layer:
+        retention_thread = Thread(target=retain_history, args=(configs,), daemon=True)
+        retention_thread.start()
+
+    # begin the history archive thread (if history is recorded and archiving is configured)
+    if history_recorded and "archive" in physical_layer:
+        archive_thread = Thread(target=export_history, args=(configs,), daemon=True)
+        archive_thread.start()
 
-    # begin database input reading thread
-    db_out_thread = Thread(target=input_data, args=(configs, physical_values))
-    db_out_thread.daemon = True
-    db_out_thread.start()
+    # take part in (and, for the first HIL, coordinate) the lockstep co-simulation (if configured)
+    if "lockstep" in configs:
+        if configs["lockstep"]["coordinator"] == configs["lockstep"]["name"]:
+            coordinator_thread = Thread(target=lockstep.coordinate, args=(configs,), daemon=True)
+            coordinator_thread.start()
+        lockstep_thread = Thread(target=lockstep.participate, args=(configs, "hil", utils.clock), daemon=True)
+        lockstep_thread.start()
 
     # wait for threads
     logic_thread.join()
-    db_in_thread.join()
-    db_out_thread.join()
+    db_thread.join()
     
 
 if __name__ == "__main__":
@@ -44,7 +44,6 @@ import utils
 from flask import Flask, jsonify
 from threading import Thread
 from pymodbus.datastore import ModbusSequentialDataBlock, ModbusDeviceContext, ModbusServerContext
-from pymodbus.client.base import ModbusBaseClient
 
 logging.basicConfig(level=logging.INFO, format='%(levelname)s - %(message)s')
 logging.getLogger('werkzeug').setLevel(logging.ERROR)
@@ -91,69 +90,18 @@ def init_outbound_cons(configs):
 
 
 
-# FUNCTION: monitor
-# PURPOSE:  A monitor thread to continuously read data from a defined and intialised connection
-def monitor(value_config, monitor_configs, modbus_con : ModbusBaseClient, values):
-    logging.info(f"Starting Monitor: {monitor_configs['id']}")
-    interval = monitor_configs["interval"]
-    value_type = monitor_configs["value_type"]
-    out_address = monitor_configs["address"]
-    count = monitor_configs["count"]
-
-    while True:
-        try:
-            # select the correct function
-            if value_type == "coil":
-                response_values = modbus_con.read_coils(out_address-1, count=count).bits
-                values["co"].setValues(value_config["address"], response_values)
-            elif value_type == "discrete_input":
-                response_values = modbus_con.read_discrete_inputs(out_address-1, count=count).bits
-                values["di"].setValues(value_config["address"], response_values)
-            elif value_type == "holding_register":
-                response_values = modbus_con.read_holding_registers(out_address-1, count=count).registers
-                values["hr"].setValues(value_config["address"], response_values)
-            elif value_type == "input_register":
-                response_values = modbus_con.read_input_registers(out_address-1, count=count).registers
-                values["ir"].setValues(value_config["address"], response_values)
-        except:
-            logging.error("Error: couldn't read values")
-
-
-        time.sleep(interval)
-
-
-
 # FUNCTION: start_monitors
-# PURPOSE:  Started all of the monitor threads. Note that more than one monitor can
-#           utilise a single connection (but there must be a connection!).
+# PURPOSE:  Started all of the monitor threads, one per block read planned from the monitor
+#           configurations. Note that more than one monitor can utilise a single connection (but
+#           there must be a connection!).
 def start_monitors(configs, outbound_cons, values):
     monitor_threads = []
-    for monitor_config in configs["monitors"]:
-        # get the outbound connection (Modbus object) for the monitor
-        outbound_con_id = monitor_config["outbound_connection_id"]
-        modbus_con = outbound_cons[outbound_con_id]
-
-        # get the address of the internal register to write to
-        value_config = {}
-        if monitor_config["value_type"] == "coil":
-            for co in configs["registers"]["coil"]:
-                if co["id"] == monitor_config["id"]:
-                    value_config = co
-        elif monitor_config["value_type"] == "discrete_input":
-            for di in configs["registers"]["discrete_input"]:
-                if di["id"] == monitor_config["id"]:
-                    value_config = di
-        elif monitor_config["value_type"] == "holding_register":
-            for hr in configs["registers"]["holding_register"]:
-                if hr["id"] == monitor_config["id"]:
-                    value_config = hr
-        elif monitor_config["value_type"] == "input_register":
-            for ir in configs["registers"]["input_register"]:
-                if ir["id"] == monitor_config["id"]:
-                    value_config = ir
+    for block in utils.plan_monitor_reads(configs):
+        # get the outbound connection (Modbus object) for the block
+        modbus_con = outbound_cons[block["outbound_connection_id"]]
 
         # start the monitor threads
-        monitor_thread = Thread(target=monitor, args=(value_config, monitor_config, modbus_con, values), daemon=True)
+        monitor_thread = Thread(target=utils.monitor, args=(block, modbus_con, values), daemon=True)
         monitor_thread.start()
 
         monitor_threads.append(monitor_thread)
@@ -165,21 +113,24 @@ def start_monitors(configs, outbound_cons, values):
 @app.route("/registers", methods=['GET'])
 def get_registers_route():
     global register_values
-    return jsonify(register_values)
+    return jsonify(utils.get_register_snapshot(register_values))
 
 
 # define function to run flask in another thread
-def flask_app(flask_app):
-    flask_app.run(host="0.0.0.0", port=1111)
+def flask_app(flask_app, port=utils.API_PORT):
+    flask_app.run(host=utils.BIND_ADDRESS, port=port)
 
 
 # FUNCTION: main
 # PURPOSE:  The main execution
-async def main():
+async def main(configs=None):
     global register_values
     
-    # retrieve configurations from the given JSON (will be in the same directory)
-    configs = utils.retrieve_configs("config.json")
+    # retrieve configurations from the given JSON (will be in the same directory), unless they are
+    # passed in by the headless runner
+    if configs is None:
+        configs = utils.retrieve_configs("config.json")
+    utils.configure_clock(configs)
     logging.info(f"Starting HMI")
 
     # create device context (by default will have all address ranges)
@@ -194,21 +145,17 @@ async def main():
     values = {"co": co, "di": di, "hr": hr, "ir": ir}
     inbound_cons = asyncio.create_task(init_inbound_cons(configs, context))
 
-    # start any outbound connections
-    outbound_cons = init_outbound_cons(configs)
+    # start any outbound connections (in a thread, so the inbound servers start meanwhile)
+    outbound_cons = await asyncio.to_thread(init_outbound_cons, configs)
 
     # start any configured monitors using the started outbound connections
     monitor_threads = start_monitors(configs, outbound_cons, values)
 
-    # create a dictionary representing all register values
-    register_values = utils.create_register_values_dict(configs)
+    # create a dictionary representing all register values (backed by the datastore)
+    register_values = utils.create_register_values_dict(configs, values)
 
-    # start a thread to continously update the registers dictionary
-    sync_registers = Thread(target=utils.update_register_values, args=(register_values, values), daemon=True)
-    sync_registers.start()
-    
     # start the flask endpoint
-    flask_thread = Thread(target=flask_app, args=(app,), daemon=True)
+    flask_thread = Thread(target=flask_app, args=(app, configs.get("api_port", utils.API_PORT)), daemon=True)
     flask_thread.start()
 
     # block on all asyncio and threads
@@ -217,7 +164,6 @@ async def main():
         monitor_thread.join()
     for outbound_con in outbound_cons.values():
         outbound_con.close()
-    sync_registers.join()
     flask_thread.join()
 
     # block (useful if no threads are running for some reason)
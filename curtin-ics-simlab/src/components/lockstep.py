@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+
+# -----------------------------------------------------------------------------
+# Project: Curtin ICS-SimLab
+# File: lockstep.py
+#
+# Copyright (c) 2025 Jaxson Brown, Curtin University
+#
+# Licensed under the MIT License. You may obtain a copy of the License at:
+#     https://opensource.org/licenses/MIT
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+# This work is supported by a Cross-Campus Cyber Security Research Project
+# funded by **Curtin University**
+#
+# Author: Jaxson Brown
+# Organisation: Curtin University
+# Last Modified: 2025-08-27
+# -----------------------------------------------------------------------------
+
+
+# FILE PURPOSE: Lockstep co-simulation. Instead of running in real time, the HILs, sensors, PLCs
+#               and actuators advance together in discrete steps of virtual time, as fast as they
+#               can compute. A coordinator (run by the first HIL) drives every step through the
+#               phases HIL -> sensor -> PLC -> actuator, one component at a time and in
+#               configuration order, so values propagate HIL -> sensor -> PLC -> actuator -> HIL
+#               within a step and two runs of the same configuration produce identical traces.
+#
+#               In its turn, a component advances its (virtual) simulation clock to the end of
+#               the step, which runs every thread whose sleep ends within the step (see SimClock
+#               in utils.py). Components talk to the coordinator with datagrams over unix domain
+#               sockets in the shared "lockstep/" communications directory:
+#                   participant -> coordinator: "ready" (once), "done <step>"
+#                   coordinator -> participant: "go <step>"
+
+import logging
+import os
+import socket
+import time
+
+# GLOBAL VARIABLES
+LOCKSTEP_DIRECTORY = "lockstep"
+COORDINATOR_SOCKET = "coordinator.sock"
+PHASES = ["hil", "sensor", "plc", "actuator"]
+DEFAULT_STEP = 0.1
+MAX_MESSAGE_SIZE = 1024
+
+# how long (wall-clock seconds) a participant lets its threads start before announcing itself
+SETTLE_TIME = 1
+
+# how often (wall-clock seconds) the coordinator logs its progress or warns about a stall
+STATS_INTERVAL = 60
+STALL_WARNING = 10
+
+
+
+# FUNCTION: get_socket_path
+# PURPOSE:  Returns the socket path of a participant
+def get_socket_path(phase, name):
+    return os.path.join(LOCKSTEP_DIRECTORY, f"{phase}-{name}.sock")
+
+
+
+# FUNCTION: bind_socket
+# PURPOSE:  Binds a datagram socket to a path in the lockstep directory (replacing a stale one)
+def bind_socket(path):
+    if os.path.exists(path):
+        os.unlink(path)
+    lockstep_socket = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+    lockstep_socket.bind(path)
+    return lockstep_socket
+
+
+
+# FUNCTION: participate
+# PURPOSE:  Takes part in the lockstep co-simulation as the given phase ("hil", "sensor", "plc"
+#           or "actuator"). Announces the component to the coordinator, then advances the
+#           component's (virtual) simulation clock by one step whenever it is this component's
+#           turn. Blocks forever.
+def participate(configs, phase, clock):
+    lockstep = configs["lockstep"]
+    step = lockstep.get("step", DEFAULT_STEP)
+    lockstep_socket = bind_socket(get_socket_path(phase, lockstep["name"]))
+    coordinator = os.path.join(LOCKSTEP_DIRECTORY, COORDINATOR_SOCKET)
+
+    # let the component's threads reach their first sleep, then announce (the coordinator may
+    # not be up yet)
+    time.sleep(SETTLE_TIME)
+    while True:
+        try:
+            lockstep_socket.sendto(b"ready", coordinator)
+            break
+        except OSError:
+            time.sleep(0.5)
+    logging.info(f"Lockstep: {phase} {lockstep['name']} is ready")
+
+    while True:
+        message = lockstep_socket.recv(MAX_MESSAGE_SIZE).decode("utf-8").split()
+        if message[0] != "go":
+            continue
+        step_number = int(message[1])
+        clock.advance(step_number * step)
+        lockstep_socket.sendto(f"done {step_number}".encode("utf-8"), coordinator)
+
+
+
+# FUNCTION: coordinate
+# PURPOSE:  Coordinates the lockstep co-simulation. Waits for every participant to be ready, then
+#           runs the configured number of steps ("steps", forever by default), sending each
+#           participant its turn and waiting for it to finish before moving on.
+def coordinate(configs):
+    lockstep = configs["lockstep"]
+    max_steps = lockstep.get("steps")
+    participants = sorted(lockstep["participants"], key=lambda participant: PHASES.index(participant[0]))
+    paths = [get_socket_path(phase, name) for phase, name in participants]
+    lockstep_socket = bind_socket(os.path.join(LOCKSTEP_DIRECTORY, COORDINATOR_SOCKET))
+    lockstep_socket.settimeout(STALL_WARNING)
+
+    # wait for every participant
+    waiting = set(paths)
+    while waiting:
+        try:
+            message, sender = lockstep_socket.recvfrom(MAX_MESSAGE_SIZE)
+        except socket.timeout:
+            logging.info(f"Lockstep: waiting for {len(waiting)} participants: {sorted(waiting)}")
+            continue
+        if message == b"ready":
+            waiting.discard(sender)
+    logging.info(f"Lockstep: all {len(paths)} participants are ready, starting")
+
+    step_number = 0
+    started = time.monotonic()
+    last_stats = started
+    while max_steps is None or step_number < max_steps:
+        step_number += 1
+        for path in paths:
+            lockstep_socket.sendto(f"go {step_number}".encode("utf-8"), path)
+
+            # wait for the participant to finish its turn
+            done = f"done {step_number}".encode("utf-8")
+            while True:
+                try:
+                    message, sender = lockstep_socket.recvfrom(MAX_MESSAGE_SIZE)
+                except socket.timeout:
+                    logging.warning(f"Lockstep: still waiting for {path} to finish step {step_number}")
+                    continue
+                if message == done and sender == path:
+                    break
+
+        if time.monotonic() - last_stats >= STATS_INTERVAL:
+            elapsed = time.monotonic() - started
+            logging.info(f"Lockstep: {step_number} steps in {elapsed:.1f} seconds ({step_number / elapsed:.1f} steps/second)")
+            last_stats = time.monotonic()
+
+    logging.info(f"Lockstep: finished {step_number} steps in {time.monotonic() - started:.1f} seconds")
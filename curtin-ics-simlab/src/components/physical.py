@@ -0,0 +1,934 @@
+#!/usr/bin/env python3
+
+# -----------------------------------------------------------------------------
+# Project: Curtin ICS-SimLab
+# File: physical.py
+#
+# Copyright (c) 2025 Jaxson Brown, Curtin University
+#
+# Licensed under the MIT License. You may obtain a copy of the License at:
+#     https://opensource.org/licenses/MIT
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+# This work is supported by a Cross-Campus Cyber Security Research Project
+# funded by **Curtin University**
+#
+# Author: Jaxson Brown
+# Organisation: Curtin University
+# Last Modified: 2025-08-27
+# -----------------------------------------------------------------------------
+
+
+# FILE PURPOSE: Implements the physical layer shared by the HILs, sensors, actuators and the UI.
+#               The physical layer is a store of the current value of every physical value. It
+#               is sharded per HIL: each HIL's values live in their own file in the "physical/"
+#               directory on the shared communications volume ("physical/<hil name>.db" or
+#               ".mmap"), and sensors and actuators only open the shard of their HIL, so
+#               unrelated subsystems never contend for the same lock. Values are typed ("int",
+#               "real" or "bool", set with "type" on the HIL's physical values, default "real")
+#               and are converted to their type when they are written. The backend is chosen in
+#               the configuration with "physical_layer": {"backend": ...}:
+#
+#               "sqlite" (default) - Databases use write-ahead logging (WAL), so readers never
+#                   block the writer, and connections are tuned with "physical_layer":
+#                   {"connection": ...} (busy_timeout, mmap_size, cache_size, synchronous). Every
+#                   physical value owns a single keyed row in the "physical_state" table, updated
+#                   in place (UPSERT). A history of every update can optionally be recorded in the
+#                   "physical_history" side table (enabled with "physical_layer": {"history":
+#                   true}). History rows are ordered by a monotonic sequence number and carry a
+#                   high resolution timestamp (seconds since the epoch as a REAL), both of which
+#                   are indexed. History can be bounded with a retention policy
+#                   ("physical_layer": {"retention": {...}}) that downsamples old rows into
+#                   min/max/mean buckets ("physical_history_buckets") and vacuums incrementally.
+#
+#               "mmap" - A memory-mapped file with a fixed slot per physical value. Writers
+#                   update a slot under a seqlock (an even/odd version counter), so readers never
+#                   block writers and reads involve no SQL parsing or locking. No history is
+#                   recorded.
+#
+#               "memory" - A dictionary per shard shared by everything in the same process (used
+#                   by the headless runner, which runs the whole simulation in one process). No
+#                   history is recorded.
+#
+#               Writers report by exception: a value is only written when it changes by more than
+#               its deadband, or when the heartbeat interval has passed since it was last written
+#               ("physical_layer": {"deadband": 0, "heartbeat": 5}).
+#
+#               Writers publish the names of the values they change on a Unix-domain datagram
+#               socket directory on the shared communications volume ("notify/"), so readers wake
+#               as soon as a value they care about changes. Polling is kept as a fallback.
+
+import fcntl
+import mmap
+import os
+import select
+import socket
+import sqlite3
+import struct
+import threading
+import time
+
+# GLOBAL VARIABLES
+STORE_DIRECTORY = "physical"
+NOTIFY_DIRECTORY = "notify"
+DEFAULT_HEARTBEAT = 5
+DEFAULT_FALLBACK_INTERVAL = 1
+DEFAULT_TYPE = "real"
+
+# default SQLite connection profile (see SQLiteStore.__init__)
+DEFAULT_CONNECTION = {
+    "busy_timeout": 5000,
+    "mmap_size": 67108864,
+    "cache_size": -8192,
+    "synchronous": "OFF",
+}
+
+# the value of "PRAGMA auto_vacuum" for incremental auto vacuum
+INCREMENTAL_AUTO_VACUUM = 2
+
+# default history retention policy (see SQLiteStore.apply_retention)
+DEFAULT_RETENTION = {
+    "interval": 60,
+    "max_age": None,
+    "max_rows": None,
+    "bucket": 60,
+    "bucket_max_age": None,
+    "batch_rows": 1000,
+    "vacuum_pages": 256,
+}
+
+# the physical value types (type name -> python type)
+VALUE_TYPES = {
+    "int": int,
+    "real": float,
+    "bool": bool,
+}
+
+
+
+# FUNCTION: get_value_types
+# PURPOSE:  Returns a dictionary of physical value name -> type for all HILs in the JSON
+#           configuration
+def get_value_types(json_content):
+    value_types = {}
+    for hil in json_content["hils"]:
+        for physical_value in hil["physical_values"]:
+            value_type = physical_value.get("type", DEFAULT_TYPE)
+            if value_type not in VALUE_TYPES:
+                raise KeyError(f"Unknown type for physical value {physical_value['name']}: {value_type}")
+            value_types[physical_value["name"]] = value_type
+    return value_types
+
+
+
+# FUNCTION: coerce_value
+# PURPOSE:  Converts a value to the given physical value type. Returns None for empty values.
+def coerce_value(value, value_type):
+    if value is None or value == "":
+        return None
+    if value_type == "int":
+        return int(round(float(value)))
+    elif value_type == "bool":
+        return bool(float(value))
+    return float(value)
+
+
+
+# CLASS:    SQLiteStore
+# PURPOSE:  Physical store backed by the SQLite physical interactions database
+class SQLiteStore:
+    extension = ".db"
+    # (only stores that support history define read_history, read_value_at and read_buckets)
+    supports_history = True
+
+    # clock used for timestamps (components replace it with the simulation clock in lockstep mode)
+    now = time.time
+
+    # FUNCTION: create
+    # PURPOSE:  Creates the physical interactions database for all HILs in the JSON configuration.
+    #           Each physical value gets one row in the state table. If history is enabled, a
+    #           trigger copies every state update into the history table. The database is put in
+    #           WAL mode, which is persistent, so every later connection uses it.
+    @staticmethod
+    def create(filename, json_content):
+        physical_layer = json_content.get("physical_layer", {})
+
+        conn = sqlite3.connect(filename)
+        cursor = conn.cursor()
+
+        # allow freed pages to be reclaimed a few at a time (must be set before the journal mode
+        # and before any table exists, otherwise it is silently ignored)
+        cursor.execute("PRAGMA auto_vacuum = INCREMENTAL;")
+        cursor.execute("PRAGMA journal_mode = WAL;")
+
+        # create the state tables
+        cursor.execute("CREATE TABLE hils (name TEXT PRIMARY KEY)")
+        cursor.execute(
+            """CREATE TABLE physical_state (
+                name TEXT PRIMARY KEY,
+                value,
+                type TEXT NOT NULL DEFAULT 'real',
+                timestamp REAL,
+                hil TEXT,
+                FOREIGN KEY(hil) REFERENCES hils(name)
+            )"""
+            )
+
+        # create one keyed row for every physical value
+        value_types = get_value_types(json_content)
+        for hil in json_content["hils"]:
+            cursor.execute("INSERT INTO hils(name) VALUES (?)", (hil["name"],))
+            for physical_value in hil["physical_values"]:
+                name = physical_value["name"]
+                cursor.execute("INSERT INTO physical_state(name, type, hil) VALUES (?, ?, ?)", (name, value_types[name], hil["name"]))
+
+        # create the (optional) history side table
+        if physical_layer.get("history", False):
+            cursor.execute(
+                """CREATE TABLE physical_history (
+                    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                    name TEXT,
+                    value,
+                    timestamp REAL,
+                    hil TEXT
+                )"""
+                )
+            cursor.execute("CREATE INDEX physical_history_name_seq ON physical_history(name, seq)")
+            cursor.execute("CREATE INDEX physical_history_name_timestamp ON physical_history(name, timestamp)")
+            cursor.execute(
+                """CREATE TRIGGER record_physical_history AFTER UPDATE ON physical_state
+                BEGIN
+                    INSERT INTO physical_history(name, value, timestamp, hil) VALUES (NEW.name, NEW.value, NEW.timestamp, NEW.hil);
+                END"""
+                )
+
+            # downsampled history (filled by the retention policy)
+            cursor.execute(
+                """CREATE TABLE physical_history_buckets (
+                    name TEXT,
+                    bucket_start REAL,
+                    min REAL,
+                    max REAL,
+                    mean REAL,
+                    count INTEGER,
+                    PRIMARY KEY(name, bucket_start)
+                )"""
+                )
+
+        conn.commit()
+        conn.close()
+
+
+    # FUNCTION: __init__
+    # PURPOSE:  Opens a connection to the database, tuned with the connection profile of the
+    #           "physical_layer" configuration. Read-only connections (used by the UI) can never
+    #           take the write lock.
+    def __init__(self, filename, read_only=False, physical_layer=None):
+        profile = DEFAULT_CONNECTION | (physical_layer or {}).get("connection", {})
+        if read_only:
+            self.conn = sqlite3.connect(f"file:{filename}?mode=ro", uri=True)
+        else:
+            self.conn = sqlite3.connect(filename)
+        self.conn.execute(f"PRAGMA busy_timeout = {int(profile['busy_timeout'])}")
+        self.conn.execute(f"PRAGMA mmap_size = {int(profile['mmap_size'])}")
+        self.conn.execute(f"PRAGMA cache_size = {int(profile['cache_size'])}")
+        if not read_only:
+            self.conn.execute(f"PRAGMA synchronous = {profile['synchronous']}")
+        self.types = dict(self.conn.execute("SELECT name, type FROM physical_state"))
+
+
+    # FUNCTION: write_value
+    # PURPOSE:  Writes the current value of a physical value (UPSERT on its keyed row)
+    def write_value(self, name, value):
+        self.conn.execute(
+            """INSERT INTO physical_state(name, value, timestamp) VALUES (?, ?, ?)
+            ON CONFLICT(name) DO UPDATE SET value = excluded.value, timestamp = excluded.timestamp""",
+            (name, self.coerce(name, value), self.now())
+            )
+
+
+    # FUNCTION: read_value
+    # PURPOSE:  Reads the current value of a physical value. Returns None if the value has not
+    #           been written yet.
+    def read_value(self, name):
+        row = self.conn.execute("SELECT value FROM physical_state WHERE name = ?", (name,)).fetchone()
+        if row is None:
+            return None
+        return self.coerce(name, row[0])
+
+
+    # FUNCTION: write_values
+    # PURPOSE:  Writes the current values of many physical values (a dictionary of name -> value)
+    #           in a single transaction
+    def write_values(self, values):
+        timestamp = self.now()
+        with self.conn:
+            self.conn.executemany(
+                """INSERT INTO physical_state(name, value, timestamp) VALUES (?, ?, ?)
+                ON CONFLICT(name) DO UPDATE SET value = excluded.value, timestamp = excluded.timestamp""",
+                [(name, self.coerce(name, value), timestamp) for name, value in values.items()]
+                )
+
+
+    # FUNCTION: read_values
+    # PURPOSE:  Reads the current values of many physical values in a single query. Returns a
+    #           dictionary of name -> value (None if the value has not been written yet).
+    def read_values(self, names):
+        values = dict.fromkeys(names)
+        if not names:
+            return values
+        placeholders = ", ".join("?" * len(values))
+        rows = self.conn.execute(f"SELECT name, value FROM physical_state WHERE name IN ({placeholders})", list(values))
+        for name, value in rows:
+            values[name] = self.coerce(name, value)
+        return values
+
+
+    # FUNCTION: read_history
+    # PURPOSE:  Reads the history of a physical value between the "start" and "end" timestamps
+    #           (seconds since the epoch, both optional and inclusive). If "limit" is given, only
+    #           the most recent "limit" rows are returned. Rows are (seq, timestamp, value) tuples
+    #           in sequence order. Only available when history is enabled.
+    def read_history(self, name, start=None, end=None, limit=None):
+        query = "SELECT seq, timestamp, value FROM physical_history WHERE name = ?"
+        params = [name]
+        if start is not None:
+            query += " AND timestamp >= ?"
+            params.append(start)
+        if end is not None:
+            query += " AND timestamp <= ?"
+            params.append(end)
+        query += " ORDER BY seq DESC"
+        if limit is not None:
+            query += " LIMIT ?"
+            params.append(limit)
+
+        rows = self.conn.execute(query, params).fetchall()
+        rows.reverse()
+        return [(seq, timestamp, self.coerce(name, value)) for seq, timestamp, value in rows]
+
+
+    # FUNCTION: read_value_at
+    # PURPOSE:  Reads the value a physical value had at the given timestamp (the last value written
+    #           at or before it). Returns None if there is no such value. Only available when
+    #           history is enabled.
+    def read_value_at(self, name, timestamp):
+        row = self.conn.execute(
+            "SELECT value FROM physical_history WHERE name = ? AND timestamp <= ? ORDER BY timestamp DESC, seq DESC LIMIT 1",
+            (name, timestamp)
+            ).fetchone()
+        if row is None:
+            return None
+        return self.coerce(name, row[0])
+
+
+    # FUNCTION: read_buckets
+    # PURPOSE:  Reads the downsampled history of a physical value between the "start" and "end"
+    #           timestamps (both optional and inclusive). Rows are (bucket_start, min, max, mean,
+    #           count) tuples in time order.
+    def read_buckets(self, name, start=None, end=None):
+        query = "SELECT bucket_start, min, max, mean, count FROM physical_history_buckets WHERE name = ?"
+        params = [name]
+        if start is not None:
+            query += " AND bucket_start >= ?"
+            params.append(start)
+        if end is not None:
+            query += " AND bucket_start <= ?"
+            params.append(end)
+        query += " ORDER BY bucket_start"
+        return self.conn.execute(query, params).fetchall()
+
+
+    # FUNCTION: apply_retention
+    # PURPOSE:  Applies a retention policy to the history of the given physical values. History
+    #           rows older than "max_age" seconds, or beyond the newest "max_rows" rows of a value,
+    #           are downsampled into "bucket" second min/max/mean buckets and then deleted.
+    #           Buckets older than "bucket_max_age" seconds are deleted. Work is done in
+    #           transactions of at most "batch_rows" rows so writers are never blocked for long,
+    #           and up to "vacuum_pages" free pages are returned to the file system afterwards.
+    #           Rows after "max_seq" (if given, e.g. rows not archived yet) are always kept.
+    def apply_retention(self, names, retention, max_seq=None):
+        retention = DEFAULT_RETENTION | retention
+        now = self.now()
+        self.enable_incremental_vacuum()
+
+        for name in names:
+            cutoff = self.retention_cutoff(name, now, retention["max_age"], retention["max_rows"])
+            if cutoff is not None and max_seq is not None:
+                cutoff = min(cutoff, max_seq) if max_seq > 0 else None
+            while cutoff is not None:
+                with self.conn:
+                    # find the end of this batch
+                    row = self.conn.execute(
+                        "SELECT seq FROM physical_history WHERE name = ? AND seq <= ? ORDER BY seq LIMIT 1 OFFSET ?",
+                        (name, cutoff, retention["batch_rows"] - 1)
+                        ).fetchone()
+                    batch_end = cutoff if row is None else row[0]
+
+                    # downsample the batch into buckets (merging with existing buckets), then delete it
+                    self.conn.execute(
+                        """INSERT INTO physical_history_buckets(name, bucket_start, min, max, mean, count)
+                        SELECT name, CAST(timestamp / :bucket AS INTEGER) * :bucket, MIN(value), MAX(value), AVG(value), COUNT(value)
+                        FROM physical_history WHERE name = :name AND seq <= :end AND value IS NOT NULL
+                        GROUP BY 2
+                        ON CONFLICT(name, bucket_start) DO UPDATE SET
+                            min = MIN(min, excluded.min),
+                            max = MAX(max, excluded.max),
+                            mean = (mean * count + excluded.mean * excluded.count) / (count + excluded.count),
+                            count = count + excluded.count""",
+                        {"bucket": retention["bucket"], "name": name, "end": batch_end}
+                        )
+                    self.conn.execute("DELETE FROM physical_history WHERE name = ? AND seq <= ?", (name, batch_end))
+                if batch_end == cutoff:
+                    break
+
+            if retention["bucket_max_age"] is not None:
+                with self.conn:
+                    self.conn.execute(
+                        "DELETE FROM physical_history_buckets WHERE name = ? AND bucket_start < ?",
+                        (name, now - retention["bucket_max_age"])
+                        )
+
+        # reclaim some free pages without locking the database for a full vacuum (the pragma
+        # frees one page per step, and execute() only steps a statement without result columns
+        # once, so it is run as a script, which steps it to completion)
+        self.conn.executescript(f"PRAGMA incremental_vacuum({int(retention['vacuum_pages'])});")
+
+
+    # FUNCTION: enable_incremental_vacuum
+    # PURPOSE:  Migrates a database created without incremental auto vacuum (the setting only
+    #           takes effect through a one-off full VACUUM once tables exist)
+    def enable_incremental_vacuum(self):
+        if self.conn.execute("PRAGMA auto_vacuum").fetchone()[0] != INCREMENTAL_AUTO_VACUUM:
+            self.conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+            self.conn.execute("VACUUM")
+
+
+    # FUNCTION: retention_cutoff
+    # PURPOSE:  Returns the sequence number of the newest history row of a physical value that is
+    #           outside the retention policy, or None if every row is kept
+    def retention_cutoff(self, name, now, max_age=None, max_rows=None):
+        cutoffs = []
+        if max_age is not None:
+            row = self.conn.execute(
+                "SELECT seq FROM physical_history WHERE name = ? AND timestamp < ? ORDER BY timestamp DESC, seq DESC LIMIT 1",
+                (name, now - max_age)
+                ).fetchone()
+            if row is not None:
+                cutoffs.append(row[0])
+        if max_rows is not None:
+            row = self.conn.execute(
+                "SELECT seq FROM physical_history WHERE name = ? ORDER BY seq DESC LIMIT 1 OFFSET ?",
+                (name, max_rows)
+                ).fetchone()
+            if row is not None:
+                cutoffs.append(row[0])
+        return max(cutoffs) if cutoffs else None
+
+
+    # FUNCTION: coerce
+    # PURPOSE:  Converts a value to the type of the physical value (booleans are stored as
+    #           0 / 1 by SQLite, so they are converted back on read)
+    def coerce(self, name, value):
+        return coerce_value(value, self.types.get(name, DEFAULT_TYPE))
+
+
+    # FUNCTION: commit
+    # PURPOSE:  Commits any pending writes
+    def commit(self):
+        self.conn.commit()
+
+
+    def close(self):
+        self.conn.close()
+
+
+
+# CLASS:    MmapStore
+# PURPOSE:  Physical store backed by a memory-mapped file on the shared communications volume.
+#           The file starts with a header (magic, slot count), followed by one fixed size slot
+#           per physical value:
+#               name (96 bytes, utf-8) | type (uint32) | padding (4 bytes) | version (uint64) |
+#               value (int64 for "int" and "bool", float64 for "real") | timestamp (float64)
+#           A version of 0 means the value has never been written. Writers make the version odd
+#           while they update the slot and even when they are done. Readers retry if the version
+#           is odd or changed while they were reading, yielding between attempts (a writer in
+#           another process may be descheduled mid-update), for up to READ_TIMEOUT seconds.
+class MmapStore:
+    extension = ".mmap"
+    supports_history = False
+
+    # clock used for timestamps (components replace it with the simulation clock in lockstep mode)
+    now = time.time
+
+    MAGIC = b"ICSPHYS1"
+    HEADER = struct.Struct("<8sQ")
+    SLOT = struct.Struct("<96sI4xQ8sd")
+    SLOT_TYPE = struct.Struct("<I")
+    VERSION = struct.Struct("<Q")
+    DATA = {
+        "int": struct.Struct("<qd"),
+        "real": struct.Struct("<dd"),
+        "bool": struct.Struct("<qd"),
+    }
+    TYPE_CODES = ["int", "real", "bool"]
+    NAME_SIZE = 96
+    VERSION_OFFSET = 104
+    READ_TIMEOUT = 1
+    READ_SPINS = 100
+    READ_BACKOFF = 0.001
+
+    # FUNCTION: create
+    # PURPOSE:  Creates the memory-mapped file with a slot for every physical value in the JSON
+    #           configuration.
+    @staticmethod
+    def create(filename, json_content):
+        value_types = get_value_types(json_content)
+
+        with open(filename, "wb") as mmap_file:
+            mmap_file.write(MmapStore.HEADER.pack(MmapStore.MAGIC, len(value_types)))
+            for name, value_type in value_types.items():
+                encoded_name = name.encode("utf-8")
+                if len(encoded_name) > MmapStore.NAME_SIZE:
+                    raise ValueError(f"Physical value name is too long for the mmap backend: {name}")
+                type_code = MmapStore.TYPE_CODES.index(value_type)
+                mmap_file.write(MmapStore.SLOT.pack(encoded_name, type_code, 0, bytes(8), 0.0))
+
+
+    # FUNCTION: __init__
+    # PURPOSE:  Maps the file into memory (read-only connections map it read-only). The
+    #           "physical_layer" configuration is accepted for symmetry with SQLiteStore.
+    def __init__(self, filename, read_only=False, physical_layer=None):
+        if read_only:
+            self.file = open(filename, "rb")
+            self.mm = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        else:
+            self.file = open(filename, "r+b")
+            self.mm = mmap.mmap(self.file.fileno(), 0)
+
+        # build the directory of slots (name -> offset of the slot's version, and its type)
+        magic, count = self.HEADER.unpack_from(self.mm, 0)
+        if magic != self.MAGIC:
+            raise ValueError(f"{filename} is not a physical layer mmap file")
+        self.offsets = {}
+        self.types = {}
+        for index in range(count):
+            offset = self.HEADER.size + index * self.SLOT.size
+            name = self.mm[offset:offset + self.NAME_SIZE].rstrip(b"\x00").decode("utf-8")
+            type_code = self.SLOT_TYPE.unpack_from(self.mm, offset + self.NAME_SIZE)[0]
+            self.offsets[name] = offset + self.VERSION_OFFSET
+            self.types[name] = self.TYPE_CODES[type_code]
+
+
+    # FUNCTION: write_value
+    # PURPOSE:  Writes the current value of a physical value into its slot. Only writers take a
+    #           (per slot) lock, which guards against two writers updating the same slot.
+    def write_value(self, name, value):
+        value_type = self.types[name]
+        value = coerce_value(value, value_type)
+        if value is None:
+            return
+        offset = self.offsets[name]
+        fcntl.lockf(self.file, fcntl.LOCK_EX, self.SLOT.size, offset)
+        try:
+            version = self.VERSION.unpack_from(self.mm, offset)[0]
+            self.VERSION.pack_into(self.mm, offset, version + 1)
+            self.DATA[value_type].pack_into(self.mm, offset + self.VERSION.size, value, self.now())
+            self.VERSION.pack_into(self.mm, offset, version + 2)
+        finally:
+            fcntl.lockf(self.file, fcntl.LOCK_UN, self.SLOT.size, offset)
+
+
+    # FUNCTION: read_value
+    # PURPOSE:  Reads the current value of a physical value from its slot. Returns None if the
+    #           value has not been written yet.
+    def read_value(self, name):
+        offset = self.offsets[name]
+        value_type = self.types[name]
+        data = self.DATA[value_type]
+        deadline = time.monotonic() + self.READ_TIMEOUT
+        attempts = 0
+        while True:
+            version = self.VERSION.unpack_from(self.mm, offset)[0]
+            if not version & 1:
+                value, _ = data.unpack_from(self.mm, offset + self.VERSION.size)
+                if version == self.VERSION.unpack_from(self.mm, offset)[0]:
+                    if version == 0:
+                        return None
+                    return bool(value) if value_type == "bool" else value
+            if time.monotonic() >= deadline:
+                raise TimeoutError(f"Could not get a consistent read of {name}")
+
+            # yield to the writer (first just giving up the time slice, then backing off)
+            attempts += 1
+            time.sleep(0 if attempts < self.READ_SPINS else self.READ_BACKOFF)
+
+
+    # FUNCTION: write_values
+    # PURPOSE:  Writes the current values of many physical values (a dictionary of name -> value)
+    def write_values(self, values):
+        for name, value in values.items():
+            self.write_value(name, value)
+
+
+    # FUNCTION: read_values
+    # PURPOSE:  Reads the current values of many physical values. Returns a dictionary of
+    #           name -> value (None if the value has not been written yet).
+    def read_values(self, names):
+        return {name: self.read_value(name) for name in names}
+
+
+    # FUNCTION: commit
+    # PURPOSE:  Writes are visible immediately, so there is nothing to commit
+    def commit(self):
+        pass
+
+
+    def close(self):
+        self.mm.close()
+        self.file.close()
+
+
+
+# CLASS:    MemoryStore
+# PURPOSE:  Physical store kept in memory, shared by every component in the same process. Each
+#           shard is a dictionary of name -> value registered (by absolute filename, although no
+#           file is written) when the store is created. A lock per shard makes batches of writes
+#           and reads atomic.
+class MemoryStore:
+    extension = ".memory"
+    supports_history = False
+
+    # clock used for timestamps (components replace it with the simulation clock in lockstep mode)
+    now = time.time
+
+    # the shards of the process (absolute filename -> shard)
+    shards = {}
+
+    # FUNCTION: create
+    # PURPOSE:  Registers an empty shard for all physical values in the JSON configuration
+    @staticmethod
+    def create(filename, json_content):
+        MemoryStore.shards[os.path.abspath(filename)] = {
+            "types": get_value_types(json_content),
+            "values": {},
+            "lock": threading.Lock(),
+        }
+
+
+    # FUNCTION: __init__
+    # PURPOSE:  Opens a registered shard. Read-only stores refuse writes. The "physical_layer"
+    #           configuration is accepted for symmetry with SQLiteStore.
+    def __init__(self, filename, read_only=False, physical_layer=None):
+        shard = self.shards[os.path.abspath(filename)]
+        self.types = shard["types"]
+        self.values = shard["values"]
+        self.lock = shard["lock"]
+        self.read_only = read_only
+
+
+    # FUNCTION: write_value
+    # PURPOSE:  Writes the current value of a physical value
+    def write_value(self, name, value):
+        self.write_values({name: value})
+
+
+    # FUNCTION: read_value
+    # PURPOSE:  Reads the current value of a physical value. Returns None if the value has not
+    #           been written yet.
+    def read_value(self, name):
+        with self.lock:
+            return self.values.get(name)
+
+
+    # FUNCTION: write_values
+    # PURPOSE:  Writes the current values of many physical values (a dictionary of name -> value)
+    #           in a single atomic batch
+    def write_values(self, values):
+        if self.read_only:
+            raise PermissionError("Cannot write to a read-only physical store")
+        values = {name: coerce_value(value, self.types[name]) for name, value in values.items()}
+        with self.lock:
+            self.values.update({name: value for name, value in values.items() if value is not None})
+
+
+    # FUNCTION: read_values
+    # PURPOSE:  Reads the current values of many physical values. Returns a dictionary of
+    #           name -> value (None if the value has not been written yet).
+    def read_values(self, names):
+        with self.lock:
+            return {name: self.values.get(name) for name in names}
+
+
+    # FUNCTION: commit
+    # PURPOSE:  Writes are visible immediately, so there is nothing to commit
+    def commit(self):
+        pass
+
+
+    def close(self):
+        pass
+
+
+
+# CLASS:    ChangeFilter
+# PURPOSE:  Decides whether a physical value needs to be written (report-by-exception). A value is
+#           written when it changes by more than its deadband (any change if the deadband is 0),
+#           or when "heartbeat" seconds have passed since it was last written, so liveness is
+#           still visible. Counts of written and suppressed values are kept.
+class ChangeFilter:
+    # clock used for heartbeats (components replace it with the simulation clock in lockstep mode)
+    now = time.monotonic
+
+    def __init__(self, deadband=0, heartbeat=DEFAULT_HEARTBEAT):
+        self.deadband = deadband
+        self.heartbeat = heartbeat
+        self.last_values = {}
+        self.last_writes = {}
+        self.writes = 0
+        self.suppressed = 0
+
+
+    # FUNCTION: should_write
+    # PURPOSE:  Returns True (and records the write) if the value needs to be written. The
+    #           deadband can be overridden per value.
+    def should_write(self, name, value, deadband=None):
+        if deadband is None:
+            deadband = self.deadband
+        now = self.now()
+
+        if name in self.last_values:
+            changed = has_changed(self.last_values[name], value, deadband)
+            heartbeat_due = self.heartbeat is not None and now - self.last_writes[name] >= self.heartbeat
+            if not changed and not heartbeat_due:
+                self.suppressed += 1
+                return False
+
+        self.last_values[name] = value
+        self.last_writes[name] = now
+        self.writes += 1
+        return True
+
+
+    # FUNCTION: stats
+    # PURPOSE:  Returns the write counts
+    def stats(self):
+        return {
+            "writes": self.writes,
+            "suppressed": self.suppressed,
+        }
+
+
+
+# FUNCTION: has_changed
+# PURPOSE:  Returns True if a value has changed by more than the deadband. Non-numeric values
+#           are compared for equality.
+def has_changed(previous, value, deadband=0):
+    if deadband:
+        try:
+            return abs(float(value) - float(previous)) > deadband
+        except (TypeError, ValueError):
+            pass
+    return value != previous
+
+
+
+# FUNCTION: create_change_filter
+# PURPOSE:  Creates a change filter from the "physical_layer" configuration
+def create_change_filter(configs):
+    physical_layer = configs.get("physical_layer", {})
+    return ChangeFilter(
+        deadband=physical_layer.get("deadband", 0),
+        heartbeat=physical_layer.get("heartbeat", DEFAULT_HEARTBEAT),
+    )
+
+
+
+# CLASS:    ChangeNotifier
+# PURPOSE:  Push-style change notification between containers. Every subscriber binds a datagram
+#           socket in the notification directory; publishers send the names of changed values to
+#           every socket in the directory. If the directory does not exist (or notifications are
+#           disabled), waiting falls back to plain polling.
+class ChangeNotifier:
+    REFRESH_INTERVAL = 1
+    MAX_MESSAGE_SIZE = 65536
+
+    def __init__(self, directory=NOTIFY_DIRECTORY, enabled=True, fallback_interval=DEFAULT_FALLBACK_INTERVAL, time_scale=1):
+        self.directory = directory
+        self.enabled = enabled and os.path.isdir(directory)
+        self.fallback_interval = fallback_interval
+        self.time_scale = time_scale
+        self.names = set()
+        self.path = None
+        self.subscribers = []
+        self.last_refresh = None
+        self.socket = None
+        if self.enabled:
+            self.socket = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+            self.socket.setblocking(False)
+
+
+    # FUNCTION: subscribe
+    # PURPOSE:  Subscribes to changes of the given physical values
+    def subscribe(self, names):
+        self.names = set(names)
+        if self.enabled and self.path is None:
+            self.path = os.path.join(self.directory, f"{socket.gethostname()}-{os.getpid()}-{id(self)}.sock")
+            self.socket.bind(self.path)
+
+
+    # FUNCTION: publish
+    # PURPOSE:  Notifies all subscribers that the given physical values have changed. The list of
+    #           subscribers is refreshed from the directory at most every REFRESH_INTERVAL seconds.
+    def publish(self, names):
+        if not self.enabled or not names:
+            return
+
+        now = time.monotonic()
+        if self.last_refresh is None or now - self.last_refresh >= self.REFRESH_INTERVAL:
+            self.subscribers = [entry.path for entry in os.scandir(self.directory)
+                                if entry.name.endswith(".sock") and entry.path != self.path]
+            self.last_refresh = now
+
+        message = "\n".join(names).encode("utf-8")
+        for path in self.subscribers:
+            try:
+                self.socket.sendto(message, path)
+            except OSError:
+                # subscriber has gone away or its queue is full (it will wake up anyway)
+                pass
+
+
+    # FUNCTION: wait
+    # PURPOSE:  Blocks until a subscribed value changes. Returns True if a change was notified,
+    #           or False on timeout. Without notifications this simply sleeps "poll_interval",
+    #           otherwise it waits at most "fallback_interval" seconds (or "timeout", if that is
+    #           shorter). All are simulated seconds (divided by the simulation clock's time scale).
+    def wait(self, poll_interval, timeout=None):
+        if not self.enabled or self.path is None:
+            time.sleep(poll_interval / self.time_scale)
+            return False
+
+        wait_interval = self.fallback_interval if timeout is None else min(timeout, self.fallback_interval)
+        deadline = time.monotonic() + wait_interval / self.time_scale
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            ready, _, _ = select.select([self.socket], [], [], remaining)
+            if not ready:
+                return False
+
+            # drain all pending notifications
+            notified = False
+            while True:
+                try:
+                    message = self.socket.recv(self.MAX_MESSAGE_SIZE)
+                except BlockingIOError:
+                    break
+                if self.names.intersection(message.decode("utf-8").split("\n")):
+                    notified = True
+            if notified:
+                return True
+
+
+    def close(self):
+        if self.socket is not None:
+            self.socket.close()
+        if self.path is not None and os.path.exists(self.path):
+            os.unlink(self.path)
+
+
+
+# FUNCTION: create_notifier
+# PURPOSE:  Creates a change notifier from the "physical_layer" configuration. If names are
+#           given, the notifier subscribes to changes of those physical values. Notifications
+#           are not used in lockstep mode (components are stepped in order instead).
+def create_notifier(configs, names=None):
+    physical_layer = configs.get("physical_layer", {})
+    notifier = ChangeNotifier(
+        enabled=physical_layer.get("notify", True) and "lockstep" not in configs,
+        fallback_interval=physical_layer.get("poll_interval", DEFAULT_FALLBACK_INTERVAL),
+        time_scale=configs.get("clock", {}).get("time_scale", 1),
+    )
+    if names is not None:
+        notifier.subscribe(names)
+    return notifier
+
+
+
+# the available physical store backends
+BACKENDS = {
+    "sqlite": SQLiteStore,
+    "mmap": MmapStore,
+    "memory": MemoryStore,
+}
+
+
+
+# FUNCTION: get_backend
+# PURPOSE:  Returns the physical store class selected in the configuration
+def get_backend(configs):
+    backend = configs.get("physical_layer", {}).get("backend", "sqlite")
+    if backend not in BACKENDS:
+        raise KeyError(f"Unknown physical layer backend: {backend}")
+    return BACKENDS[backend]
+
+
+
+# FUNCTION: get_shard
+# PURPOSE:  Returns the filename (relative to the communications directory) of a HIL's shard
+def get_shard(configs, hil):
+    return os.path.join(STORE_DIRECTORY, f"{hil}{get_backend(configs).extension}")
+
+
+
+# FUNCTION: create_store
+# PURPOSE:  Creates the physical store in the given directory, with one shard for each HIL in
+#           the JSON configuration. Returns the name of the store directory.
+def create_store(directory, json_content):
+    backend = get_backend(json_content)
+    os.makedirs(os.path.join(directory, STORE_DIRECTORY), exist_ok=True)
+    for hil in json_content["hils"]:
+        backend.create(os.path.join(directory, get_shard(json_content, hil["name"])), json_content | {"hils": [hil]})
+    return STORE_DIRECTORY
+
+
+
+# FUNCTION: open_shard
+# PURPOSE:  Opens the physical store shard of a HIL
+def open_shard(configs, hil, read_only=False):
+    return get_backend(configs)(get_shard(configs, hil), read_only, configs.get("physical_layer", {}))
+
+
+
+# FUNCTION: open_store
+# PURPOSE:  Opens the physical store shard of the component's HIL (the "table" of its
+#           "database" configuration)
+def open_store(configs, read_only=False):
+    return open_shard(configs, configs["database"]["table"], read_only)
+
+
+
+# FUNCTION: open_shards
+# PURPOSE:  Opens the physical store shards of every HIL in the JSON configuration (read-only
+#           by default). Returns a dictionary of HIL name -> store.
+def open_shards(json_content, read_only=True):
+    return {hil["name"]: open_shard(json_content, hil["name"], read_only) for hil in json_content["hils"]}
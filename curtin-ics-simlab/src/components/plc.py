@@ -42,13 +42,13 @@ import asyncio
 import time
 import logging
 import utils
+import lockstep
 import pymodbus
 #from utils import StateAwareSlaveContext
 from flask import Flask, jsonify
-from threading import Thread
+from threading import Thread, Lock, Event
 from pymodbus.pdu.device import ModbusDeviceIdentification
-from pymodbus.datastore import ModbusSequentialDataBlock, ModbusDeviceContext, ModbusServerContext
-from pymodbus.client.base import ModbusBaseClient
+from pymodbus.datastore import ModbusDeviceContext, ModbusServerContext
 
 logging.basicConfig(level=logging.INFO, format='%(levelname)s - %(message)s')
 logging.getLogger('werkzeug').setLevel(logging.ERROR)
@@ -57,8 +57,19 @@ app = Flask(__name__)
 
 # global variables 
 register_values = {} # (only used for endpoints)
+scan_engine = None # (only used for endpoints)
 listen_only = False
 
+# default scan engine configuration (see ScanEngine and ControllerWriter)
+DEFAULT_SCAN = {
+    "cycle": 0.1,
+    "watchdog": 1,
+    "controller_heartbeat": 5,
+}
+
+# how often (seconds) the scan statistics are logged
+STATS_INTERVAL = 60
+
 # here we import the defined logic
 # the logic will always be in a python file called logic.py, which gets copied to the container
 try:
@@ -116,69 +127,18 @@ def init_outbound_cons(configs):
 
 
 
-# FUNCTION: monitor
-# PURPOSE:  A monitor thread to continuously read data from a defined and intialised connection
-def monitor(value_config, monitor_configs, modbus_con : ModbusBaseClient, values):
-    logging.debug(f"Starting Monitor: {monitor_configs['id']}")
-    interval = monitor_configs["interval"]
-    value_type = monitor_configs["value_type"]
-    out_address = monitor_configs["address"]
-    count = monitor_configs["count"]
-
-    while True:
-        try:
-            # select the correct function
-            if value_type == "coil":
-                response_values = modbus_con.read_coils(out_address-1, count=count).bits
-                values["co"].setValues(value_config["address"], response_values)
-            elif value_type == "discrete_input":
-                response_values = modbus_con.read_discrete_inputs(out_address-1, count=count).bits
-                values["di"].setValues(value_config["address"], response_values)
-            elif value_type == "holding_register":
-                response_values = modbus_con.read_holding_registers(out_address-1, count=count).registers
-                values["hr"].setValues(value_config["address"], response_values)
-            elif value_type == "input_register":
-                response_values = modbus_con.read_input_registers(out_address-1, count=count).registers
-                values["ir"].setValues(value_config["address"], response_values)
-        except Exception as e:
-            logging.error(f"Error: couldn't read values: {e}")
-
-        time.sleep(interval)
-        
-
-
 # FUNCTION: start_monitors
-# PURPOSE:  Started all of the monitor threads. Note that more than one monitor can
-#           utilise a single connection (but there must be a connection!).
+# PURPOSE:  Started all of the monitor threads, one per block read planned from the monitor
+#           configurations. Note that more than one monitor can utilise a single connection (but
+#           there must be a connection!).
 def start_monitors(configs, outbound_cons, values):
     monitor_threads = []
-    for monitor_config in configs["monitors"]:
-        # get the outbound connection (Modbus object) for the monitor
-        outbound_con_id = monitor_config["outbound_connection_id"]
-        modbus_con = outbound_cons[outbound_con_id]
-
-        # get the address of the internal register to write to
-        value_config = {}
-        if monitor_config["value_type"] == "coil":
-            for co in configs["registers"]["coil"]:
-                if co["id"] == monitor_config["id"]:
-                    value_config = co
-        elif monitor_config["value_type"] == "discrete_input":
-            for di in configs["registers"]["discrete_input"]:
-                if di["id"] == monitor_config["id"]:
-                    value_config = di
-        elif monitor_config["value_type"] == "holding_register":
-            for hr in configs["registers"]["holding_register"]:
-                if hr["id"] == monitor_config["id"]:
-                    value_config = hr
-        elif monitor_config["value_type"] == "input_register":
-            for ir in configs["registers"]["input_register"]:
-                if ir["id"] == monitor_config["id"]:
-                    value_config = ir
+    for block in utils.plan_monitor_reads(configs):
+        # get the outbound connection (Modbus object) for the block
+        modbus_con = outbound_cons[block["outbound_connection_id"]]
 
         # start the monitor threads
-        monitor_thread = Thread(target=monitor, args=(value_config, monitor_config, modbus_con, values))
-        monitor_thread.daemon = True
+        monitor_thread = Thread(target=utils.monitor, args=(block, modbus_con, values), daemon=True)
         monitor_thread.start()
 
         monitor_threads.append(monitor_thread)
@@ -186,68 +146,189 @@ def start_monitors(configs, outbound_cons, values):
 
 
 
-# FUNCTION: make_writing_callback
-# PURPOSE:  Function that creates a first class function callback (outside of scope) to be
-#           called when a value needs to be written
-def make_writing_callback(configs, controller_config, output_reg_values, modbus_con, values):
-    def write_value():
-        outbound_con_id = controller_config["outbound_connection_id"]
-
-        if controller_config["value_type"] == "coil":
-            # find the output register to write from
-            output_reg = output_reg_values[controller_config["id"]]
-
-            # write to the modbus object
-            modbus_con.write_coil(address=controller_config["address"]-1,
-                                    #slave=controller_config["slave_id"], #TODO
-                                    value=output_reg["value"])
-            logging.debug(f"Writing to controller {outbound_con_id}, to address {controller_config['address']} value {output_reg['value']}")
-            
-            # write to the PLCs memory as well
-            for coil in configs["registers"]["coil"]:
-                if coil["id"] == controller_config["id"]:
-                    plc_coil = coil
-            values["co"].setValues(plc_coil["address"], output_reg["value"])
-
-        elif controller_config["value_type"] == "holding_register":
-            
-            # find the output register to write from
-            output_reg = output_reg_values[controller_config["id"]]
-
-            # write to the modbus object
-            modbus_con.write_register(address=controller_config["address"]-1,
-                                    #slave=controller_config["slave_id"],
-                                    value=output_reg["value"])
-            logging.debug(f"Writing to controller {outbound_con_id}, to address {controller_config['address']} value {output_reg['value']}")
-                        
-            # get the PLC value to write to
-            for hr in configs["registers"]["holding_register"]:
-                if hr["id"] == controller_config["id"]:
-                    plc_hr = hr 
-
-            # write to the PLCs memory as well 
-            values["hr"].setValues(plc_hr["address"], output_reg["value"])
-        else:
-            raise Exception("Trying to write to non-writable register")
-    return write_value
-
-
-# FUNCTION: get_controller_callbacks
-# PURPOSE:  Returns a dictionary of callbacks to be used to write to 
-#           their specific register.
-def get_controller_callbacks(configs, outbound_cons, output_reg_values, values):
-    controller_callbacks = {}
-    for controller_config in configs["controllers"]:
-        # get outbound connection for the controller
-        outbound_con_id = controller_config["outbound_connection_id"]
-        modbus_con = outbound_cons[outbound_con_id]
-
-        # define a first class function that gets the correct out_reg_value and modbus writes it
-        callback = make_writing_callback(configs, controller_config, output_reg_values, modbus_con, values)
-    
-        # put the writing callback function into the controller_callbacks dictionary (key is the controller id)
-        controller_callbacks[controller_config["id"]] = callback
-    return controller_callbacks
+# CLASS:    ControllerWriter
+# PURPOSE:  Writes the PLC's output registers to outside devices for the configured controllers.
+#           write(id) queues the register's current value on its controller's outbound
+#           connection, unless that value was already written (or is already queued). flush()
+#           sends everything queued, one write_coils/write_registers request (FC15/FC16) per run
+#           of contiguous addresses on each connection (FC5/FC6 for a single value). Writes that
+#           fail (or that the device answers with an exception response) stay queued for the next
+#           flush, unless a newer value replaced them.
+#
+#           What was written is only what this PLC last sent, not the device's state (another
+#           master or a restarted device may have changed it since). So when a write on a
+#           connection fails or the connection drops, everything sent on it is forgotten and
+#           re-sent at the next flush, and every value is re-sent at least every "heartbeat"
+#           simulated seconds (None to disable).
+class ControllerWriter:
+    def __init__(self, configs, outbound_cons, output_reg_values, heartbeat=DEFAULT_SCAN["controller_heartbeat"]):
+        self.outbound_cons = outbound_cons
+        self.heartbeat = heartbeat
+        self.controllers = {}
+        self.pending = {}
+        self.written = {}
+        self.last_sent = {}
+        self.connected = {}
+        self.lock = Lock()
+        self.event = Event()
+
+        # statistics
+        self.requests = 0
+        self.values_written = 0
+        self.suppressed = 0
+        self.resent = 0
+        self.errors = 0
+
+        for controller_config in configs["controllers"]:
+            if controller_config["value_type"] not in ["coil", "holding_register"]:
+                raise Exception("Trying to write to non-writable register")
+            self.controllers[controller_config["id"]] = {
+                "outbound_connection_id": controller_config["outbound_connection_id"],
+                "key": (controller_config["value_type"], controller_config["address"]),
+                "register": output_reg_values[controller_config["id"]],
+            }
+
+
+    # FUNCTION: write
+    # PURPOSE:  Queues the current value of a controller's register (key is the controller id)
+    def write(self, id):
+        controller = self.controllers[id]
+        value = controller["register"]["value"]
+        with self.lock:
+            queue = self.pending.setdefault(controller["outbound_connection_id"], {})
+            if id in self.written and self.written[id] == value:
+                # unchanged (drop any queued value it replaces)
+                queue.pop(controller["key"], None)
+                self.suppressed += 1
+                return
+            queue[controller["key"]] = (id, value)
+        self.event.set()
+
+
+    # FUNCTION: get_callbacks
+    # PURPOSE:  Returns a dictionary of callbacks (key is the controller id) that queue a write of
+    #           their register, as passed to free running logic
+    def get_callbacks(self):
+        return {id: (lambda id=id: self.write(id)) for id in self.controllers}
+
+
+    # FUNCTION: queue_resends
+    # PURPOSE:  Queues the current value of every controller that has been sent before but is
+    #           forgotten (its connection failed or dropped) or due a heartbeat
+    def queue_resends(self):
+        now = utils.clock.monotonic()
+        with self.lock:
+            for id, controller in self.controllers.items():
+                if id not in self.last_sent:
+                    continue
+                forgotten = id not in self.written
+                heartbeat_due = self.heartbeat is not None and now - self.last_sent[id] >= self.heartbeat
+                if forgotten or heartbeat_due:
+                    queue = self.pending.setdefault(controller["outbound_connection_id"], {})
+                    if controller["key"] not in queue:
+                        queue[controller["key"]] = (id, controller["register"]["value"])
+                        self.resent += 1
+
+
+    # FUNCTION: forget
+    # PURPOSE:  Forgets what was written on a connection, so it is all re-sent
+    def forget(self, outbound_con_id):
+        with self.lock:
+            for id, controller in self.controllers.items():
+                if controller["outbound_connection_id"] == outbound_con_id:
+                    self.written.pop(id, None)
+
+
+    # FUNCTION: flush
+    # PURPOSE:  Sends all queued writes (and any re-sends), batching contiguous addresses on each
+    #           connection
+    def flush(self):
+        # forget the connections that dropped since the last flush (modbus clients only connect
+        # on their first request, so a connection that was never up is not a drop)
+        for outbound_con_id, modbus_con in self.outbound_cons.items():
+            connected = getattr(modbus_con, "connected", True)
+            if self.connected.get(outbound_con_id) and not connected:
+                self.forget(outbound_con_id)
+            self.connected[outbound_con_id] = connected
+        self.queue_resends()
+
+        with self.lock:
+            pending, self.pending = self.pending, {}
+
+        for outbound_con_id, queue in pending.items():
+            modbus_con = self.outbound_cons[outbound_con_id]
+            for value_type in ["coil", "holding_register"]:
+                addresses = [address for type, address in queue if type == value_type]
+                for run in utils.get_contiguous_runs(addresses):
+                    entries = [queue[(value_type, address)] for address in run]
+                    values = [value for id, value in entries]
+                    try:
+                        if value_type == "coil" and len(run) == 1:
+                            response = modbus_con.write_coil(address=run[0]-1, value=values[0])
+                        elif value_type == "coil":
+                            response = modbus_con.write_coils(address=run[0]-1, values=values)
+                        elif len(run) == 1:
+                            response = modbus_con.write_register(address=run[0]-1, value=values[0])
+                        else:
+                            response = modbus_con.write_registers(address=run[0]-1, values=values)
+
+                        # a rejected write (e.g. an illegal address or a busy device) failed too
+                        if response.isError():
+                            raise Exception(f"the device rejected the write ({response})")
+                        logging.debug(f"Writing to controller {outbound_con_id}, to address {run[0]} values {values}")
+                    except Exception as e:
+                        logging.error(f"Error: couldn't write to controller {outbound_con_id}, address {run[0]}: {e}")
+                        self.forget(outbound_con_id)
+                        self.requeue(outbound_con_id, value_type, run, entries)
+                        continue
+
+                    now = utils.clock.monotonic()
+                    with self.lock:
+                        self.requests += 1
+                        self.values_written += len(run)
+                        for id, value in entries:
+                            self.written[id] = value
+                            self.last_sent[id] = now
+
+
+    # FUNCTION: requeue
+    # PURPOSE:  Puts failed writes back in the queue (unless newer values were queued meanwhile)
+    def requeue(self, outbound_con_id, value_type, run, entries):
+        with self.lock:
+            self.errors += 1
+            queue = self.pending.setdefault(outbound_con_id, {})
+            for address, entry in zip(run, entries):
+                queue.setdefault((value_type, address), entry)
+        self.event.set()
+
+
+    # FUNCTION: run
+    # PURPOSE:  Flushes queued writes at most once every "interval" simulated seconds (used for
+    #           free running logic, the scan engine flushes once per scan itself), and at least
+    #           once a heartbeat. With a virtual clock (lockstep) the queue is flushed on the
+    #           simulation clock instead.
+    def run(self, interval):
+        while True:
+            if not utils.clock.virtual:
+                self.event.wait(None if self.heartbeat is None else self.heartbeat / utils.clock.time_scale)
+                self.event.clear()
+            self.flush()
+            utils.clock.sleep(interval)
+
+
+    # FUNCTION: stats
+    # PURPOSE:  Returns the controller write statistics
+    def stats(self):
+        with self.lock:
+            pending = sum(len(queue) for queue in self.pending.values())
+            return {
+                "requests": self.requests,
+                "values_written": self.values_written,
+                "suppressed": self.suppressed,
+                "resent": self.resent,
+                "errors": self.errors,
+                "pending": pending,
+            }
 
 
 
@@ -292,34 +373,260 @@ def separate_io_registers(register_values):
 
 
 
+# CLASS:    ScanEngine
+# PURPOSE:  An IEC 61131 style scan cycle for PLC logic. Logic modules that define
+#           register(engine, input_registers, output_registers) register cyclic tasks, each with a
+#           period and a priority. Tasks work on a process image (plain copies of the datastore
+#           backed registers). Every "cycle" seconds the engine latches the input registers from
+#           the datastore into the image, runs the due tasks in priority order (lowest number
+#           first), then flushes the output registers that changed: they are written to the
+#           datastore and, if a controller is configured for them, sent to the outbound device in
+#           one batch per connection (see ControllerWriter). Tasks only see the latched inputs,
+#           and outputs only leave the PLC at the end of a cycle. The engine records cycle times,
+#           jitter (lateness of the cycle start) and overruns (cycles that ran past the start of
+#           the next one, which are skipped rather than run back to back). A watchdog flags a task
+#           that runs for longer than "watchdog" seconds.
+class ScanEngine:
+    def __init__(self, input_registers, output_registers, controller_writer, cycle=DEFAULT_SCAN["cycle"], watchdog=DEFAULT_SCAN["watchdog"]):
+        self.input_views = input_registers
+        self.output_views = output_registers
+        self.input_registers = utils.get_register_snapshot(input_registers)
+        self.output_registers = utils.get_register_snapshot(output_registers)
+        self.controller_writer = controller_writer
+        self.cycle = cycle
+        self.watchdog = watchdog
+        self.tasks = []
+        self.flushed = {}
+        self.running_task = None
+        self.task_start = None
+
+        # statistics
+        self.cycles = 0
+        self.last_cycle_time = 0
+        self.total_cycle_time = 0
+        self.max_cycle_time = 0
+        self.total_jitter = 0
+        self.max_jitter = 0
+        self.overruns = 0
+        self.watchdog_trips = 0
+        self.stalled_task = None
+
+
+    # FUNCTION: register_task
+    # PURPOSE:  Registers a task(input_registers, output_registers) run every "period" seconds
+    #           (rounded to a whole number of cycles, default every cycle). Tasks due in the same
+    #           cycle run in order of priority (lowest number first).
+    def register_task(self, task, period=None, priority=0, name=None):
+        every = 1 if period is None else max(1, round(period / self.cycle))
+        self.tasks.append({
+            "task": task,
+            "name": name or task.__name__,
+            "every": every,
+            "priority": priority,
+            "runs": 0,
+            "max_time": 0,
+        })
+        self.tasks.sort(key=lambda task: task["priority"])
+
+
+    # FUNCTION: latch_inputs
+    # PURPOSE:  Copies the input register values from the datastore. Output registers that an
+    #           outside master (e.g. another PLC or a HMI) has written since the last flush take
+    #           the written value, so it is flushed on to their controller.
+    def latch_inputs(self):
+        for id, register in self.input_registers.items():
+            register["value"] = self.input_views[id]["value"]
+
+        for id, register in self.output_registers.items():
+            value = self.output_views[id]["value"]
+            if id in self.flushed and value != self.flushed[id]:
+                register["value"] = value
+
+
+    # FUNCTION: flush_outputs
+    # PURPOSE:  Writes the output registers that changed since the last flush (all of them on the
+    #           first flush) to the datastore and, if they have a controller, to the outbound device
+    def flush_outputs(self):
+        for id, register in self.output_registers.items():
+            value = register["value"]
+            if id in self.flushed and self.flushed[id] == value:
+                continue
+            try:
+                self.output_views[id]["value"] = value
+                if id in self.controller_writer.controllers:
+                    self.controller_writer.write(id)
+                self.flushed[id] = value
+            except Exception as e:
+                logging.error(f"Error: couldn't write output {id}: {e}")
+        self.controller_writer.flush()
+
+
+    # FUNCTION: scan_once
+    # PURPOSE:  Runs a single scan cycle: latch inputs, run the due tasks, flush outputs
+    def scan_once(self):
+        self.latch_inputs()
+        for task in self.tasks:
+            if self.cycles % task["every"] != 0:
+                continue
+            self.running_task = task["name"]
+            self.task_start = time.monotonic()
+            try:
+                task["task"](self.input_registers, self.output_registers)
+            except Exception as e:
+                logging.error(f"Error: PLC task {task['name']} failed: {e}")
+            task["runs"] += 1
+            task["max_time"] = max(task["max_time"], time.monotonic() - self.task_start)
+            self.running_task = None
+        self.flush_outputs()
+        self.cycles += 1
+
+
+    # FUNCTION: run
+    # PURPOSE:  Runs the scan cycle forever on its cycle time (on the simulation clock)
+    def run(self):
+        next_cycle = utils.clock.monotonic()
+        last_stats = time.monotonic()
+        while True:
+            jitter = max(0, utils.clock.monotonic() - next_cycle)
+            self.total_jitter += jitter
+            self.max_jitter = max(self.max_jitter, jitter)
+
+            start = time.perf_counter()
+            self.scan_once()
+            self.last_cycle_time = time.perf_counter() - start
+            self.total_cycle_time += self.last_cycle_time
+            self.max_cycle_time = max(self.max_cycle_time, self.last_cycle_time)
+
+            next_cycle += self.cycle
+            lag = utils.clock.monotonic() - next_cycle
+            if lag > 0:
+                # the cycle overran: skip the missed cycles
+                self.overruns += 1
+                next_cycle += (int(lag / self.cycle) + 1) * self.cycle
+                lag = utils.clock.monotonic() - next_cycle
+            utils.clock.sleep(max(0, -lag))
+
+            if time.monotonic() - last_stats >= STATS_INTERVAL:
+                logging.info(f"Scan engine: {self.stats()}")
+                last_stats = time.monotonic()
+
+
+    # FUNCTION: run_watchdog
+    # PURPOSE:  Flags (logs and counts) a task that has been running for longer than the watchdog
+    #           time. Each stall is counted once.
+    def run_watchdog(self):
+        flagged = None
+        while True:
+            time.sleep(self.watchdog / 2)
+            task, task_start = self.running_task, self.task_start
+            if task is not None and time.monotonic() - task_start > self.watchdog:
+                if flagged != task_start:
+                    self.watchdog_trips += 1
+                    self.stalled_task = task
+                    flagged = task_start
+                    logging.error(f"Watchdog: PLC task {task} has been running for more than {self.watchdog} seconds")
+            elif task is None:
+                self.stalled_task = None
+
+
+    # FUNCTION: stats
+    # PURPOSE:  Returns the scan statistics (times in seconds)
+    def stats(self):
+        cycles = max(1, self.cycles)
+        return {
+            "cycles": self.cycles,
+            "cycle": self.cycle,
+            "cycle_time": {
+                "last": round(self.last_cycle_time, 6),
+                "mean": round(self.total_cycle_time / cycles, 6),
+                "max": round(self.max_cycle_time, 6),
+            },
+            "jitter": {
+                "mean": round(self.total_jitter / cycles, 6),
+                "max": round(self.max_jitter, 6),
+            },
+            "overruns": self.overruns,
+            "watchdog_trips": self.watchdog_trips,
+            "stalled_task": self.stalled_task,
+            "tasks": {task["name"]: {
+                "period": task["every"] * self.cycle,
+                "priority": task["priority"],
+                "runs": task["runs"],
+                "max_time": round(task["max_time"], 6),
+            } for task in self.tasks},
+        }
+
+
+
+# FUNCTION: run_logic
+# PURPOSE:  Runs the PLC logic. Logic modules that define register(engine, input_registers,
+#           output_registers) are driven by the scan engine; older modules that define
+#           logic(input_registers, output_registers, state_update_callbacks) run free on the
+#           datastore backed registers, and their controller writes are flushed once per cycle.
+def run_logic(engine, input_reg_values, output_reg_values):
+    if hasattr(logic, "register"):
+        logic.register(engine, engine.input_registers, engine.output_registers)
+        Thread(target=engine.run_watchdog, daemon=True).start()
+        engine.run()
+    else:
+        Thread(target=engine.controller_writer.run, args=(engine.cycle,), daemon=True).start()
+        logic.logic(input_reg_values, output_reg_values, engine.controller_writer.get_callbacks())
+
+
+
 # define the flask endpoint
 @app.route("/registers", methods=['GET'])
 def get_registers_route():
     global register_values
-    return jsonify(register_values)
+    return jsonify(utils.get_register_snapshot(register_values))
+
+
+
+# define the flask endpoint for the scan engine statistics
+@app.route("/scan", methods=['GET'])
+def get_scan_route():
+    global scan_engine
+    if scan_engine is None:
+        return jsonify({})
+    return jsonify(scan_engine.stats())
+
+
+
+# define the flask endpoint for the controller write statistics
+@app.route("/controllers", methods=['GET'])
+def get_controllers_route():
+    global scan_engine
+    if scan_engine is None:
+        return jsonify({})
+    return jsonify(scan_engine.controller_writer.stats())
 
 
 
 # define function to run flask in another thread
-def flask_app(flask_app):
-    flask_app.run(host="0.0.0.0", port=1111)
+def flask_app(flask_app, port=utils.API_PORT):
+    flask_app.run(host=utils.BIND_ADDRESS, port=port)
 
 
 
 # FUNCTION: main
 # PURPOSE:  The main execution
-async def main():
+async def main(configs=None):
     global register_values
+    global scan_engine
 
-    # retrieve configurations from the given JSON (will be in the same directory)
-    configs = utils.retrieve_configs("config.json")
+    # retrieve configurations from the given JSON (will be in the same directory), unless they are
+    # passed in by the headless runner
+    if configs is None:
+        configs = utils.retrieve_configs("config.json")
+    utils.configure_clock(configs)
     logging.info(f"Starting PLC")
 
-    # create device context (by default will have all address ranges)
-    co = ModbusSequentialDataBlock.create()
-    di = ModbusSequentialDataBlock.create()
-    hr = ModbusSequentialDataBlock.create()
-    ir = ModbusSequentialDataBlock.create()
+    # create device context (by default will have all address ranges, observable so logic can
+    # wait for register changes)
+    co = utils.ObservableDataBlock.create()
+    di = utils.ObservableDataBlock.create()
+    hr = utils.ObservableDataBlock.create()
+    ir = utils.ObservableDataBlock.create()
     device_context = ModbusDeviceContext(co=co, di=di, hr=hr, ir=ir)
     context = ModbusServerContext(devices=device_context, single=True)
 
@@ -327,35 +634,40 @@ async def main():
     values = {"co": co, "di": di, "hr": hr, "ir": ir}
     inbound_cons = asyncio.create_task(init_inbound_cons(configs, context))
 
-    # start any outbound connections
-    outbound_cons = init_outbound_cons(configs)
+    # start any outbound connections (in a thread, so the inbound servers start meanwhile)
+    outbound_cons = await asyncio.to_thread(init_outbound_cons, configs)
 
     # start any configured monitors using the started outbound connections
     monitor_threads = start_monitors(configs, outbound_cons, values)
 
-    # create a dictionary representing all register values
-    register_values = utils.create_register_values_dict(configs)
+    # create a dictionary representing all register values (backed by the datastore, so older
+    # logic modules read and write the modbus registers directly)
+    register_values = utils.create_register_values_dict(configs, values)
 
     # separate the register values into input and output registers
     input_reg_values, output_reg_values = separate_io_registers(register_values)
 
-    # create a dictionary to store the controller callback functions (key is the controller id)
-    controller_callbacks = get_controller_callbacks(configs, outbound_cons, output_reg_values, values)
+    # create the writer for the controllers (batches the writes to outside devices)
+    scan_configs = DEFAULT_SCAN | configs.get("scan", {})
+    controller_writer = ControllerWriter(configs, outbound_cons, output_reg_values, scan_configs["controller_heartbeat"])
 
-    # start a thread to continously update the input and output registers dictionaries
-    sync_in_registers = Thread(target=utils.update_register_values, args=(input_reg_values, values), daemon=True)
-    sync_in_registers.start()
-    sync_out_registers = Thread(target=utils.update_register_values, args=(output_reg_values, values), daemon=True)
-    sync_out_registers.start()
+    # create the scan engine (only used by logic that registers tasks)
+    scan_engine = ScanEngine(input_reg_values, output_reg_values, controller_writer, scan_configs["cycle"], scan_configs["watchdog"])
 
-    # start the logic thread, passing in the input registers, output registers, and modbus controlling callback functions
-    logic_thread = Thread(target=logic.logic, args=(input_reg_values, output_reg_values, controller_callbacks), daemon=True)
+    # start the logic thread, passing in the input registers, output registers, and the scan engine
+    # (which holds the controller writer)
+    logic_thread = Thread(target=run_logic, args=(scan_engine, input_reg_values, output_reg_values), daemon=True)
     logic_thread.start()
     
     # start the flask endpoint
-    flask_thread = Thread(target=flask_app, args=(app,), daemon=True)
+    flask_thread = Thread(target=flask_app, args=(app, configs.get("api_port", utils.API_PORT)), daemon=True)
     flask_thread.start()
 
+    # take part in the lockstep co-simulation (if configured)
+    if "lockstep" in configs:
+        lockstep_thread = Thread(target=lockstep.participate, args=(configs, "plc", utils.clock), daemon=True)
+        lockstep_thread.start()
+
     # block on the asyncio and threads
     await inbound_cons
     for monitor_thread in monitor_threads:
@@ -363,8 +675,6 @@ async def main():
     for outbound_con in outbound_cons.values():
         outbound_con.close()
     logic_thread.join()
-    sync_in_registers.join()
-    sync_out_registers.join()
     flask_thread.join()
     
     # block (useful if no servers or monitors are made)
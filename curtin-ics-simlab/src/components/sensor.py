@@ -38,10 +38,10 @@
 # FILE PURPOSE: Simulates a sensor. Takes input from a simulated physical process.
 
 import asyncio
-import sqlite3
 import logging
-import time
 import utils
+import physical
+import lockstep
 from flask import Flask, jsonify
 from threading import Thread
 from pymodbus.datastore import ModbusSequentialDataBlock, ModbusDeviceContext, ModbusServerContext
@@ -73,56 +73,34 @@ async def start_servers(configs, context):
 
 
 # FUNCTION: start_sensor
-# PURPOSE:  Starts a process to read sensor data from SQLite specific to this sensor.
-#           The column is a TEXT datatype to allow for generic inputs. The input "registers"
-#           is a dictonary with ModbusSequentialDataBlock values, corresponding to co
-#           di, hr, and ir as keys.
+# PURPOSE:  Starts a process to read sensor data from the physical layer specific to this sensor.
+#           Values are encoded into registers according to each register's data type, scale
+#           and offset. The input "registers" is a dictonary with ModbusSequentialDataBlock
+#           values, corresponding to co, di, hr, and ir as keys.
 def start_sensor(configs, values):
-    # connect to hardware SQLite database
-    conn = sqlite3.connect("physical_interactions.db")
-    cursor = conn.cursor()
+    # connect to the physical layer store
+    store = physical.open_store(configs)
     
+    physical_registers = utils.get_physical_registers(configs)
+    codec = utils.RegisterCodec(physical_registers)
+    names = [register["physical_value"] for register in physical_registers]
+    notifier = physical.create_notifier(configs, names)
+
     while True:
-        # gets values for all value types from the physical databases
-        value = ""
-        for co in configs["registers"]["coil"]:
-            address = co["address"]
-            table = co["physical_value"]
-            cursor.execute(f"SELECT value FROM {table} ORDER BY timestamp DESC LIMIT 1")
-            value = cursor.fetchone()
-            conn.commit()
-
-            if value and value[0] not in (None, ""):
-                values["co"].setValues(address, int(float(value[0])))
-        for di in configs["registers"]["discrete_input"]:
-            address = di["address"]
-            table = di["physical_value"]
-            cursor.execute(f"SELECT value FROM {table} ORDER BY timestamp DESC LIMIT 1")
-            value = cursor.fetchone()
-            conn.commit()
-
-            if value and value[0] not in (None, ""):
-                values["di"].setValues(address, int(float(value[0])))
-        for hr in configs["registers"]["holding_register"]:
-            address = hr["address"]
-            table = hr["physical_value"]
-            cursor.execute(f"SELECT value FROM {table} ORDER BY timestamp DESC LIMIT 1")
-            value = cursor.fetchone()
-            conn.commit()
-
-            if value and value[0] not in (None, ""):
-                values["hr"].setValues(address, int(float(value[0])))
-        for ir in configs["registers"]["input_register"]:
-            address = ir["address"]
-            table = ir["physical_value"]
-            cursor.execute(f"SELECT value FROM {table} ORDER BY timestamp DESC LIMIT 1")
-            value = cursor.fetchone()
-            conn.commit()
-
-            if value and value[0] not in (None, ""):
-                values["ir"].setValues(address, int(float(value[0])))
-
-        time.sleep(0.1)
+        # gets values for all value types from the physical layer in a single query, then
+        # encodes them all into the registers
+        try:
+            physical_values = store.read_values(names)
+            codec.write(values, physical_values)
+        except Exception as e:
+            logging.error(f"Error: couldn't read physical values: {e}")
+
+        # wait for a physical value to change (falls back to polling), or for the next step of
+        # virtual time in lockstep mode
+        if utils.clock.virtual:
+            utils.clock.sleep(0.1)
+        else:
+            notifier.wait(0.1)
 
 
 
@@ -130,19 +108,22 @@ def start_sensor(configs, values):
 @app.route("/registers", methods=['GET'])
 def get_registers_route():
     global register_values
-    return jsonify(register_values)
+    return jsonify(utils.get_register_snapshot(register_values))
 
 # define function to run flask in another thread
-def flask_app(flask_app):
-    flask_app.run(host="0.0.0.0", port=1111)
+def flask_app(flask_app, port=utils.API_PORT):
+    flask_app.run(host=utils.BIND_ADDRESS, port=port)
 
 # FUNCTION: main
 # PURPOSE:  The main execution
-async def main():
+async def main(configs=None):
     global register_values
 
-    # retrieve configurations from the given JSON (will be in the same directory)
-    configs = utils.retrieve_configs("config.json")
+    # retrieve configurations from the given JSON (will be in the same directory), unless they are
+    # passed in by the headless runner
+    if configs is None:
+        configs = utils.retrieve_configs("config.json")
+    utils.configure_clock(configs)
     logging.info(f"Starting Sensor")
 
     # create device context (by default will have all address ranges)
@@ -157,25 +138,25 @@ async def main():
     values = {"co": co, "di": di, "hr": hr, "ir": ir}
     server_task = start_servers(configs, context)
 
-    # create a dictionary representing all register values
-    register_values = utils.create_register_values_dict(configs)
+    # create a dictionary representing all register values (backed by the datastore)
+    register_values = utils.create_register_values_dict(configs, values)
 
     # start the sensor reading thread
     sensor_thread = Thread(target=start_sensor, args=(configs, values), daemon=True)
     sensor_thread.start()
 
-    # start a thread to continously update the registers dictionary
-    sync_registers = Thread(target=utils.update_register_values, args=(register_values, values), daemon=True)
-    sync_registers.start()
-
     # start the flask endpoint
-    flask_thread = Thread(target=flask_app, args=(app,), daemon=True)
+    flask_thread = Thread(target=flask_app, args=(app, configs.get("api_port", utils.API_PORT)), daemon=True)
     flask_thread.start()
 
+    # take part in the lockstep co-simulation (if configured)
+    if "lockstep" in configs:
+        lockstep_thread = Thread(target=lockstep.participate, args=(configs, "sensor", utils.clock), daemon=True)
+        lockstep_thread.start()
+
     # await tasks and threads
     await server_task
     sensor_thread.join()
-    sync_registers.join()
     flask_thread.join()
 
 
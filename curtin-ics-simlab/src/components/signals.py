@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+
+# -----------------------------------------------------------------------------
+# Project: Curtin ICS-SimLab
+# File: signals.py
+#
+# Copyright (c) 2025 Jaxson Brown, Curtin University
+#
+# Licensed under the MIT License. You may obtain a copy of the License at:
+#     https://opensource.org/licenses/MIT
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+# This work is supported by a Cross-Campus Cyber Security Research Project
+# funded by **Curtin University**
+#
+# Author: Jaxson Brown
+# Organisation: Curtin University
+# Last Modified: 2025-08-27
+# -----------------------------------------------------------------------------
+
+
+
+# FILE PURPOSE: Precomputed signal generators for component logic (load profiles, sinusoids,
+#               noise, step/ramp schedules and seeded random walks). Each generator builds a lookup
+#               table once with vectorized NumPy operations, and the table is then sampled in O(1)
+#               at any time, so no per-tick maths is done in Python and seeded signals are
+#               reproducible between runs.
+
+import numpy as np
+
+# GLOBAL VARIABLES
+DEFAULT_RESOLUTION = 0.1
+
+
+
+# CLASS:    Signal
+# PURPOSE:  A lookup table of values, one every "resolution" seconds. Sampling at time t (seconds
+#           since the start of the signal) returns the table entry that t falls in. Looping signals
+#           repeat after their duration, others hold their first/last value outside it. Signals
+#           can be added together or scaled (with + and *).
+class Signal:
+    def __init__(self, values, resolution=DEFAULT_RESOLUTION, loop=True):
+        self.values = np.asarray(values, dtype=float)
+        self.resolution = resolution
+        self.loop = loop
+        self.duration = len(self.values) * resolution
+
+
+    # FUNCTION: index
+    # PURPOSE:  Returns the table index of time t
+    def index(self, t):
+        index = int(t / self.resolution)
+        if self.loop:
+            return index % len(self.values)
+        return min(max(index, 0), len(self.values) - 1)
+
+
+    # FUNCTION: sample
+    # PURPOSE:  Returns the value of the signal at time t
+    def sample(self, t):
+        return float(self.values[self.index(t)])
+
+
+    def __call__(self, t):
+        return self.sample(t)
+
+
+    # FUNCTION: combine
+    # PURPOSE:  Combines the signal with a number or another signal of the same resolution (the
+    #           shorter table is repeated to the length of the longer one)
+    def combine(self, other, operation):
+        if not isinstance(other, Signal):
+            return Signal(operation(self.values, other), self.resolution, self.loop)
+        if other.resolution != self.resolution:
+            raise ValueError("Signals must have the same resolution to be combined")
+        length = max(len(self.values), len(other.values))
+        values = operation(np.resize(self.values, length), np.resize(other.values, length))
+        return Signal(values, self.resolution, self.loop and other.loop)
+
+
+    def __add__(self, other):
+        return self.combine(other, np.add)
+
+
+    def __mul__(self, other):
+        return self.combine(other, np.multiply)
+
+
+    __radd__ = __add__
+    __rmul__ = __mul__
+
+
+
+# FUNCTION: get_times
+# PURPOSE:  Returns the sample times of a table covering "duration" seconds
+def get_times(duration, resolution):
+    return np.arange(max(1, int(round(duration / resolution)))) * resolution
+
+
+
+# FUNCTION: table
+# PURPOSE:  Builds a signal from a vectorized function of the time array
+def table(function, duration, resolution=DEFAULT_RESOLUTION, loop=True):
+    return Signal(function(get_times(duration, resolution)), resolution, loop)
+
+
+
+# FUNCTION: profile
+# PURPOSE:  Builds a load profile from (time, value) points, interpolated linearly between them.
+#           The duration defaults to the time of the last point.
+def profile(points, duration=None, resolution=DEFAULT_RESOLUTION, loop=True):
+    point_times, point_values = np.asarray(points, dtype=float).T
+    duration = point_times[-1] if duration is None else duration
+    return Signal(np.interp(get_times(duration, resolution), point_times, point_values), resolution, loop)
+
+
+
+# FUNCTION: gaussian
+# PURPOSE:  Builds a bell curve profile (e.g. solar power over a day) of the given height, spanning
+#           "std_devs" standard deviations either side of its peak over the duration
+def gaussian(height, duration, std_devs=4, resolution=DEFAULT_RESOLUTION, loop=True):
+    x_values = np.linspace(-std_devs, std_devs, len(get_times(duration, resolution)))
+    return Signal(height * np.exp(-0.5 * x_values ** 2), resolution, loop)
+
+
+
+# FUNCTION: sinusoid
+# PURPOSE:  Builds one period of a sine wave (repeated by looping)
+def sinusoid(amplitude, period, offset=0, phase=0, resolution=DEFAULT_RESOLUTION):
+    return table(lambda t: offset + amplitude * np.sin(2 * np.pi * t / period + phase), period, resolution)
+
+
+
+# FUNCTION: noise
+# PURPOSE:  Builds seeded Gaussian noise
+def noise(std_dev, duration, mean=0, seed=None, resolution=DEFAULT_RESOLUTION):
+    rng = np.random.default_rng(seed)
+    return Signal(rng.normal(mean, std_dev, len(get_times(duration, resolution))), resolution)
+
+
+
+# FUNCTION: schedule
+# PURPOSE:  Builds a schedule from (time, value) points. Each value is held until the next point,
+#           or ramped linearly towards it with "ramp". Schedules hold their last value by default.
+def schedule(points, duration=None, ramp=False, resolution=DEFAULT_RESOLUTION, loop=False):
+    if ramp:
+        return profile(points, duration, resolution, loop)
+    point_times, point_values = np.asarray(points, dtype=float).T
+    duration = point_times[-1] + resolution if duration is None else duration
+    indexes = np.searchsorted(point_times, get_times(duration, resolution), side="right") - 1
+    return Signal(point_values[np.maximum(indexes, 0)], resolution, loop)
+
+
+
+# FUNCTION: random_choice
+# PURPOSE:  Builds a seeded sequence of random choices, each held for "interval" seconds
+def random_choice(choices, interval, duration, seed=None, resolution=DEFAULT_RESOLUTION):
+    rng = np.random.default_rng(seed)
+    values = rng.choice(np.asarray(choices, dtype=float), int(np.ceil(duration / interval)))
+    return Signal(np.repeat(values, max(1, int(round(interval / resolution)))), resolution)
+
+
+
+# FUNCTION: random_walk
+# PURPOSE:  Builds a seeded random walk that starts at "start" and moves by a random step of
+#           "steps" every "interval" seconds, staying within the low/high bounds
+def random_walk(steps, interval, duration, start=0, low=None, high=None, seed=None, resolution=DEFAULT_RESOLUTION):
+    moves = random_choice(steps, interval, duration, seed, interval).values
+    if low is None and high is None:
+        values = start + np.cumsum(moves)
+    else:
+        # bounded walks are built step by step (only once, when the table is built)
+        values = np.empty(len(moves))
+        value = start
+        for index, move in enumerate(moves):
+            value = np.clip(value + move, low, high)
+            values[index] = value
+    return Signal(np.repeat(values, max(1, int(round(interval / resolution)))), resolution, loop=False)
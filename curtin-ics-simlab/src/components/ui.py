@@ -41,10 +41,11 @@
 import requests
 import json
 import time
-import sqlite3
+import physical
 import streamlit as st
 import pandas as pd
 import altair as alt
+from collections import deque
                   
 # FUNCTION: retrieve_configs
 # PURPOSE:  Retrieves the JSON configs
@@ -227,6 +228,16 @@ def main():
                 graphs[physical_value] = st.empty()
             column_switcher = (column_switcher % len(columns)) + 1
 
+    # physical value history (read from the database if recorded, otherwise kept locally)
+    history_enabled = configs.get("physical_layer", {}).get("history", False) and physical.get_backend(configs).supports_history
+    local_history = {}
+    for hil in hil_info.values():
+        for physical_value in hil["values"]:
+            local_history[physical_value] = deque(maxlen=100)
+
+    # open every HIL's physical layer shard read-only (the UI never writes physical values)
+    stores = physical.open_shards(configs)
+
     # have a single event loop for API polling (streamlit sucks for multi threaded stuff)
     while True:
         try:
@@ -257,27 +268,31 @@ def main():
             # if an api endpoint cannot be reached, just wait until it can
             time.sleep(1)
 
-        # poll the physical hil (through the SQLite3 database)
-        conn = sqlite3.connect("physical_interactions.db")
-        for hil in hil_info.values():
+        # poll the physical hil (through its read-only physical layer shard)
+        for hil_name, hil in hil_info.items():
+            store = stores[hil_name]
             for physical_value in hil["values"]:
-                table = physical_value
-                df = pd.read_sql_query(f"SELECT value FROM {table} ORDER BY timestamp DESC LIMIT 1", conn)
-                df["physical_value"] = table
+                value = store.read_value(physical_value)
+                df = pd.DataFrame({"physical_value": [physical_value], "value": [value]})
                 hils[physical_value].dataframe(df, column_order=["physical_value", "value"])
 
-                df = pd.read_sql_query(f"SELECT timestamp, value FROM {table} ORDER BY timestamp DESC LIMIT 100", conn)
-                df["timestamp"] = pd.to_datetime(df["timestamp"])
+                # use the history table if it is recorded, otherwise keep a local history of polled values
+                if history_enabled:
+                    rows = store.read_history(physical_value, limit=100)
+                    df = pd.DataFrame([row[1:] for row in rows], columns=["timestamp", "value"])
+                else:
+                    if value is not None:
+                        local_history[physical_value].append((time.time(), value))
+                    df = pd.DataFrame(list(local_history[physical_value]), columns=["timestamp", "value"])
+                df["timestamp"] = pd.to_datetime(df["timestamp"], unit="s")
                 df["value"] = pd.to_numeric(df["value"])
-                df_grouped = df.groupby('timestamp')[["value"]].mean()
                 
-                chart = alt.Chart(df_grouped.reset_index(), height=325).mark_line().encode(
+                chart = alt.Chart(df, height=325).mark_line().encode(
                     x=alt.X("timestamp:T", title="Time", axis=alt.Axis(format="%M:%S")),
                     y=alt.Y("value:Q", title="Value"),
                 )
 
                 graphs[physical_value].altair_chart(chart)
-        conn.close()
 
         time.sleep(1)
 
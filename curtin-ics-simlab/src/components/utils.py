@@ -38,15 +38,179 @@
 # FILE PURPOSE: Common functions to be used in all components
 
 import json
+import re
 import time
 import logging
+import threading
+from collections.abc import MutableMapping
+import numpy as np
 from pymodbus.client import ModbusTcpClient, ModbusSerialClient
 from pymodbus.server import ModbusTcpServer, ModbusSerialServer
+from pymodbus.datastore import ModbusSequentialDataBlock
 from pymodbus.pdu.diag_message import ForceListenOnlyModeRequest
 
 # GLOBAL VARIABLES
 listen_only = False
 
+# the address that Modbus TCP servers and Flask endpoints bind to (every interface of the
+# container; the headless runner binds to loopback only)
+BIND_ADDRESS = "0.0.0.0"
+
+# the default port of the Flask endpoints (overridden with "api_port" in the configuration)
+API_PORT = 1111
+
+# the datastore (ModbusSequentialDataBlock) key used for each register type
+DATASTORE_KEYS = {
+    "coil": "co",
+    "discrete_input": "di",
+    "holding_register": "hr",
+    "input_register": "ir",
+}
+
+# how often (simulated seconds) wait_for() polls a register when the clock is virtual (lockstep)
+WAIT_POLL_INTERVAL = 0.05
+
+# the most values a single Modbus read can return (limited by the PDU size), for each value type
+MAX_READ_COUNTS = {
+    "coil": 2000,
+    "discrete_input": 2000,
+    "holding_register": 125,
+    "input_register": 125,
+}
+
+# how many unmonitored addresses a planned block read may span to merge two monitors, unless the
+# outbound connection sets its own "read_gap" (only contiguous monitors by default, as a device may
+# reject a read that covers an address it does not have)
+MONITOR_READ_GAP = 0
+
+# the encodings of register values (data type -> numpy big endian type, None for single bits)
+REGISTER_DATA_TYPES = {
+    "bool": None,
+    "int16": ">i2",
+    "uint16": ">u2",
+    "int32": ">i4",
+    "uint32": ">u4",
+    "float32": ">f4",
+}
+
+
+
+# CLASS:    SimClock
+# PURPOSE:  The simulation clock that components and logic modules read their time and sleeps
+#           from. Simulated time runs "time_scale" times faster than wall-clock time from a common
+#           "epoch" (fixed when the simulation is built), so every container agrees on the
+#           simulated time without talking to each other. A sleep of N simulated seconds takes
+#           N / time_scale wall-clock seconds.
+#
+#           In virtual mode (used by lockstep co-simulation) time only moves when advance() is
+#           called. Sleeping threads are then woken one at a time in order of their wake-up time
+#           (threads woken at the same time run in the order they were created), and each runs
+#           until it sleeps again, so the threads of a component always interleave the same way.
+class SimClock:
+    # how long (wall-clock seconds) a woken thread may run before advance() stops waiting for it
+    STALL_TIMEOUT = 10
+
+    def __init__(self, time_scale=1, epoch=None):
+        self.condition = threading.Condition()
+        self.sleepers = {}
+        self.running = None
+        self.configure(time_scale, epoch)
+
+
+    # FUNCTION: configure
+    # PURPOSE:  Sets the time scale and epoch (in place, so imported references stay valid)
+    def configure(self, time_scale=1, epoch=None, virtual=False):
+        if time_scale <= 0:
+            raise ValueError(f"Simulation clock time_scale must be positive: {time_scale}")
+        self.time_scale = time_scale
+        self.epoch = time.time() if epoch is None else epoch
+        self.virtual = virtual
+        self.now = 0
+
+
+    # FUNCTION: time
+    # PURPOSE:  Returns the simulated time (seconds since the unix epoch)
+    def time(self):
+        if self.virtual:
+            return self.epoch + self.now
+        return self.epoch + (time.time() - self.epoch) * self.time_scale
+
+
+    # FUNCTION: monotonic
+    # PURPOSE:  Returns a monotonic simulated clock (only differences between readings matter)
+    def monotonic(self):
+        if self.virtual:
+            return self.now
+        return time.monotonic() * self.time_scale
+
+
+    # FUNCTION: sleep
+    # PURPOSE:  Sleeps for a number of simulated seconds
+    def sleep(self, seconds):
+        if seconds <= 0:
+            return
+        if not self.virtual:
+            time.sleep(seconds / self.time_scale)
+            return
+
+        # hand control back to advance() and wait to be woken
+        thread = threading.current_thread()
+        with self.condition:
+            self.sleepers[thread] = self.now + seconds
+            if self.running is thread:
+                self.running = None
+                self.condition.notify_all()
+            self.condition.wait_for(lambda: self.running is thread)
+
+
+    # FUNCTION: advance
+    # PURPOSE:  Advances virtual time to "now", running every thread whose sleep ends on the way
+    def advance(self, now):
+        with self.condition:
+            while True:
+                due = [(deadline, natural_key(thread.name), thread)
+                       for thread, deadline in self.sleepers.items() if deadline <= now]
+                if not due:
+                    break
+                deadline, _, thread = min(due, key=lambda entry: entry[:2])
+                del self.sleepers[thread]
+                self.now = max(self.now, deadline)
+
+                # run the thread until it sleeps again (or exits, or stalls)
+                self.running = thread
+                self.condition.notify_all()
+                started = time.monotonic()
+                while self.running is thread:
+                    self.condition.wait(1)
+                    if not thread.is_alive():
+                        self.running = None
+                    elif time.monotonic() - started > self.STALL_TIMEOUT:
+                        logging.warning(f"Thread {thread.name} did not sleep within {self.STALL_TIMEOUT} seconds")
+                        self.running = None
+            self.now = max(self.now, now)
+
+
+
+# FUNCTION: natural_key
+# PURPOSE:  Sort key that orders the numbers in a string numerically ("Thread-9" < "Thread-10")
+def natural_key(text):
+    return [int(part) if part.isdigit() else part for part in re.split(r"(\d+)", text)]
+
+
+
+# the simulation clock of this component (configured from the "clock" configuration)
+clock = SimClock()
+
+
+
+# FUNCTION: configure_clock
+# PURPOSE:  Configures the simulation clock from the "clock" configuration. Lockstep
+#           co-simulation (a "lockstep" configuration) puts the clock in virtual mode.
+def configure_clock(configs):
+    clock_configs = configs.get("clock", {})
+    clock.configure(clock_configs.get("time_scale", 1), clock_configs.get("epoch"), "lockstep" in configs)
+    return clock
+
 
 
 # FUNCTION: retrieve_configs
@@ -65,7 +229,7 @@ async def run_tcp_server(connection, context, identity=None):
     # bind to all interfaces of the container
     tcp_server = ModbusTcpServer(
         context=context, 
-        address=("0.0.0.0", connection["port"]), 
+        address=(BIND_ADDRESS, connection["port"]), 
         identity=identity,
     ) 
     logging.info(f"Starting TCP Server. IP: {connection['ip']}, Port: {connection['port']}")
@@ -108,61 +272,361 @@ def run_rtu_master(connection):
 
 
 
-# FUNCTION: update_register_values
-# PURPOSE:  Updates the "register_values" dictionary with the register values of the modbus server,
-#           which is in the "registers" dictionary.
-def update_register_values(register_values, values):
+# CLASS:    RegisterView
+# PURPOSE:  A register entry of the "register_values" dictionary whose "value" is not a copy but is
+#           read from and written to the modbus server's datastore directly. Every other key
+#           ("type", "address", "count", "io", "id") is static configuration. This keeps the
+#           register["value"] access pattern of the logic files working without sync threads.
+class RegisterView(MutableMapping):
+    def __init__(self, register, datablock):
+        self.register = register
+        self.datablock = datablock
+
+
+    def __getitem__(self, key):
+        if key == "value":
+            return self.datablock.getValues(self.register["address"], 1)[0]
+        return self.register[key]
+
+
+    def __setitem__(self, key, value):
+        if key == "value":
+            self.datablock.setValues(self.register["address"], [value])
+        else:
+            self.register[key] = value
+
+
+    def __delitem__(self, key):
+        if key == "value":
+            raise KeyError("the value of a register view cannot be deleted")
+        del self.register[key]
+
+
+    def __iter__(self):
+        yield from self.register
+        yield "value"
+
+
+    def __len__(self):
+        return len(self.register) + 1
+
+
+    def __repr__(self):
+        return repr(dict(self))
+
+
+
+# FUNCTION: get_register_snapshot
+# PURPOSE:  Returns a copy of a "register_values" dictionary made of plain dictionaries (with the
+#           current values of any register views), e.g. for JSON serialisation.
+def get_register_snapshot(register_values):
+    return {id: dict(register) for id, register in register_values.items()}
+
+
+
+# CLASS:    ObservableDataBlock
+# PURPOSE:  A modbus datastore block that wakes waiting threads whenever a write (from a monitor,
+#           an inbound modbus request or the logic itself) changes its values. Used by wait_for()
+#           and on_change() so logic can react to register changes without polling.
+class ObservableDataBlock(ModbusSequentialDataBlock):
+    def __init__(self, address, values):
+        super().__init__(address, values)
+        self.condition = threading.Condition()
+
+
+    def setValues(self, address, values):
+        if not isinstance(values, list):
+            values = [values]
+        start = address - self.address
+        with self.condition:
+            changed = self.values[start:start + len(values)] != values
+            result = super().setValues(address, values)
+            if changed:
+                self.condition.notify_all()
+        return result
+
+
+
+# FUNCTION: wait_for
+# PURPOSE:  Blocks until predicate(value) is true for a register backed by an ObservableDataBlock,
+#           or until "timeout" simulated seconds have passed. Returns whether the predicate became
+#           true. With a virtual clock (lockstep) the register is polled on the simulation clock
+#           instead, so the run stays deterministic.
+def wait_for(register, predicate, timeout=None):
+    block = getattr(register, "datablock", None)
+    if not isinstance(block, ObservableDataBlock):
+        raise TypeError("wait_for() needs a register backed by an observable datastore")
+
+    if clock.virtual:
+        deadline = None if timeout is None else clock.monotonic() + timeout
+        while not predicate(register["value"]):
+            if deadline is not None and clock.monotonic() >= deadline:
+                return False
+            clock.sleep(WAIT_POLL_INTERVAL)
+        return True
+
+    with block.condition:
+        return bool(block.condition.wait_for(lambda: predicate(register["value"]), None if timeout is None else timeout / clock.time_scale))
+
+
+
+# FUNCTION: on_change
+# PURPOSE:  Calls callback(value) (in a new thread) every time the value of a register backed by
+#           an ObservableDataBlock changes. Changes that are undone before the thread wakes are
+#           not reported. Returns the thread.
+def on_change(register, callback):
+    def watch():
+        last = register["value"]
+        while True:
+            wait_for(register, lambda value: value != last)
+            value = register["value"]
+            if value == last:
+                continue
+            last = value
+            try:
+                callback(value)
+            except Exception as e:
+                logging.error(f"Error: change callback {callback.__name__} failed: {e}")
+
+    thread = threading.Thread(target=watch, daemon=True)
+    thread.start()
+    return thread
+
+
+
+# FUNCTION: get_contiguous_runs
+# PURPOSE:  Splits addresses into sorted runs of contiguous addresses ([5, 1, 2] -> [[1, 2], [5]])
+def get_contiguous_runs(addresses):
+    runs = []
+    for address in sorted(set(addresses)):
+        if runs and address == runs[-1][-1] + 1:
+            runs[-1].append(address)
+        else:
+            runs.append([address])
+    return runs
+
+
+
+# FUNCTION: plan_monitor_reads
+# PURPOSE:  Plans the reads of the configured monitors. Monitors on the same outbound connection
+#           with the same value type and interval are merged into block reads: addresses up to
+#           the connection's "read_gap" (default MONITOR_READ_GAP) apart are read together, up
+#           to the Modbus limit of values per read (MAX_READ_COUNTS). Returns a list of blocks, each with the read to make and the
+#           "targets" (offset into the read, local register address and count) to scatter the
+#           read values into.
+def plan_monitor_reads(configs):
+    local_addresses = {(type, register["id"]): register["address"]
+                       for type in DATASTORE_KEYS
+                       for register in configs["registers"][type] if "id" in register}
+    read_gaps = {connection["id"]: connection.get("read_gap", MONITOR_READ_GAP)
+                 for connection in configs.get("outbound_connections", [])}
+
+    # group the monitors
+    groups = {}
+    for monitor_config in configs["monitors"]:
+        if (monitor_config["value_type"], monitor_config["id"]) not in local_addresses:
+            logging.error(f"Error: monitor {monitor_config['id']} has no {monitor_config['value_type']} register to write to")
+            continue
+        key = (monitor_config["outbound_connection_id"], monitor_config["value_type"], monitor_config["interval"])
+        groups.setdefault(key, []).append(monitor_config)
+
+    # merge the monitors of each group into blocks of nearby addresses
+    blocks = []
+    for (outbound_con_id, value_type, interval), monitor_configs in groups.items():
+        read_gap = read_gaps.get(outbound_con_id, MONITOR_READ_GAP)
+        block = None
+        for monitor_config in sorted(monitor_configs, key=lambda monitor_config: monitor_config["address"]):
+            address = monitor_config["address"]
+            count = monitor_config["count"]
+            if (block is None or address > block["address"] + block["count"] + read_gap
+                    or max(block["count"], address + count - block["address"]) > MAX_READ_COUNTS[value_type]):
+                block = {
+                    "outbound_connection_id": outbound_con_id,
+                    "value_type": value_type,
+                    "interval": interval,
+                    "address": address,
+                    "count": 0,
+                    "ids": [],
+                    "targets": [],
+                }
+                blocks.append(block)
+            block["count"] = max(block["count"], address + count - block["address"])
+            block["ids"].append(monitor_config["id"])
+            block["targets"].append((address - block["address"], local_addresses[(value_type, monitor_config["id"])], count))
+    return blocks
+
+
+
+# FUNCTION: read_values
+# PURPOSE:  Reads "count" values of a value type from an initialised connection, starting at a
+#           (1-based) address. Returns the values, or None if the device answered with an
+#           exception response (e.g. an illegal address).
+def read_values(modbus_con, value_type, address, count):
+    # select the correct function
+    if value_type == "coil":
+        response = modbus_con.read_coils(address-1, count=count)
+    elif value_type == "discrete_input":
+        response = modbus_con.read_discrete_inputs(address-1, count=count)
+    elif value_type == "holding_register":
+        response = modbus_con.read_holding_registers(address-1, count=count)
+    elif value_type == "input_register":
+        response = modbus_con.read_input_registers(address-1, count=count)
+
+    if response.isError():
+        return None
+    if value_type in ("coil", "discrete_input"):
+        return response.bits
+    return response.registers
+
+
+
+# FUNCTION: monitor
+# PURPOSE:  A monitor thread that continuously reads a planned block (see plan_monitor_reads) from
+#           an initialised connection and scatters the values into the local registers. If the
+#           device rejects a merged read, the block's monitors are read one at a time from then
+#           on, so one bad address only fails its own monitor.
+def monitor(block, modbus_con, values):
+    logging.debug(f"Starting Monitor: {', '.join(block['ids'])}")
+    value_type = block["value_type"]
+    datablock = values[DATASTORE_KEYS[value_type]]
+    merged = len(block["targets"]) > 1
+
     while True:
-        for register in register_values.values():
-            type = register["type"]
-            if type == "coil":
-                modbus_value = values["co"].getValues(register["address"], register["count"])[0]
-                register["value"] = modbus_value
-            elif type == "discrete_input":
-                modbus_value = values["di"].getValues(register["address"], register["count"])[0]
-                register["value"] = modbus_value
-            elif type == "holding_register":
-                modbus_value = values["hr"].getValues(register["address"], register["count"])[0]
-                register["value"] = modbus_value
-            elif type == "input_register":
-                modbus_value = values["ir"].getValues(register["address"], register["count"])[0]
-                register["value"] = modbus_value
-
-        '''
-        # create a clone dictionary to hold the "to-be-updated" values
-        updated_register_values = register_values.copy()
-
-        # update the cloned copy with the real modbus values
-        index = 0
-        for co in register_values["coil"]:
-            modbus_value = values["co"].getValues(co["address"], co["count"])[0]
-            updated_register_values["coil"][index]["value"] = modbus_value
-            index += 1
-        index = 0
-        for di in register_values["discrete_input"]:
-            modbus_value = values["di"].getValues(di["address"], di["count"])[0]
-            updated_register_values["discrete_input"][index]["value"] = modbus_value
-            index += 1
-        index = 0
-        for hr in register_values["holding_register"]:
-            modbus_value = values["hr"].getValues(hr["address"], hr["count"])[0]
-            updated_register_values["holding_register"][index]["value"] = modbus_value
-            index += 1
-        index = 0
-        for ir in register_values["input_register"]:
-            modbus_value = values["ir"].getValues(ir["address"], ir["count"])[0]
-            updated_register_values["input_register"][index]["value"] = modbus_value
-            index += 1
-        
-        # update register values from the cloned copy
-        register_values["coil"] = updated_register_values["coil"].copy()
-        register_values["discrete_input"] = updated_register_values["discrete_input"].copy()
-        register_values["holding_register"] = updated_register_values["holding_register"].copy()
-        register_values["input_register"] = updated_register_values["input_register"].copy()
-        '''
-
-
-        time.sleep(0.1)
+        try:
+            response_values = read_values(modbus_con, value_type, block["address"], block["count"]) if merged else None
+            if response_values is not None:
+                for offset, address, count in block["targets"]:
+                    datablock.setValues(address, response_values[offset:offset + count])
+            else:
+                if merged:
+                    logging.warning(f"Merged read of monitors {', '.join(block['ids'])} was rejected, reading them one at a time")
+                    merged = False
+                for id, (offset, address, count) in zip(block["ids"], block["targets"]):
+                    try:
+                        response_values = read_values(modbus_con, value_type, block["address"] + offset, count)
+                    except Exception as e:
+                        logging.error(f"Error: couldn't read values for monitor {id}: {e}")
+                        continue
+                    if response_values is None:
+                        logging.error(f"Error: couldn't read values for monitor {id}: the device rejected the read")
+                    else:
+                        datablock.setValues(address, response_values[:count])
+        except Exception as e:
+            logging.error(f"Error: couldn't read values: {e}")
+
+        clock.sleep(block["interval"])
+
+
+
+# FUNCTION: get_physical_registers
+# PURPOSE:  Returns a list of all registers that are mapped to a physical value (used by sensors
+#           and actuators). Each register configuration is copied with a "type" key added.
+def get_physical_registers(configs):
+    physical_registers = []
+    for type in DATASTORE_KEYS:
+        for register in configs["registers"][type]:
+            physical_register = dict(register)
+            physical_register["type"] = type
+            physical_registers.append(physical_register)
+    return physical_registers
+
+
+
+# CLASS:    RegisterCodec
+# PURPOSE:  Converts between physical values and Modbus register values for all of a device's
+#           physical registers at once. Registers can be configured with:
+#               "data_type" - "int16", "uint16" (default), "int32", "uint32" or "float32" (32-bit
+#                             values span two registers, so "count" must be 2). Coils and
+#                             discrete inputs are always "bool".
+#               "scale", "offset" - physical value = register value * scale + offset
+#               "word_order" - "big" (default, high word first) or "little"
+#           Registers are grouped by data type, so encoding and decoding is one vectorised
+#           (numpy) pass per data type rather than one conversion per register.
+class RegisterCodec:
+    def __init__(self, registers, key="physical_value"):
+        grouped_registers = {}
+        for register in registers:
+            if register["type"] in ("coil", "discrete_input"):
+                data_type = "bool"
+            else:
+                data_type = register.get("data_type", "uint16")
+            if data_type not in REGISTER_DATA_TYPES:
+                raise KeyError(f"Unknown register data type: {data_type}")
+            grouped_registers.setdefault(data_type, []).append(register)
+
+        self.groups = []
+        for data_type, group in grouped_registers.items():
+            dtype = None if data_type == "bool" else np.dtype(REGISTER_DATA_TYPES[data_type])
+            words = 1 if dtype is None else dtype.itemsize // 2
+            for register in group:
+                if dtype is not None and register["count"] != words:
+                    raise ValueError(f"Register {register[key]} ({data_type}) needs a count of {words}")
+            self.groups.append({
+                "data_type": data_type,
+                "dtype": dtype,
+                "words": words,
+                "names": [register[key] for register in group],
+                "blocks": [DATASTORE_KEYS[register["type"]] for register in group],
+                "addresses": [register["address"] for register in group],
+                "scale": np.array([register.get("scale", 1) for register in group], dtype=float),
+                "offset": np.array([register.get("offset", 0) for register in group], dtype=float),
+                "swap": np.array([register.get("word_order", "big") == "little" for register in group]),
+            })
+
+
+    # FUNCTION: encode
+    # PURPOSE:  Encodes a dictionary of name -> physical value into register values. Returns a
+    #           list of (datastore key, address, register values) to write. Missing (None)
+    #           values are skipped.
+    def encode(self, physical_values):
+        writes = []
+        for group in self.groups:
+            raw = np.array([physical_values.get(name) for name in group["names"]], dtype=float)
+            present = ~np.isnan(raw)
+            raw = (np.nan_to_num(raw) - group["offset"]) / group["scale"]
+
+            if group["dtype"] is None:
+                words = (raw != 0).reshape(-1, 1)
+            else:
+                if group["dtype"].kind in "iu":
+                    limits = np.iinfo(group["dtype"])
+                    raw = np.clip(np.rint(raw), limits.min, limits.max)
+                words = raw.astype(group["dtype"]).view(">u2").reshape(-1, group["words"])
+                words[group["swap"]] = words[group["swap"]][:, ::-1]
+
+            words = words.tolist()
+            for index in np.flatnonzero(present):
+                writes.append((group["blocks"][index], group["addresses"][index], words[index]))
+        return writes
+
+
+    # FUNCTION: write
+    # PURPOSE:  Encodes a dictionary of name -> physical value straight into the datastore
+    def write(self, values, physical_values):
+        for block, address, words in self.encode(physical_values):
+            values[block].setValues(address, words)
+
+
+    # FUNCTION: decode
+    # PURPOSE:  Reads all registers from the datastore and decodes them into a dictionary of
+    #           name -> physical value
+    def decode(self, values):
+        physical_values = {}
+        for group in self.groups:
+            words = np.array(
+                [values[block].getValues(address, group["words"]) for block, address in zip(group["blocks"], group["addresses"])],
+                dtype=np.uint16,
+            ).reshape(-1, group["words"])
+
+            if group["dtype"] is None:
+                decoded = words[:, 0].astype(bool).tolist()
+            else:
+                words[group["swap"]] = words[group["swap"]][:, ::-1]
+                raw = words.astype(">u2").view(group["dtype"]).reshape(-1).astype(float)
+                decoded = (raw * group["scale"] + group["offset"]).tolist()
+
+            physical_values.update(zip(group["names"], decoded))
+        return physical_values
 
 
 
@@ -178,7 +642,9 @@ def update_register_values(register_values, values):
 #       "io": "input"
 #   }
 # }
-def create_register_values_dict(configs):
+#           If the modbus server's datastore ("values") is given, each register is a RegisterView
+#           whose "value" is backed by the datastore.
+def create_register_values_dict(configs, values=None):
     register_values = {}
 
     for co in configs["registers"]["coil"]:
@@ -241,4 +707,10 @@ def create_register_values_dict(configs):
         elif "physical_value" in ir:
             register_values[ir["physical_value"]] = register
 
+    # back the registers with the datastore
+    if values is not None:
+        for id, register in register_values.items():
+            del register["value"]
+            register_values[id] = RegisterView(register, values[DATASTORE_KEYS[register["type"]]])
+
     return register_values
\ No newline at end of file
@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+
+# -----------------------------------------------------------------------------
+# Project: Curtin ICS-SimLab
+# File: headless.py
+#
+# Copyright (c) 2025 Jaxson Brown, Curtin University
+#
+# Licensed under the MIT License. You may obtain a copy of the License at:
+#     https://opensource.org/licenses/MIT
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+# This work is supported by a Cross-Campus Cyber Security Research Project
+# funded by **Curtin University**
+#
+# Author: Jaxson Brown
+# Organisation: Curtin University
+# Last Modified: 2025-08-27
+# -----------------------------------------------------------------------------
+
+
+
+# FILE PURPOSE: Runs a whole simulation in a single process, without Docker. Every HIL, sensor,
+#               actuator, PLC and HMI runs its normal component code (from src/components) in its
+#               own thread and event loop, with its logic file imported directly from the
+#               configuration directory. Modbus TCP servers and Flask endpoints are bound to
+#               loopback ports, serial links become RTU over loopback TCP ("socket://" ports), and
+#               the physical layer is the in-memory store. The UI is not started.
+
+import asyncio
+import importlib
+import importlib.util
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+from threading import Thread
+from src import setup
+
+# GLOBAL VARIABLES
+COMPONENTS_DIRECTORY = Path(__file__).resolve().parent / "components"
+LOOPBACK = "127.0.0.1"
+DEFAULT_BASE_PORT = 15000
+
+# the component types in start order (servers start before the clients that connect to them):
+# (JSON key, component file, configuration builder, whether the component runs a logic file)
+COMPONENT_TYPES = [
+    ("hils", "hil.py", setup.get_hil_configs, True),
+    ("sensors", "sensor.py", setup.get_sensor_configs, False),
+    ("actuators", "actuator.py", setup.get_actuator_configs, False),
+    ("plcs", "plc.py", setup.get_plc_configs, True),
+    ("hmis", "hmi.py", setup.get_hmi_configs, False),
+]
+
+
+
+# FUNCTION: load_module
+# PURPOSE:  Imports a Python file as a new module (so every component gets its own globals). If a
+#           logic module is given, it is what the component's "import logic" imports.
+def load_module(module_name, filename, logic=None):
+    spec = importlib.util.spec_from_file_location(module_name, filename)
+    module = importlib.util.module_from_spec(spec)
+    if logic is not None:
+        sys.modules["logic"] = logic
+    try:
+        spec.loader.exec_module(module)
+    finally:
+        sys.modules.pop("logic", None)
+    return module
+
+
+
+# FUNCTION: get_loopback_ports
+# PURPOSE:  Allocates loopback ports from "base_port" upwards. Returns a dictionary of
+#           (ip, port) -> loopback port for every inbound TCP connection, a dictionary of
+#           comm port -> "socket://" port for both ends of every serial link, and an iterator of
+#           the remaining free ports.
+def get_loopback_ports(json_content, base_port):
+    ports = iter(range(base_port, 65536))
+
+    serial_ports = {}
+    for serial_link in json_content.get("serial_networks", []):
+        url = f"socket://{LOOPBACK}:{next(ports)}"
+        serial_ports[serial_link["src"]] = url
+        serial_ports[serial_link["dest"]] = url
+
+    tcp_ports = {}
+    for key, _, _, _ in COMPONENT_TYPES:
+        for device in json_content.get(key, []):
+            for connection in device.get("inbound_connections", []):
+                if connection["type"] == "tcp":
+                    tcp_ports[(connection["ip"], int(connection["port"]))] = next(ports)
+    return tcp_ports, serial_ports, ports
+
+
+
+# FUNCTION: to_loopback
+# PURPOSE:  Returns a copy of a connection configuration moved onto its loopback port
+#           (connections to devices outside the simulation are left as they are)
+def to_loopback(connection, tcp_ports, serial_ports):
+    connection = dict(connection)
+    if connection["type"] == "tcp" and (connection["ip"], int(connection["port"])) in tcp_ports:
+        connection["port"] = tcp_ports[(connection["ip"], int(connection["port"]))]
+        connection["ip"] = LOOPBACK
+    elif connection["type"] == "rtu" and connection["comm_port"] in serial_ports:
+        connection["comm_port"] = serial_ports[connection["comm_port"]]
+    return connection
+
+
+
+# FUNCTION: count_ports
+# PURPOSE:  Returns how many loopback ports a simulation uses (so concurrent runs can be given
+#           ranges that do not overlap)
+def count_ports(json_content):
+    tcp_ports, serial_ports, _ = get_loopback_ports(json_content, 0)
+    devices = sum(len(json_content.get(key, [])) for key, _, _, _ in COMPONENT_TYPES)
+    return len(tcp_ports) + len(set(serial_ports.values())) + devices
+
+
+
+# FUNCTION: read_physical_values
+# PURPOSE:  Reads the current values of every physical value. Returns a dictionary of
+#           HIL name -> (physical value name -> value).
+def read_physical_values(stores):
+    return {hil: store.read_values(list(store.types)) for hil, store in stores.items()}
+
+
+
+# FUNCTION: run
+# PURPOSE:  Runs the simulation in the given configuration directory for "duration" seconds
+#           (forever by default, until interrupted). "parameters" overrides module attributes of
+#           logic files ({device name: {attribute: value}}) and "clock" overrides the clock
+#           configuration (e.g. the time scale). If "sample_interval" is given, every physical
+#           value is sampled every that many simulated seconds. Returns a dictionary with the
+#           final physical values ("values", see read_physical_values) and the samples ("trace",
+#           a list of {"time": simulated seconds, "<hil>.<name>": value} rows).
+def run(directory, duration=None, base_port=DEFAULT_BASE_PORT, parameters=None, clock=None, sample_interval=None):
+    directory = Path(directory).resolve()
+    parameters = parameters or {}
+    with open(directory / "configuration.json", "r") as json_file:
+        json_content = json.load(json_file)
+
+    # the physical layer is shared in memory and lockstep needs a clock per component, which a
+    # single process does not have
+    json_content["physical_layer"] = json_content.get("physical_layer", {}) | {"backend": "memory"}
+    if json_content.pop("lockstep", None) is not None:
+        logging.warning("Lockstep co-simulation is not supported in headless mode, running in real time")
+
+    # fix the epoch of the simulation clock, so every component agrees on the simulated time
+    json_content["clock"] = {"time_scale": 1, "epoch": time.time()} | json_content.get("clock", {}) | (clock or {})
+
+    # import the component modules the way their containers do (from their own directory)
+    sys.path.insert(0, str(COMPONENTS_DIRECTORY))
+    utils = importlib.import_module("utils")
+    physical = importlib.import_module("physical")
+    utils.BIND_ADDRESS = LOOPBACK
+
+    # work in a temporary directory that stands in for the containers' src/ directory
+    working_directory = tempfile.TemporaryDirectory(prefix="ics-simlab-")
+    os.chdir(working_directory.name)
+    os.mkdir(physical.NOTIFY_DIRECTORY)
+    if (directory / "traces").is_dir():
+        os.symlink(directory / "traces", "traces")
+    stores = {}
+    if "hils" in json_content:
+        physical.create_store(".", json_content)
+        stores = physical.open_shards(json_content)
+
+    # start every component in its own thread and event loop
+    tcp_ports, serial_ports, free_ports = get_loopback_ports(json_content, base_port)
+    for key, component_file, get_configs, has_logic in COMPONENT_TYPES:
+        for device in json_content.get(key, []):
+            configs = get_configs(json_content, device)
+            for connections in ["inbound_connections", "outbound_connections"]:
+                if connections in configs:
+                    configs[connections] = [to_loopback(connection, tcp_ports, serial_ports) for connection in configs[connections]]
+            configs["api_port"] = next(free_ports)
+
+            logic = None
+            if has_logic:
+                logic = load_module(f"{device['name']}_logic", directory / "logic" / device["logic"])
+                for name, value in parameters.get(device["name"], {}).items():
+                    if not hasattr(logic, name):
+                        raise AttributeError(f"The logic of {device['name']} has no parameter {name}")
+                    setattr(logic, name, value)
+            component = load_module(device["name"], COMPONENTS_DIRECTORY / component_file, logic)
+
+            logging.info(f"Starting {device['name']} (endpoints on port {configs['api_port']})")
+            Thread(target=asyncio.run, args=(component.main(configs),), name=device["name"], daemon=True).start()
+
+    # run until the duration is up (or interrupted), sampling the physical values
+    start = time.monotonic()
+    simulation_start = utils.clock.monotonic()
+    next_sample = simulation_start
+    trace = []
+    try:
+        while duration is None or time.monotonic() - start < duration:
+            if sample_interval is not None and utils.clock.monotonic() >= next_sample:
+                row = {"time": round(utils.clock.monotonic() - simulation_start, 6)}
+                for hil, values in read_physical_values(stores).items():
+                    row.update({f"{hil}.{name}": value for name, value in values.items()})
+                trace.append(row)
+                next_sample += sample_interval
+            time.sleep(0.1 if sample_interval is None else min(0.1, sample_interval / utils.clock.time_scale))
+    except KeyboardInterrupt:
+        pass
+
+    return {
+        "values": read_physical_values(stores),
+        "trace": trace,
+    }
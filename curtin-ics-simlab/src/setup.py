@@ -41,13 +41,34 @@ import yaml
 import json
 import ipaddress
 import shutil
-import sqlite3
 import subprocess
 import logging
+import time
 from pathlib import Path
+from src.components import physical
+from src.components import archive
+from src.components import lockstep
 
 logging.basicConfig(level=logging.INFO, format='%(levelname)s - %(message)s')
 
+# FUNCTION: get_lockstep_configs
+# PURPOSE:  Returns the lockstep co-simulation configuration of a component (see lockstep.py).
+#           Every participant gets the ordered list of all participants, the name of the
+#           coordinating component (the first HIL) and its own name.
+def get_lockstep_configs(json_content, name):
+    participants = []
+    for phase, devices in [("hil", "hils"), ("sensor", "sensors"), ("plc", "plcs"), ("actuator", "actuators")]:
+        for device in json_content.get(devices, []):
+            participants.append([phase, device["name"]])
+
+    return json_content["lockstep"] | {
+        "participants": participants,
+        "coordinator": json_content["hils"][0]["name"],
+        "name": name,
+    }
+
+
+
 # FUNCTION: parse_json_to_yaml
 # PURPOSE: Opens and validates the JSON file and parses it into a
 #          Docker Compose YAML file
@@ -72,7 +93,7 @@ def parse_json_to_yaml(directory, yaml_filename):
         plcs = build_plc_yaml(json_content)
         sensors = build_sensor_yaml(json_content)
         actuators = build_actuator_yaml(json_content)
-        hils = build_hil_yaml(json_content)
+        hils = build_hil_yaml(json_content, directory)
 
         # create the YAML file
         parsed_json_content = {
@@ -129,9 +150,9 @@ def build_ui_yaml(json_content):
     docker_network = json_content["ui"]["network"]["docker_network"]
     privileged = True
 
-    # add the SQLite database as a volume in the src/ directory
+    # add the physical layer store (a directory of per HIL shards) as a volume in the src/ directory
     volumes = []
-    volumes.append(f"{root_path}/simulation/communications/physical_interactions.db:/src/physical_interactions.db")
+    volumes.append(f"{root_path}/simulation/communications/{physical.STORE_DIRECTORY}:/src/{physical.STORE_DIRECTORY}")
 
     json_ui["ui"] = {
         "build": build,
@@ -172,6 +193,8 @@ def build_plc_yaml(json_content):
         # add inbound connection info
         found_ip = False
         json_plcs[container_name]["volumes"] = []
+        if "lockstep" in json_content:
+            json_plcs[container_name]["volumes"].append(f"{root_path}/simulation/communications/{lockstep.LOCKSTEP_DIRECTORY}:/src/{lockstep.LOCKSTEP_DIRECTORY}")
         for connection in plc["inbound_connections"]:
             if connection["type"] == "tcp":
                 ip = connection["ip"]
@@ -316,9 +339,12 @@ def build_sensor_yaml(json_content):
         container_name = sensor["name"]
         privileged = True
 
-        # add the SQLite database as a volume in the src/ directory
+        # add the physical layer store (a directory of per HIL shards) as a volume in the src/ directory
         volumes = []
-        volumes.append(f"{root_path}/simulation/communications/physical_interactions.db:/src/physical_interactions.db")
+        volumes.append(f"{root_path}/simulation/communications/{physical.STORE_DIRECTORY}:/src/{physical.STORE_DIRECTORY}")
+        volumes.append(f"{root_path}/simulation/communications/{physical.NOTIFY_DIRECTORY}:/src/{physical.NOTIFY_DIRECTORY}")
+        if "lockstep" in json_content:
+            volumes.append(f"{root_path}/simulation/communications/{lockstep.LOCKSTEP_DIRECTORY}:/src/{lockstep.LOCKSTEP_DIRECTORY}")
 
         # add any virtual serial port
         for connection in sensor["inbound_connections"]:
@@ -360,9 +386,12 @@ def build_actuator_yaml(json_content):
         container_name = actuator["name"]
         privileged = True
         
-        # add the SQLite database as a volume in the src/ directory
+        # add the physical layer store (a directory of per HIL shards) as a volume in the src/ directory
         volumes = []
-        volumes.append(f"{root_path}/simulation/communications/physical_interactions.db:/src/physical_interactions.db")
+        volumes.append(f"{root_path}/simulation/communications/{physical.STORE_DIRECTORY}:/src/{physical.STORE_DIRECTORY}")
+        volumes.append(f"{root_path}/simulation/communications/{physical.NOTIFY_DIRECTORY}:/src/{physical.NOTIFY_DIRECTORY}")
+        if "lockstep" in json_content:
+            volumes.append(f"{root_path}/simulation/communications/{lockstep.LOCKSTEP_DIRECTORY}:/src/{lockstep.LOCKSTEP_DIRECTORY}")
 
         # add any virtual serial port to the volumes
         for connection in actuator["inbound_connections"]:
@@ -394,7 +423,7 @@ def build_actuator_yaml(json_content):
 
 # FUNCTION: build_hil_yaml
 # PURPOSE:  Builds the section of the YAML file for the physical hardware-in-the-loop
-def build_hil_yaml(json_content):
+def build_hil_yaml(json_content, directory):
     root_path = Path(__file__).resolve().parent.parent
     json_hils = {}
     if "hils" not in json_content: return {}
@@ -404,9 +433,21 @@ def build_hil_yaml(json_content):
         container_name = hil["name"]
         privileged = True
 
-        # add the SQLite database as a volume in the src/ directory
+        # add the physical layer store (a directory of per HIL shards) as a volume in the src/ directory
         volumes = []
-        volumes.append(f"{root_path}/simulation/communications/physical_interactions.db:/src/physical_interactions.db")
+        volumes.append(f"{root_path}/simulation/communications/{physical.STORE_DIRECTORY}:/src/{physical.STORE_DIRECTORY}")
+        volumes.append(f"{root_path}/simulation/communications/{physical.NOTIFY_DIRECTORY}:/src/{physical.NOTIFY_DIRECTORY}")
+        if "lockstep" in json_content:
+            volumes.append(f"{root_path}/simulation/communications/{lockstep.LOCKSTEP_DIRECTORY}:/src/{lockstep.LOCKSTEP_DIRECTORY}")
+
+        # add the history archive dataset (kept outside the simulation directory so it survives rebuilds)
+        if "archive" in json_content.get("physical_layer", {}):
+            volumes.append(f"{root_path}/{archive.ARCHIVE_DIRECTORY}/{hil['name']}:/src/{archive.ARCHIVE_DIRECTORY}/{hil['name']}")
+
+        # add the recorded trace files of the configuration (read-only, they are streamed by the HIL)
+        trace_path = Path(directory).resolve() / "traces"
+        if trace_path.is_dir():
+            volumes.append(f"{trace_path}:/src/traces:ro")
 
         json_hils[container_name] = {
             "build": build,
@@ -419,6 +460,90 @@ def build_hil_yaml(json_content):
 
 ################################################################################
 
+# FUNCTION: get_hmi_configs
+# PURPOSE:  Returns the configuration of a HMI container
+def get_hmi_configs(json_content, hmi):
+    return {
+        "inbound_connections": hmi["inbound_connections"],
+        "outbound_connections": hmi["outbound_connections"],
+        "registers": hmi["registers"],
+        "monitors": hmi["monitors"],
+        "controllers": hmi["controllers"],
+        "clock": json_content["clock"],
+    }
+
+
+# FUNCTION: get_plc_configs
+# PURPOSE:  Returns the configuration of a PLC container
+def get_plc_configs(json_content, plc):
+    json_config = {
+        "inbound_connections": plc["inbound_connections"],
+        "outbound_connections": plc["outbound_connections"],
+        "registers": plc["registers"],
+        "monitors": plc["monitors"],
+        "controllers": plc["controllers"],
+        "clock": json_content["clock"],
+        "scan": plc.get("scan", {}),
+    }
+    if "identity" in plc:
+        json_config["identity"] = plc["identity"]
+        
+    if "lockstep" in json_content:
+        json_config["lockstep"] = get_lockstep_configs(json_content, plc["name"])
+    return json_config
+
+
+# FUNCTION: get_sensor_configs
+# PURPOSE:  Returns the configuration of a sensor container
+def get_sensor_configs(json_content, sensor):
+    json_config = {
+        "database": {
+            "table": f"{sensor['hil']}",
+        },
+        "physical_layer": json_content.get("physical_layer", {}),
+        "clock": json_content["clock"],
+        "inbound_connections": sensor["inbound_connections"],
+        "registers": sensor["registers"]
+    }
+    if "lockstep" in json_content:
+        json_config["lockstep"] = get_lockstep_configs(json_content, sensor["name"])
+    return json_config
+
+
+# FUNCTION: get_actuator_configs
+# PURPOSE:  Returns the configuration of an actuator container
+def get_actuator_configs(json_content, actuator):
+    json_config = {
+        "database": {
+            "table": f"{actuator['hil']}",
+        },
+        "physical_layer": json_content.get("physical_layer", {}),
+        "clock": json_content["clock"],
+        "inbound_connections": actuator["inbound_connections"],
+        "registers": actuator["registers"]
+    }
+    if "lockstep" in json_content:
+        json_config["lockstep"] = get_lockstep_configs(json_content, actuator["name"])
+    return json_config
+
+
+# FUNCTION: get_hil_configs
+# PURPOSE:  Returns the configuration of a HIL container
+def get_hil_configs(json_content, hil):
+    json_config = {
+        "database": {
+            "table": f"{hil['name']}",
+            "physical_values": hil["physical_values"]
+        },
+        "physical_layer": json_content.get("physical_layer", {}),
+        "clock": json_content["clock"],
+        "engine": hil.get("engine", {}),
+    }
+    if "lockstep" in json_content:
+        json_config["lockstep"] = get_lockstep_configs(json_content, hil["name"])
+    return json_config
+
+
 # FUNCTION: build_ui_directory
 # PURPOSE:  Creates the ui directory
 def build_ui_directory(json_content):
@@ -435,6 +560,7 @@ def build_ui_directory(json_content):
 
     # copy ui code
     shutil.copy(f"{root_path}/src/components/ui.py", f"{root_path}/simulation/containers/ui/src")
+    shutil.copy(f"{root_path}/src/components/physical.py", f"{root_path}/simulation/containers/ui/src")
 
 
 # FUNCTION: build_hmi_directory
@@ -450,13 +576,7 @@ def build_hmi_directory(json_content):
         shutil.copy(f"{root_path}/src/docker-files/component/Dockerfile", f"{root_path}/simulation/containers/{hmi['name']}")
         
         # create JSON configuration and write into directory
-        json_config = {
-            "inbound_connections": hmi["inbound_connections"],
-            "outbound_connections": hmi["outbound_connections"],
-            "registers": hmi["registers"],
-            "monitors": hmi["monitors"],
-            "controllers": hmi["controllers"]
-        }
+        json_config = get_hmi_configs(json_content, hmi)
         with open(f"{root_path}/simulation/containers/{hmi['name']}/src/config.json", "w") as conf_file:
             conf_file.write(json.dumps(json_config, indent=4))
 
@@ -478,16 +598,7 @@ def build_plc_directory(json_content, directory):
         shutil.copy(f"{root_path}/src/docker-files/component/Dockerfile", f"{root_path}/simulation/containers/{plc['name']}")
         
         # create JSON configuration and write into directory
-        json_config = {
-            "inbound_connections": plc["inbound_connections"],
-            "outbound_connections": plc["outbound_connections"],
-            "registers": plc["registers"],
-            "monitors": plc["monitors"],
-            "controllers": plc["controllers"]
-        }
-        if "identity" in plc:
-            json_config["identity"] = plc["identity"]
-            
+        json_config = get_plc_configs(json_content, plc)
         with open(f"{root_path}/simulation/containers/{plc['name']}/src/config.json", "w") as conf_file:
             conf_file.write(json.dumps(json_config, indent=4))
 
@@ -495,6 +606,8 @@ def build_plc_directory(json_content, directory):
         logic_file = plc["logic"]
         shutil.copy(f"{directory}/logic/{logic_file}", f"{root_path}/simulation/containers/{plc['name']}/src/logic.py")
         shutil.copy(f"{root_path}/src/components/utils.py", f"{root_path}/simulation/containers/{plc['name']}/src")
+        shutil.copy(f"{root_path}/src/components/lockstep.py", f"{root_path}/simulation/containers/{plc['name']}/src")
+        shutil.copy(f"{root_path}/src/components/signals.py", f"{root_path}/simulation/containers/{plc['name']}/src")
         shutil.copy(f"{root_path}/src/components/plc.py", f"{root_path}/simulation/containers/{plc['name']}/src")
 
 
@@ -511,19 +624,15 @@ def build_sensor_directory(json_content):
         shutil.copy(f"{root_path}/src/docker-files/component/Dockerfile", f"{root_path}/simulation/containers/{sensor['name']}")
 
         # create JSON configuration and write into directory
-        json_config = {
-            "database": {
-                "table": f"{sensor['hil']}",
-            },
-            "inbound_connections": sensor["inbound_connections"],
-            "registers": sensor["registers"]
-        }
+        json_config = get_sensor_configs(json_content, sensor)
         with open(f"{root_path}/simulation/containers/{sensor['name']}/src/config.json", "w") as conf_file:
             conf_file.write(json.dumps(json_config, indent=4))
 
         # copy sensor code
         shutil.copy(f"{root_path}/src/components/sensor.py", f"{root_path}/simulation/containers/{sensor['name']}/src")
         shutil.copy(f"{root_path}/src/components/utils.py", f"{root_path}/simulation/containers/{sensor['name']}/src")
+        shutil.copy(f"{root_path}/src/components/lockstep.py", f"{root_path}/simulation/containers/{sensor['name']}/src")
+        shutil.copy(f"{root_path}/src/components/physical.py", f"{root_path}/simulation/containers/{sensor['name']}/src")
 
 
 # FUNCTION: build_actuator_directory
@@ -539,19 +648,15 @@ def build_actuator_directory(json_content, directory):
         shutil.copy(f"{root_path}/src/docker-files/component/Dockerfile", f"{root_path}/simulation/containers/{actuator['name']}")
 
         # create JSON configuration and write into directory
-        json_config = {
-            "database": {
-                "table": f"{actuator['hil']}",
-            },
-            "inbound_connections": actuator["inbound_connections"],
-            "registers": actuator["registers"]
-        }
+        json_config = get_actuator_configs(json_content, actuator)
         with open(f"{root_path}/simulation/containers/{actuator['name']}/src/config.json", "w") as conf_file:
             conf_file.write(json.dumps(json_config, indent=4))
 
         # copy actuator code
         shutil.copy(f"{root_path}/src/components/actuator.py", f"{root_path}/simulation/containers/{actuator['name']}/src")
         shutil.copy(f"{root_path}/src/components/utils.py", f"{root_path}/simulation/containers/{actuator['name']}/src")
+        shutil.copy(f"{root_path}/src/components/lockstep.py", f"{root_path}/simulation/containers/{actuator['name']}/src")
+        shutil.copy(f"{root_path}/src/components/physical.py", f"{root_path}/simulation/containers/{actuator['name']}/src")
 
 
 # FUNCTION: build_hil_directory
@@ -566,12 +671,8 @@ def build_hil_directory(json_content, directory):
         Path(f"{root_path}/simulation/containers/{hil['name']}/src").mkdir()
         shutil.copy(f"{root_path}/src/docker-files/component/Dockerfile", f"{root_path}/simulation/containers/{hil['name']}")
 
-        json_config = {
-            "database": {
-                "table": f"{hil['name']}",
-                "physical_values": hil["physical_values"]
-            },
-        }
+        # create JSON configuration and write into directory
+        json_config = get_hil_configs(json_content, hil)
         with open(f"{root_path}/simulation/containers/{hil['name']}/src/config.json", "w") as conf_file:
             conf_file.write(json.dumps(json_config, indent=4))
 
@@ -580,6 +681,14 @@ def build_hil_directory(json_content, directory):
         shutil.copy(f"{directory}/logic/{logic_file}", f"{root_path}/simulation/containers/{hil['name']}/src/logic.py")
         shutil.copy(f"{root_path}/src/components/hil.py", f"{root_path}/simulation/containers/{hil['name']}/src")
         shutil.copy(f"{root_path}/src/components/utils.py", f"{root_path}/simulation/containers/{hil['name']}/src")
+        shutil.copy(f"{root_path}/src/components/lockstep.py", f"{root_path}/simulation/containers/{hil['name']}/src")
+        shutil.copy(f"{root_path}/src/components/signals.py", f"{root_path}/simulation/containers/{hil['name']}/src")
+        shutil.copy(f"{root_path}/src/components/physical.py", f"{root_path}/simulation/containers/{hil['name']}/src")
+        shutil.copy(f"{root_path}/src/components/archive.py", f"{root_path}/simulation/containers/{hil['name']}/src")
+
+        # create the history archive dataset directory
+        if "archive" in json_content.get("physical_layer", {}):
+            Path(f"{root_path}/{archive.ARCHIVE_DIRECTORY}/{hil['name']}").mkdir(parents=True, exist_ok=True)
 
 
 # FUNCTION: create_containers
@@ -593,6 +702,9 @@ def create_containers(json_content, directory):
     Path(f"{root_path}/simulation").mkdir()
     Path(f"{root_path}/simulation/containers").mkdir()
 
+    # fix the epoch of the simulation clock, so every component agrees on the simulated time
+    json_content["clock"] = {"time_scale": 1, "epoch": time.time()} | json_content.get("clock", {})
+
     # create directories for all component containers
     build_ui_directory(json_content)
     build_hmi_directory(json_content)
@@ -603,8 +715,8 @@ def create_containers(json_content, directory):
     
     
 # FUNCTION: create_communications
-# PURPOSE:  Builds the directory used for communications. This directory holds the SQLite database
-#           and the virtual serial ports, which are created using socat.
+# PURPOSE:  Builds the directory used for communications. This directory holds the physical layer
+#           store and the virtual serial ports, which are created using socat.
 def create_communications(json_content):
     root_path = Path(__file__).resolve().parent.parent
 
@@ -612,36 +724,15 @@ def create_communications(json_content):
     shutil.rmtree(f"{root_path}/simulation/communications", ignore_errors=True)
     Path(f"{root_path}/simulation/communications").mkdir()
 
-    # create hardware SQLite database
-    conn = sqlite3.connect(f"{root_path}/simulation/communications/physical_interactions.db")
-    cursor = conn.cursor()
-    cursor.execute("PRAGMA synchronous = OFF;")
+    # create the physical layer store (one SQLite database or mmap file per HIL, selected in the configuration)
+    physical.create_store(f"{root_path}/simulation/communications", json_content)
 
-    # optimise db for speed
-    #cursor.execute("PRAGMA journal_mode=WAL;")
-    #cursor.execute("PRAGMA synchronous=NORMAL;")
-    #conn.commit()
+    # create the directory for physical layer change notifications (unix domain sockets)
+    Path(f"{root_path}/simulation/communications/{physical.NOTIFY_DIRECTORY}").mkdir()
 
-    # create tables for the HIL components in the SQLite database
-    cursor.execute("CREATE TABLE hils (name TEXT PRIMARY KEY)")
-    conn.commit()
-
-    for hil in json_content["hils"]:
-        for physical_value in hil["physical_values"]:
-            cursor.execute(f"INSERT INTO hils(name) VALUES (\"{physical_value['name']}\")")
-            conn.commit()
-            cursor.execute(
-                f"""CREATE TABLE {physical_value['name']} (
-                    value TEXT,
-                    timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
-                    hil TEXT,
-                    FOREIGN KEY(hil) REFERENCES hils(name)
-                )"""
-                )
-            conn.commit()
-            cursor.execute(f"INSERT INTO {physical_value['name']}(hil) VALUES (\"{hil['name']}\")")
-            conn.commit()
-    conn.close()
+    # create the directory for lockstep co-simulation coordination (unix domain sockets)
+    if "lockstep" in json_content:
+        Path(f"{root_path}/simulation/communications/{lockstep.LOCKSTEP_DIRECTORY}").mkdir()
 
     # create virtual serial ports
     links = []
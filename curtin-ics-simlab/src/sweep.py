@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+
+# -----------------------------------------------------------------------------
+# Project: Curtin ICS-SimLab
+# File: sweep.py
+#
+# Copyright (c) 2025 Jaxson Brown, Curtin University
+#
+# Licensed under the MIT License. You may obtain a copy of the License at:
+#     https://opensource.org/licenses/MIT
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+# This work is supported by a Cross-Campus Cyber Security Research Project
+# funded by **Curtin University**
+#
+# Author: Jaxson Brown
+# Organisation: Curtin University
+# Last Modified: 2025-08-27
+# -----------------------------------------------------------------------------
+
+
+
+# FILE PURPOSE: Runs parameter sweeps and Monte Carlo studies of a configuration. A sweep file
+#               (JSON) gives the parameters to vary - module attributes of logic files, named
+#               "<device name>.<attribute>" - as a grid of values and/or random distributions.
+#               Every variant runs as an isolated headless simulation in its own process, on a
+#               process pool sized to the cores. Each run's physical values are sampled into a
+#               trace (CSV), and the parameters and KPIs (final, min, max and mean of every
+#               physical value) of all runs are collected into one result table ("results.csv").
+#
+#               {
+#                   "duration": 60,             wall-clock seconds per run
+#                   "time_scale": 10,           (optional) simulation clock speed-up
+#                   "sample_interval": 1,       (optional) simulated seconds between trace samples
+#                   "samples": 20,              (optional) random samples per grid point
+#                                               (default 1)
+#                   "seed": 1,                  (optional) seed of the random distributions
+#                   "parameters": {
+#                       "plc1.TANK_LOW_LEVEL": [200, 250, 300],
+#                       "plc1.TANK_HIGH_LEVEL": {"distribution": "uniform",
+#                                                "low": 450, "high": 550}
+#                   }
+#               }
+#
+#               Distributions are "uniform" (low, high), "normal" (mean, std_dev), "randint" (low,
+#               high, inclusive) and "choice" (values).
+
+import csv
+import itertools
+import json
+import logging
+import multiprocessing
+import os
+import time
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from src import headless
+
+# GLOBAL VARIABLES
+DEFAULT_SAMPLE_INTERVAL = 1
+RESULTS_FILE = "results.csv"
+
+
+
+# FUNCTION: sample_distribution
+# PURPOSE:  Draws one value from a distribution of the sweep file
+def sample_distribution(distribution, rng):
+    kind = distribution["distribution"]
+    if kind == "uniform":
+        return float(rng.uniform(distribution["low"], distribution["high"]))
+    elif kind == "normal":
+        return float(rng.normal(distribution["mean"], distribution["std_dev"]))
+    elif kind == "randint":
+        return int(rng.integers(distribution["low"], distribution["high"], endpoint=True))
+    elif kind == "choice":
+        return distribution["values"][int(rng.integers(len(distribution["values"])))]
+    raise KeyError(f"Unknown distribution: {kind}")
+
+
+
+# FUNCTION: get_variants
+# PURPOSE:  Returns the list of parameter variants ({"<device>.<attribute>": value}) of a sweep:
+#           every combination of the grid values, each with "samples" draws of the random
+#           distributions
+def get_variants(spec):
+    rng = np.random.default_rng(spec.get("seed"))
+    parameters = spec.get("parameters", {})
+    grid = {name: values for name, values in parameters.items() if isinstance(values, list)}
+    distributions = {name: values for name, values in parameters.items() if isinstance(values, dict)}
+
+    variants = []
+    for combination in itertools.product(*grid.values()):
+        for _ in range(spec.get("samples", 1)):
+            variant = dict(zip(grid, combination))
+            variant.update({name: sample_distribution(distribution, rng) for name, distribution in distributions.items()})
+            variants.append(variant)
+    return variants
+
+
+
+# FUNCTION: get_kpis
+# PURPOSE:  Returns the KPIs of a run: the final value and the trace's min, max and mean of every
+#           physical value
+def get_kpis(results):
+    kpis = {}
+    for hil, values in results["values"].items():
+        for name, value in values.items():
+            key = f"{hil}.{name}"
+            samples = np.array([np.nan if row.get(key) is None else float(row[key]) for row in results["trace"]])
+            kpis[f"{key}.final"] = value
+            if samples.size and not np.isnan(samples).all():
+                kpis[f"{key}.min"] = float(np.nanmin(samples))
+                kpis[f"{key}.max"] = float(np.nanmax(samples))
+                kpis[f"{key}.mean"] = float(np.nanmean(samples))
+    return kpis
+
+
+
+# FUNCTION: write_table
+# PURPOSE:  Writes a list of dictionaries as a CSV file (the columns are the union of their keys)
+def write_table(filename, rows):
+    columns = list(dict.fromkeys(column for row in rows for column in row))
+    with open(filename, "w", newline="") as csv_file:
+        writer = csv.DictWriter(csv_file, fieldnames=columns)
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+
+# FUNCTION: run_variant
+# PURPOSE:  Runs one variant as a headless simulation (in a pool process of its own). The run's
+#           output goes to "logs/run_<index>.log" and its trace to "traces/run_<index>.csv" in the
+#           output directory. Returns the run's row of the result table.
+def run_variant(directory, index, variant, spec, base_port, output):
+    log_file = os.open(output / "logs" / f"run_{index}.log", os.O_WRONLY | os.O_CREAT | os.O_TRUNC)
+    os.dup2(log_file, 1)
+    os.dup2(log_file, 2)
+
+    parameters = {}
+    for key, value in variant.items():
+        device, name = key.split(".", 1)
+        parameters.setdefault(device, {})[name] = value
+    clock = {"time_scale": spec["time_scale"]} if "time_scale" in spec else None
+
+    start = time.monotonic()
+    results = headless.run(directory, spec["duration"], base_port, parameters, clock, spec.get("sample_interval", DEFAULT_SAMPLE_INTERVAL))
+    wall_time = time.monotonic() - start
+
+    trace_file = output / "traces" / f"run_{index}.csv"
+    if results["trace"]:
+        write_table(trace_file, results["trace"])
+    return {"run": index} | variant | get_kpis(results) | {"wall_time": round(wall_time, 3), "trace": str(trace_file.relative_to(output))}
+
+
+
+# FUNCTION: sweep
+# PURPOSE:  Runs every variant of the sweep file over a process pool ("workers" processes,
+#           default one per core) and writes the result table. Concurrent runs are given
+#           separate ranges of loopback ports. Returns the rows of the result table.
+def sweep(directory, spec_file, output, workers=None, base_port=headless.DEFAULT_BASE_PORT):
+    directory = Path(directory).resolve()
+    output = Path(output).resolve()
+    with open(spec_file, "r") as json_file:
+        spec = json.load(json_file)
+    with open(directory / "configuration.json", "r") as json_file:
+        block = headless.count_ports(json.load(json_file))
+
+    (output / "logs").mkdir(parents=True, exist_ok=True)
+    (output / "traces").mkdir(parents=True, exist_ok=True)
+    variants = get_variants(spec)
+    slots = (65536 - base_port) // block
+    workers = workers or os.cpu_count()
+    logging.info(f"Sweeping {len(variants)} runs over {workers} processes")
+
+    # every run gets a fresh process (a headless simulation runs until its process exits)
+    rows = []
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(workers, mp_context=context, max_tasks_per_child=1) as pool:
+        futures = {}
+        for index, variant in enumerate(variants):
+            port = base_port + (index % slots) * block
+            futures[pool.submit(run_variant, directory, index, variant, spec, port, output)] = (index, variant)
+
+        for future in as_completed(futures):
+            index, variant = futures[future]
+            try:
+                rows.append(future.result())
+            except Exception as e:
+                logging.error(f"Error: run {index} failed: {e}")
+                rows.append({"run": index} | variant | {"error": str(e)})
+            logging.info(f"Finished {len(rows)}/{len(variants)} runs")
+
+    rows.sort(key=lambda row: row["run"])
+    write_table(output / RESULTS_FILE, rows)
+    logging.info(f"Results written to {output / RESULTS_FILE}")
+    return rows
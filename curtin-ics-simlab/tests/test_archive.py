@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+
+# -----------------------------------------------------------------------------
+# Project: Curtin ICS-SimLab
+# File: test_archive.py
+#
+# Copyright (c) 2025 Jaxson Brown, Curtin University
+#
+# Licensed under the MIT License. You may obtain a copy of the License at:
+#     https://opensource.org/licenses/MIT
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+# This work is supported by a Cross-Campus Cyber Security Research Project
+# funded by **Curtin University**
+#
+# Author: Jaxson Brown
+# Organisation: Curtin University
+# Last Modified: 2025-08-27
+# -----------------------------------------------------------------------------
+
+
+# FILE PURPOSE: Tests of the physical history archive (archive.py)
+
+import os
+import numpy as np
+import pytest
+import archive
+import physical
+
+# GLOBAL VARIABLES
+CONFIG = {
+    "hils": [{"name": "hil", "physical_values": [{"name": "level"}, {"name": "valve", "type": "bool"}]}],
+    "physical_layer": {"history": True},
+}
+POLICY = {"chunk_rows": 7, "rotate_rows": 20}
+
+
+
+# FUNCTION: store
+# PURPOSE:  A physical store with 30 history rows of "level" (timestamps 0 - 29) and 10 of
+#           "valve" (timestamps 100 - 109)
+@pytest.fixture
+def store(tmp_path):
+    filename = str(tmp_path / "physical.db")
+    physical.SQLiteStore.create(filename, CONFIG)
+    store = physical.SQLiteStore(filename)
+    store.now = lambda: store.time
+    for index in range(30):
+        store.time = index
+        store.write_value("level", index * 1.5)
+    for index in range(10):
+        store.time = 100 + index
+        store.write_value("valve", index % 2)
+    store.commit()
+    yield store
+    store.close()
+
+
+
+def test_rotate_and_load_round_trip(store, tmp_path):
+    dataset = str(tmp_path / "archive")
+    assert archive.archive_history(store.conn, dataset, ["level", "valve"], POLICY) == 40
+
+    index = archive.read_index(dataset)
+    assert [entry["rows"] for entry in index["files"]] == [20, 20]
+    assert index["last_seq"] == 40
+    assert sorted(os.listdir(dataset)) == sorted([archive.INDEX_FILE] + [entry["file"] for entry in index["files"]])
+
+    loaded = archive.load(dataset)
+    np.testing.assert_array_equal(loaded["level"][0], np.arange(30))
+    np.testing.assert_array_equal(loaded["level"][1], np.arange(30) * 1.5)
+    np.testing.assert_array_equal(loaded["valve"][1], [0, 1] * 5)
+
+
+
+def test_archiving_is_incremental(store, tmp_path):
+    dataset = str(tmp_path / "archive")
+    archive.archive_history(store.conn, dataset, ["level", "valve"], POLICY)
+    assert archive.archive_history(store.conn, dataset, ["level", "valve"], POLICY) == 0
+
+    store.time = 200
+    store.write_value("level", 99)
+    store.commit()
+    assert archive.archive_history(store.conn, dataset, ["level", "valve"], POLICY) == 1
+    assert archive.load(dataset)["level"][1][-1] == 99
+
+
+
+def test_load_time_range_and_names(store, tmp_path):
+    dataset = str(tmp_path / "archive")
+    archive.archive_history(store.conn, dataset, ["level", "valve"], POLICY)
+
+    loaded = archive.load(dataset, start=25, end=102)
+    np.testing.assert_array_equal(loaded["level"][0], [25, 26, 27, 28, 29])
+    np.testing.assert_array_equal(loaded["valve"][0], [100, 101, 102])
+    assert list(archive.load(dataset, names=["valve"])) == ["valve"]
+
+    # only the second file overlaps the range, so the first is never opened
+    os.remove(os.path.join(dataset, archive.read_index(dataset)["files"][0]["file"]))
+    assert list(archive.load(dataset, start=100)) == ["valve"]
+
+
+
+def test_prune_deletes_archived_rows(store, tmp_path):
+    dataset = str(tmp_path / "archive")
+    archive.archive_history(store.conn, dataset, ["level"], POLICY | {"prune": True})
+
+    assert store.read_history("level") == []
+    assert len(store.read_history("valve")) == 10
+
+
+
+def test_retention_keeps_rows_until_they_are_archived(store, tmp_path):
+    dataset = str(tmp_path / "archive")
+    retention = {"max_rows": 5, "bucket": 10}
+
+    # nothing is archived yet, so retention keeps every row
+    store.apply_retention(["level", "valve"], retention, archive.read_index(dataset)["last_seq"])
+    assert len(store.read_history("level")) == 30
+
+    # retention and archiving interleaved (as the HIL's threads run) never lose a row
+    archive.archive_history(store.conn, dataset, ["level", "valve"], POLICY)
+    for index in range(30, 40):
+        store.time = index
+        store.write_value("level", index * 1.5)
+        store.commit()
+        store.apply_retention(["level", "valve"], retention, archive.read_index(dataset)["last_seq"])
+    assert len(store.read_history("level")) == 10
+    archive.archive_history(store.conn, dataset, ["level", "valve"], POLICY)
+    store.apply_retention(["level", "valve"], retention, archive.read_index(dataset)["last_seq"])
+    assert len(store.read_history("level")) == 5
+
+    loaded = archive.load(dataset)
+    np.testing.assert_array_equal(loaded["level"][0], np.arange(40))
+    np.testing.assert_array_equal(loaded["level"][1], np.arange(40) * 1.5)
+    assert len(loaded["valve"][0]) == 10
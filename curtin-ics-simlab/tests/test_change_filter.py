@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+
+# -----------------------------------------------------------------------------
+# Project: Curtin ICS-SimLab
+# File: test_change_filter.py
+#
+# Copyright (c) 2025 Jaxson Brown, Curtin University
+#
+# Licensed under the MIT License. You may obtain a copy of the License at:
+#     https://opensource.org/licenses/MIT
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+# This work is supported by a Cross-Campus Cyber Security Research Project
+# funded by **Curtin University**
+#
+# Author: Jaxson Brown
+# Organisation: Curtin University
+# Last Modified: 2025-08-27
+# -----------------------------------------------------------------------------
+
+
+# FILE PURPOSE: Tests of report-by-exception physical writes (physical.ChangeFilter)
+
+import physical
+
+
+
+# FUNCTION: make_filter
+# PURPOSE:  Returns a change filter whose heartbeat clock is set by the test
+def make_filter(**options):
+    change_filter = physical.ChangeFilter(**options)
+    change_filter.time = 0
+    change_filter.now = lambda: change_filter.time
+    return change_filter
+
+
+
+def test_first_write_and_changes_are_written():
+    change_filter = make_filter(heartbeat=None)
+    assert change_filter.should_write("valve", False)
+    assert not change_filter.should_write("valve", False)
+    assert change_filter.should_write("valve", True)
+    assert change_filter.stats() == {"writes": 2, "suppressed": 1}
+
+
+
+def test_deadband_is_measured_from_the_last_written_value():
+    change_filter = make_filter(deadband=1, heartbeat=None)
+    assert change_filter.should_write("level", 10)
+    assert not change_filter.should_write("level", 10.6)
+    assert not change_filter.should_write("level", 11)
+    assert change_filter.should_write("level", 11.2)
+
+    # a per value deadband overrides the default
+    assert change_filter.should_write("level", 11.3, deadband=0)
+    assert not change_filter.should_write("level", 9, deadband=5)
+
+
+
+def test_deadband_falls_back_to_equality_for_non_numbers():
+    change_filter = make_filter(deadband=1, heartbeat=None)
+    assert change_filter.should_write("state", "open")
+    assert not change_filter.should_write("state", "open")
+    assert change_filter.should_write("state", "closed")
+
+
+
+def test_heartbeat_rewrites_unchanged_values():
+    change_filter = make_filter(heartbeat=5)
+    assert change_filter.should_write("level", 1)
+    change_filter.time = 4.9
+    assert not change_filter.should_write("level", 1)
+    change_filter.time = 5
+    assert change_filter.should_write("level", 1)
+
+    # the heartbeat restarts from the last write
+    change_filter.time = 9
+    assert not change_filter.should_write("level", 1)
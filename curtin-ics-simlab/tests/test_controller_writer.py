@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+
+# -----------------------------------------------------------------------------
+# Project: Curtin ICS-SimLab
+# File: test_controller_writer.py
+#
+# Copyright (c) 2025 Jaxson Brown, Curtin University
+#
+# Licensed under the MIT License. You may obtain a copy of the License at:
+#     https://opensource.org/licenses/MIT
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+# This work is supported by a Cross-Campus Cyber Security Research Project
+# funded by **Curtin University**
+#
+# Author: Jaxson Brown
+# Organisation: Curtin University
+# Last Modified: 2025-08-27
+# -----------------------------------------------------------------------------
+
+
+# FILE PURPOSE: Tests of the coalescing PLC controller writes (plc.ControllerWriter)
+
+import pytest
+import plc
+import utils
+
+# GLOBAL VARIABLES
+CONTROLLERS = [
+    {"id": "a", "outbound_connection_id": "con", "value_type": "holding_register", "address": 1},
+    {"id": "b", "outbound_connection_id": "con", "value_type": "holding_register", "address": 2},
+    {"id": "c", "outbound_connection_id": "con", "value_type": "holding_register", "address": 4},
+    {"id": "valve", "outbound_connection_id": "con", "value_type": "coil", "address": 1},
+    {"id": "other", "outbound_connection_id": "other_con", "value_type": "coil", "address": 1},
+]
+
+
+
+# CLASS:    FakeResponse
+# PURPOSE:  A Modbus write response (an exception response if error is set)
+class FakeResponse:
+    def __init__(self, error=False):
+        self.error = error
+
+    def isError(self):
+        return self.error
+
+
+
+# CLASS:    FakeConnection
+# PURPOSE:  Records the modbus write requests made on an outbound connection. "fail" makes
+#           requests raise (no response), "reject" makes the device answer with exception
+#           responses.
+class FakeConnection:
+    def __init__(self):
+        self.requests = []
+        self.fail = False
+        self.reject = False
+        self.connected = True
+
+    def write(self, function, **request):
+        if self.fail:
+            raise IOError("no response")
+        if self.reject:
+            return FakeResponse(error=True)
+        self.requests.append((function, request))
+        return FakeResponse()
+
+    def write_coil(self, **request):
+        return self.write("write_coil", **request)
+
+    def write_coils(self, **request):
+        return self.write("write_coils", **request)
+
+    def write_register(self, **request):
+        return self.write("write_register", **request)
+
+    def write_registers(self, **request):
+        return self.write("write_registers", **request)
+
+
+
+# FUNCTION: setup
+# PURPOSE:  Returns (registers, connection, writer), with the simulation clock set by the test
+@pytest.fixture
+def setup(monkeypatch):
+    time = [0]
+    monkeypatch.setattr(utils.clock, "monotonic", lambda: time[0])
+    registers = {controller["id"]: {"value": 0} for controller in CONTROLLERS}
+    connection = FakeConnection()
+    writer = plc.ControllerWriter({"controllers": CONTROLLERS}, {"con": connection, "other_con": FakeConnection()}, registers, heartbeat=5)
+    writer.time = time
+    return registers, connection, writer
+
+
+
+def test_contiguous_writes_are_batched(setup):
+    registers, connection, writer = setup
+    for id in ["c", "b", "a", "valve"]:
+        writer.write(id)
+    assert connection.requests == []
+
+    writer.flush()
+    assert connection.requests == [
+        ("write_coil", {"address": 0, "value": 0}),
+        ("write_registers", {"address": 0, "values": [0, 0]}),
+        ("write_register", {"address": 3, "value": 0}),
+    ]
+    assert writer.stats()["requests"] == 3
+    assert writer.stats()["values_written"] == 4
+
+
+
+def test_unchanged_values_are_suppressed(setup):
+    registers, connection, writer = setup
+    writer.write("a")
+    writer.flush()
+
+    writer.write("a")
+    registers["a"]["value"] = 5
+    writer.write("a")
+    registers["a"]["value"] = 0
+    writer.write("a")
+    writer.flush()
+    assert len(connection.requests) == 1
+    assert writer.stats()["suppressed"] == 2
+
+    # the last queued value wins
+    registers["a"]["value"] = 1
+    writer.write("a")
+    registers["a"]["value"] = 2
+    writer.write("a")
+    writer.flush()
+    assert connection.requests[-1] == ("write_register", {"address": 0, "value": 2})
+
+
+
+def test_failed_writes_are_retried_and_the_connection_resent(setup):
+    registers, connection, writer = setup
+    writer.write("a")
+    writer.write("c")
+    writer.flush()
+
+    registers["b"]["value"] = 3
+    writer.write("b")
+    connection.fail = True
+    writer.flush()
+    assert writer.stats()["errors"] == 1
+    connection.fail = False
+
+    # the failed write is retried, and the values sent before the failure are sent again (the
+    # device may have been restarted), even though the logic did not change them
+    connection.requests.clear()
+    writer.write("a")
+    writer.flush()
+    assert connection.requests == [
+        ("write_registers", {"address": 0, "values": [0, 3]}),
+        ("write_register", {"address": 3, "value": 0}),
+    ]
+    writer.flush()
+    assert len(connection.requests) == 2
+
+
+
+def test_rejected_writes_are_retried(setup):
+    registers, connection, writer = setup
+    registers["valve"]["value"] = 1
+    writer.write("valve")
+    connection.reject = True
+    writer.flush()
+    assert writer.stats()["errors"] == 1
+    assert writer.stats()["requests"] == 0
+    assert writer.stats()["pending"] == 1
+
+    # the rejected value was not recorded as written, so it is not suppressed
+    writer.write("valve")
+    assert writer.stats()["suppressed"] == 0
+    connection.reject = False
+    writer.flush()
+    assert connection.requests == [("write_coil", {"address": 0, "value": 1})]
+    assert writer.stats()["pending"] == 0
+
+
+
+def test_dropped_connections_are_resent(setup):
+    registers, connection, writer = setup
+    writer.write("valve")
+    writer.write("other")
+    writer.flush()
+
+    connection.connected = False
+    connection.requests.clear()
+    writer.flush()
+    assert connection.requests == [("write_coil", {"address": 0, "value": 0})]
+    assert writer.stats()["resent"] == 1
+
+
+
+def test_heartbeat_resends_unchanged_values(setup):
+    registers, connection, writer = setup
+    writer.write("valve")
+    writer.flush()
+
+    writer.time[0] = 4.9
+    writer.flush()
+    assert len(connection.requests) == 1
+
+    writer.time[0] = 5
+    writer.flush()
+    assert len(connection.requests) == 2
+
+    # values that were never written are not sent by the heartbeat
+    assert all(request[1]["address"] == 0 for request in connection.requests)
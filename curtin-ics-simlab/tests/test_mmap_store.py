@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+
+# -----------------------------------------------------------------------------
+# Project: Curtin ICS-SimLab
+# File: test_mmap_store.py
+#
+# Copyright (c) 2025 Jaxson Brown, Curtin University
+#
+# Licensed under the MIT License. You may obtain a copy of the License at:
+#     https://opensource.org/licenses/MIT
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+# This work is supported by a Cross-Campus Cyber Security Research Project
+# funded by **Curtin University**
+#
+# Author: Jaxson Brown
+# Organisation: Curtin University
+# Last Modified: 2025-08-27
+# -----------------------------------------------------------------------------
+
+
+# FILE PURPOSE: Tests of the seqlock reads and writes of the memory-mapped physical store
+#               (physical.MmapStore)
+
+import threading
+import time
+import pytest
+import physical
+
+# GLOBAL VARIABLES
+CONFIG = {
+    "hils": [{"name": "hil", "physical_values": [{"name": "level"}, {"name": "valve", "type": "bool"}, {"name": "count", "type": "int"}]}],
+}
+
+
+
+# FUNCTION: stores
+# PURPOSE:  Returns a writer and a (read-only) reader of a new memory-mapped store
+@pytest.fixture
+def stores(tmp_path):
+    filename = str(tmp_path / "physical.mmap")
+    physical.MmapStore.create(filename, CONFIG)
+    writer = physical.MmapStore(filename)
+    reader = physical.MmapStore(filename, read_only=True)
+    yield writer, reader
+    reader.close()
+    writer.close()
+
+
+
+def test_values_round_trip(stores):
+    writer, reader = stores
+    assert reader.read_values(["level", "valve", "count"]) == {"level": None, "valve": None, "count": None}
+
+    writer.write_values({"level": 1.5, "valve": 1, "count": 7})
+    assert reader.read_values(["level", "valve", "count"]) == {"level": 1.5, "valve": True, "count": 7}
+
+
+
+def test_read_waits_for_a_write_in_progress(stores):
+    writer, reader = stores
+    writer.write_value("level", 1.0)
+
+    # make the version odd, as a writer descheduled halfway through an update would leave it
+    offset = writer.offsets["level"]
+    version = writer.VERSION.unpack_from(writer.mm, offset)[0]
+    writer.VERSION.pack_into(writer.mm, offset, version + 1)
+
+    def finish_write():
+        time.sleep(0.05)
+        writer.DATA["real"].pack_into(writer.mm, offset + writer.VERSION.size, 2.0, 0.0)
+        writer.VERSION.pack_into(writer.mm, offset, version + 2)
+
+    thread = threading.Thread(target=finish_write)
+    thread.start()
+    assert reader.read_value("level") == 2.0
+    thread.join()
+
+
+
+def test_read_times_out_if_a_write_never_finishes(stores):
+    writer, reader = stores
+    writer.write_value("level", 1.0)
+    offset = writer.offsets["level"]
+    version = writer.VERSION.unpack_from(writer.mm, offset)[0]
+    writer.VERSION.pack_into(writer.mm, offset, version + 1)
+
+    reader.READ_TIMEOUT = 0.05
+    start = time.monotonic()
+    with pytest.raises(TimeoutError):
+        reader.read_value("level")
+    assert time.monotonic() - start >= 0.05
+
+
+
+def test_concurrent_reads_are_consistent(stores):
+    writer, reader = stores
+    done = threading.Event()
+    errors = []
+
+    def write():
+        for count in range(1, 5001):
+            writer.write_value("count", count)
+        done.set()
+
+    def read():
+        previous = 0
+        while not done.is_set():
+            try:
+                count = reader.read_value("count") or 0
+            except Exception as e:
+                errors.append(e)
+                return
+            if count < previous:
+                errors.append(f"read {count} after {previous}")
+                return
+            previous = count
+
+    threads = [threading.Thread(target=read) for _ in range(3)] + [threading.Thread(target=write)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    assert reader.read_value("count") == 5000
@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+
+# -----------------------------------------------------------------------------
+# Project: Curtin ICS-SimLab
+# File: test_monitor_reads.py
+#
+# Copyright (c) 2025 Jaxson Brown, Curtin University
+#
+# Licensed under the MIT License. You may obtain a copy of the License at:
+#     https://opensource.org/licenses/MIT
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+# This work is supported by a Cross-Campus Cyber Security Research Project
+# funded by **Curtin University**
+#
+# Author: Jaxson Brown
+# Organisation: Curtin University
+# Last Modified: 2025-08-27
+# -----------------------------------------------------------------------------
+
+
+# FILE PURPOSE: Tests of the merged monitor reads (utils.plan_monitor_reads and utils.monitor)
+
+import pytest
+import utils
+
+# GLOBAL VARIABLES
+REGISTERS = {
+    "coil": [{"address": 1, "count": 1, "id": "valve"}],
+    "discrete_input": [],
+    "holding_register": [{"address": 10 + i, "count": 1, "id": f"h{i}"} for i in range(10)],
+    "input_register": [],
+}
+
+
+
+# FUNCTION: make_configs
+# PURPOSE:  Returns a device configuration with holding register monitors at the given (remote)
+#           addresses, one per local holding register
+def make_configs(addresses, interval=1, read_gap=None):
+    connection = {"id": "con"}
+    if read_gap is not None:
+        connection["read_gap"] = read_gap
+    monitors = [{"outbound_connection_id": "con", "value_type": "holding_register", "id": f"h{i}",
+                 "address": address, "count": 1, "interval": interval}
+                for i, address in enumerate(addresses)]
+    return {"outbound_connections": [connection], "registers": REGISTERS, "monitors": monitors}
+
+
+
+def test_only_contiguous_monitors_are_merged_by_default():
+    blocks = utils.plan_monitor_reads(make_configs([5, 1, 2, 3, 8]))
+    assert [(block["address"], block["count"], block["ids"]) for block in blocks] == [
+        (1, 3, ["h1", "h2", "h3"]),
+        (5, 1, ["h0"]),
+        (8, 1, ["h4"]),
+    ]
+    assert blocks[0]["targets"] == [(0, 11, 1), (1, 12, 1), (2, 13, 1)]
+
+
+
+def test_connection_read_gap():
+    blocks = utils.plan_monitor_reads(make_configs([1, 3, 8, 20], read_gap=4))
+    assert [(block["address"], block["count"]) for block in blocks] == [(1, 8), (20, 1)]
+    assert blocks[0]["targets"] == [(0, 10, 1), (2, 11, 1), (7, 12, 1)]
+
+
+
+def test_blocks_are_split_by_interval_type_and_size():
+    configs = make_configs([1, 2, 126, 127])
+    configs["monitors"][1]["interval"] = 2
+    configs["monitors"].append({"outbound_connection_id": "con", "value_type": "coil", "id": "valve",
+                                "address": 3, "count": 1, "interval": 1})
+    blocks = utils.plan_monitor_reads(configs)
+    assert sorted((block["value_type"], block["interval"], block["address"], block["count"]) for block in blocks) == [
+        ("coil", 1, 3, 1),
+        ("holding_register", 1, 1, 1),
+        ("holding_register", 1, 126, 2),
+        ("holding_register", 2, 2, 1),
+    ]
+
+    # a read never goes over the Modbus limit
+    blocks = utils.plan_monitor_reads(make_configs([1, 125, 126], read_gap=200))
+    assert [(block["address"], block["count"]) for block in blocks] == [(1, 125), (126, 1)]
+
+
+
+def test_monitors_without_a_register_are_skipped():
+    configs = make_configs([1, 2])
+    configs["monitors"][1]["id"] = "missing"
+    blocks = utils.plan_monitor_reads(configs)
+    assert [block["ids"] for block in blocks] == [["h0"]]
+
+
+
+# CLASS:    FakeResponse
+# PURPOSE:  A Modbus read response (an exception response if registers is None)
+class FakeResponse:
+    def __init__(self, registers):
+        self.registers = registers
+
+    def isError(self):
+        return self.registers is None
+
+
+
+# CLASS:    FakeConnection
+# PURPOSE:  A device with holding registers at some addresses only, which rejects reads that cover
+#           any other address
+class FakeConnection:
+    def __init__(self, registers):
+        self.registers = registers
+        self.reads = []
+
+    def read_holding_registers(self, address, count):
+        self.reads.append((address, count))
+        if any(address + i not in self.registers for i in range(count)):
+            return FakeResponse(None)
+        return FakeResponse([self.registers[address + i] for i in range(count)])
+
+
+
+# CLASS:    FakeDataBlock
+# PURPOSE:  Records the values the monitors write to the local registers
+class FakeDataBlock:
+    def __init__(self):
+        self.values = {}
+
+    def setValues(self, address, values):
+        for i, value in enumerate(values):
+            self.values[address + i] = value
+
+
+
+# FUNCTION: run_monitor
+# PURPOSE:  Runs a monitor thread's loop for a number of reads, returning the local values
+def run_monitor(monkeypatch, block, modbus_con, reads):
+    sleeps = []
+    def sleep(seconds):
+        sleeps.append(seconds)
+        if len(sleeps) == reads:
+            raise StopIteration
+    monkeypatch.setattr(utils.clock, "sleep", sleep)
+
+    datablock = FakeDataBlock()
+    with pytest.raises(StopIteration):
+        utils.monitor(block, modbus_con, {"hr": datablock})
+    return datablock.values
+
+
+
+def test_merged_reads_are_scattered(monkeypatch):
+    [block] = utils.plan_monitor_reads(make_configs([1, 3], read_gap=1))
+    modbus_con = FakeConnection({0: 100, 1: 101, 2: 102})
+    assert run_monitor(monkeypatch, block, modbus_con, 2) == {10: 100, 11: 102}
+    assert modbus_con.reads == [(0, 3), (0, 3)]
+
+
+
+def test_rejected_merged_reads_fall_back_to_single_reads(monkeypatch):
+    [block] = utils.plan_monitor_reads(make_configs([1, 3, 5], read_gap=1))
+    modbus_con = FakeConnection({0: 100, 2: 102})
+    assert run_monitor(monkeypatch, block, modbus_con, 2) == {10: 100, 11: 102}
+
+    # the merged read is only tried once, and the bad address only fails its own monitor
+    assert modbus_con.reads == [(0, 5), (0, 1), (2, 1), (4, 1), (0, 1), (2, 1), (4, 1)]
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+
+# -----------------------------------------------------------------------------
+# Project: Curtin ICS-SimLab
+# File: test_register_codec.py
+#
+# Copyright (c) 2025 Jaxson Brown, Curtin University
+#
+# Licensed under the MIT License. You may obtain a copy of the License at:
+#     https://opensource.org/licenses/MIT
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+# This work is supported by a Cross-Campus Cyber Security Research Project
+# funded by **Curtin University**
+#
+# Author: Jaxson Brown
+# Organisation: Curtin University
+# Last Modified: 2025-08-27
+# -----------------------------------------------------------------------------
+
+
+# FILE PURPOSE: Tests of the register encodings (utils.RegisterCodec)
+
+import pytest
+from pymodbus.datastore import ModbusSequentialDataBlock
+import utils
+
+
+
+# FUNCTION: make_register
+# PURPOSE:  Returns a register configuration (as returned by utils.get_physical_registers)
+def make_register(name, type="input_register", address=1, count=1, **options):
+    return {"type": type, "address": address, "count": count, "physical_value": name, **options}
+
+
+
+# FUNCTION: make_values
+# PURPOSE:  Returns an empty datastore
+def make_values():
+    return {key: ModbusSequentialDataBlock.create() for key in ["co", "di", "hr", "ir"]}
+
+
+
+def test_uint16_scale_and_offset():
+    codec = utils.RegisterCodec([make_register("level", scale=0.1, offset=-10)])
+    assert codec.encode({"level": 2.3}) == [("ir", 1, [123])]
+
+    values = make_values()
+    codec.write(values, {"level": 2.3})
+    assert codec.decode(values)["level"] == pytest.approx(2.3)
+
+
+
+def test_int16_is_clipped_and_rounded():
+    codec = utils.RegisterCodec([make_register("a", data_type="int16"), make_register("b", address=2, data_type="int16")])
+    assert codec.encode({"a": 40000, "b": -1.6}) == [("ir", 1, [0x7FFF]), ("ir", 2, [0xFFFE])]
+
+
+
+@pytest.mark.parametrize("word_order, words", [("big", [0xFFFF, 0xFFFE]), ("little", [0xFFFE, 0xFFFF])])
+def test_int32_word_order(word_order, words):
+    codec = utils.RegisterCodec([make_register("power", type="holding_register", count=2, data_type="int32", word_order=word_order)])
+    assert codec.encode({"power": -2}) == [("hr", 1, words)]
+
+    values = make_values()
+    values["hr"].setValues(1, words)
+    assert codec.decode(values) == {"power": -2}
+
+
+
+def test_float32_round_trip():
+    codec = utils.RegisterCodec([
+        make_register("voltage", count=2, data_type="float32"),
+        make_register("current", address=3, count=2, data_type="float32", word_order="little", scale=2),
+    ])
+    values = make_values()
+    codec.write(values, {"voltage": 230.5, "current": -7.25})
+    assert codec.decode(values) == {"voltage": 230.5, "current": -7.25}
+    assert values["ir"].getValues(1, 2) == [0x4366, 0x8000]
+
+
+
+def test_bits_and_missing_values():
+    codec = utils.RegisterCodec([make_register("valve", type="coil"), make_register("level", address=5)])
+    assert codec.encode({"valve": 1, "level": None}) == [("co", 1, [True])]
+
+
+
+def test_count_must_match_data_type():
+    with pytest.raises(ValueError):
+        utils.RegisterCodec([make_register("power", count=1, data_type="float32")])
+    with pytest.raises(KeyError):
+        utils.RegisterCodec([make_register("power", data_type="int64")])
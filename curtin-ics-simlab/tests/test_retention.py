@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+
+# -----------------------------------------------------------------------------
+# Project: Curtin ICS-SimLab
+# File: test_retention.py
+#
+# Copyright (c) 2025 Jaxson Brown, Curtin University
+#
+# Licensed under the MIT License. You may obtain a copy of the License at:
+#     https://opensource.org/licenses/MIT
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+# This work is supported by a Cross-Campus Cyber Security Research Project
+# funded by **Curtin University**
+#
+# Author: Jaxson Brown
+# Organisation: Curtin University
+# Last Modified: 2025-08-27
+# -----------------------------------------------------------------------------
+
+
+# FILE PURPOSE: Tests of the physical history retention policy (physical.SQLiteStore)
+
+import pytest
+import physical
+
+# GLOBAL VARIABLES
+CONFIG = {
+    "hils": [{"name": "hil", "physical_values": [{"name": "level"}, {"name": "valve", "type": "bool"}]}],
+    "physical_layer": {"history": True},
+}
+
+
+
+# FUNCTION: store
+# PURPOSE:  A new physical store with history, whose timestamps are set by the test
+@pytest.fixture
+def store(tmp_path):
+    filename = str(tmp_path / "physical.db")
+    physical.SQLiteStore.create(filename, CONFIG)
+    store = physical.SQLiteStore(filename)
+    store.now = lambda: store.time
+    store.time = 0
+    yield store
+    store.close()
+
+
+
+# FUNCTION: write_history
+# PURPOSE:  Writes "count" values of a physical value, one every "step" seconds
+def write_history(store, name, count, step=1, start=0):
+    for index in range(count):
+        store.time = start + index * step
+        store.write_value(name, index)
+    store.commit()
+
+
+
+# FUNCTION: pragma
+# PURPOSE:  Returns the value of a pragma
+def pragma(store, name):
+    return store.conn.execute(f"PRAGMA {name}").fetchone()[0]
+
+
+
+def test_database_uses_incremental_vacuum(store):
+    assert pragma(store, "auto_vacuum") == physical.INCREMENTAL_AUTO_VACUUM
+    assert pragma(store, "journal_mode") == "wal"
+
+
+
+def test_max_rows_downsamples_into_buckets(store):
+    write_history(store, "level", 250)
+    store.apply_retention(["level"], {"max_rows": 10, "bucket": 100, "batch_rows": 30})
+
+    history = store.read_history("level")
+    assert [row[2] for row in history] == [float(value) for value in range(240, 250)]
+    assert store.read_buckets("level") == [
+        (0, 0, 99, 49.5, 100),
+        (100, 100, 199, 149.5, 100),
+        (200, 200, 239, 219.5, 40),
+    ]
+
+
+
+def test_later_batches_merge_into_buckets(store):
+    write_history(store, "level", 150)
+    store.apply_retention(["level"], {"max_rows": 100, "bucket": 100})
+    write_history(store, "level", 50, start=150)
+    store.apply_retention(["level"], {"max_rows": 10, "bucket": 100})
+
+    (first, second) = store.read_buckets("level")
+    assert first == (0, 0, 99, 49.5, 100)
+    assert second[0] == 100 and second[4] == 90
+    assert second[3] == pytest.approx(sum(list(range(100, 150)) + list(range(0, 40))) / 90)
+
+
+
+def test_max_age_and_bucket_max_age(store):
+    write_history(store, "level", 100, step=10)
+    write_history(store, "valve", 3, start=900)
+    store.time = 1000
+    store.apply_retention(["level", "valve"], {"max_age": 500, "bucket": 100, "bucket_max_age": 800})
+
+    assert min(row[1] for row in store.read_history("level")) >= 500
+    assert [row[0] for row in store.read_buckets("level")] == [200, 300, 400]
+    assert len(store.read_history("valve")) == 3
+
+
+
+def test_retention_returns_pages_to_the_file_system(store):
+    write_history(store, "level", 20000)
+    pages = pragma(store, "page_count")
+    store.apply_retention(["level"], {"max_rows": 10, "vacuum_pages": 100000})
+
+    assert pragma(store, "freelist_count") == 0
+    assert pragma(store, "page_count") < pages / 10
+
+
+
+def test_vacuum_is_limited_to_vacuum_pages(store):
+    write_history(store, "level", 20000)
+    store.apply_retention(["level"], {"max_rows": 10, "vacuum_pages": 50})
+    free_pages = pragma(store, "freelist_count")
+    assert free_pages > 50
+
+    # nothing left to delete, so the second pass only vacuums
+    store.apply_retention(["level"], {"max_rows": 10, "vacuum_pages": 50})
+    assert pragma(store, "freelist_count") == free_pages - 50
+
+
+
+def test_existing_database_is_migrated_to_incremental_vacuum(store):
+    store.conn.execute("PRAGMA auto_vacuum = NONE")
+    store.conn.execute("VACUUM")
+    assert pragma(store, "auto_vacuum") == 0
+
+    write_history(store, "level", 20000)
+    store.apply_retention(["level"], {"max_rows": 10, "vacuum_pages": 100000})
+    assert pragma(store, "auto_vacuum") == physical.INCREMENTAL_AUTO_VACUUM
+    assert pragma(store, "freelist_count") == 0
@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+
+# -----------------------------------------------------------------------------
+# Project: Curtin ICS-SimLab
+# File: test_scan_engine.py
+#
+# Copyright (c) 2025 Jaxson Brown, Curtin University
+#
+# Licensed under the MIT License. You may obtain a copy of the License at:
+#     https://opensource.org/licenses/MIT
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+# This work is supported by a Cross-Campus Cyber Security Research Project
+# funded by **Curtin University**
+#
+# Author: Jaxson Brown
+# Organisation: Curtin University
+# Last Modified: 2025-08-27
+# -----------------------------------------------------------------------------
+
+
+# FILE PURPOSE: Tests of the PLC scan cycle (plc.ScanEngine)
+
+import pytest
+import plc
+import utils
+
+# GLOBAL VARIABLES
+CONFIG = {
+    "registers": {
+        "coil": [
+            {"address": 1, "count": 1, "io": "output", "id": "valve"},
+            {"address": 2, "count": 1, "io": "output", "id": "pump"},
+        ],
+        "discrete_input": [],
+        "holding_register": [],
+        "input_register": [{"address": 1, "count": 1, "io": "input", "id": "level"}],
+    },
+}
+
+
+
+# CLASS:    FakeWriter
+# PURPOSE:  Records the controller writes of a scan engine (the "valve" has a controller)
+class FakeWriter:
+    def __init__(self):
+        self.controllers = {"valve": {}}
+        self.queued = []
+        self.flushes = 0
+
+    def write(self, id):
+        self.queued.append(id)
+
+    def flush(self):
+        self.flushes += 1
+
+
+
+# FUNCTION: setup
+# PURPOSE:  Returns (datastore, scan engine, writer) for the test configuration
+@pytest.fixture
+def setup():
+    values = {key: utils.ObservableDataBlock.create() for key in ["co", "di", "hr", "ir"]}
+    register_values = utils.create_register_values_dict(CONFIG, values)
+    input_registers, output_registers = plc.separate_io_registers(register_values)
+    writer = FakeWriter()
+    return values, plc.ScanEngine(input_registers, output_registers, writer, cycle=0.1), writer
+
+
+
+def test_tasks_see_latched_inputs(setup):
+    values, engine, writer = setup
+    seen = []
+
+    def task(input_registers, output_registers):
+        seen.append(input_registers["level"]["value"])
+        values["ir"].setValues(1, [99])
+        seen.append(input_registers["level"]["value"])
+
+    values["ir"].setValues(1, [42])
+    engine.register_task(task)
+    engine.scan_once()
+    assert seen == [42, 42]
+    engine.scan_once()
+    assert seen[2:] == [99, 99]
+
+
+
+def test_outputs_only_flush_when_changed(setup):
+    values, engine, writer = setup
+
+    def task(input_registers, output_registers):
+        output_registers["valve"]["value"] = input_registers["level"]["value"] > 10
+
+    engine.register_task(task)
+    engine.scan_once()
+    assert writer.queued == ["valve"]
+    assert engine.flushed == {"valve": False, "pump": 0}
+
+    engine.scan_once()
+    assert writer.queued == ["valve"]
+
+    values["ir"].setValues(1, [20])
+    engine.scan_once()
+    assert writer.queued == ["valve", "valve"]
+    assert values["co"].getValues(1)[0] is True
+    assert writer.flushes == 3
+
+
+
+def test_outside_writes_to_outputs_are_adopted(setup):
+    values, engine, writer = setup
+    engine.scan_once()
+
+    # e.g. a HMI writes the valve coil of this PLC
+    values["co"].setValues(1, [True])
+    engine.scan_once()
+    assert engine.output_registers["valve"]["value"] is True
+    assert writer.queued == ["valve", "valve"]
+
+    # writes to outputs without a controller are kept, but not sent anywhere
+    values["co"].setValues(2, [True])
+    engine.scan_once()
+    assert values["co"].getValues(2)[0] is True
+    assert writer.queued == ["valve", "valve"]
+
+
+
+def test_task_periods_and_priorities(setup):
+    values, engine, writer = setup
+    runs = []
+    engine.register_task(lambda i, o: runs.append("slow"), period=0.3, name="slow")
+    engine.register_task(lambda i, o: runs.append("urgent"), priority=-1, name="urgent")
+
+    for _ in range(4):
+        engine.scan_once()
+    assert runs == ["urgent", "slow", "urgent", "urgent", "urgent", "slow"]
+    assert engine.stats()["tasks"]["slow"]["runs"] == 2
+
+
+
+def test_failing_task_does_not_stop_the_scan(setup):
+    values, engine, writer = setup
+
+    def failing(input_registers, output_registers):
+        raise RuntimeError("boom")
+
+    def task(input_registers, output_registers):
+        output_registers["pump"]["value"] = True
+
+    engine.register_task(failing, priority=0)
+    engine.register_task(task, priority=1)
+    engine.scan_once()
+    assert values["co"].getValues(2)[0] is True
+    assert engine.cycles == 1